@@ -10,11 +10,134 @@ const __dirname = path.dirname(__filename)
 // Python executable path - update this if needed
 const PYTHON_PATH = process.env.PYTHON_PATH || 'C:\\Users\\Admin\\AppData\\Local\\Programs\\Python\\Python313\\python.exe'
 
+// Long-lived prediction server (trading_bot/src/prediction_server.py), e.g. http://127.0.0.1:8001
+// When unset, every request spawns api_predict.py instead
+const PREDICTION_SERVER_URL = process.env.PREDICTION_SERVER_URL
+
+// 'table' serves the forecasts precomputed by trading_bot/src/write_predictions.py from the
+// predictions table, falling back to live inference for instruments without rows; 'live' (default)
+// always runs the model
+const PREDICTION_SOURCE = process.env.PREDICTION_SOURCE || 'live'
+
+// Mirrors TREND_THRESHOLDS in trading_bot/src/strategies/signals.py
+const TREND_DESCRIPTIONS = {
+  STRONG_BULLISH: 'Strong upward momentum expected',
+  BULLISH: 'Positive trend expected',
+  BEARISH: 'Negative trend expected',
+  STRONG_BEARISH: 'Significant downward pressure'
+}
+
+const percentChange = (value, reference) => ((value - reference) / reference) * 100
+const toNumber = (value) => (value === null ? null : Number(value))
+
+/**
+ * Read the latest precomputed forecast of an instrument from the predictions table
+ * @param {string} instrumentId - Instrument ID
+ * @returns {Promise<Object|null>} Same shape as api_predict.py output, or null if none was written
+ */
+async function fetchStoredPrediction(instrumentId) {
+  // Newest bar forecast; if several model versions forecast it, the most recently written one
+  const latest = await prisma.prediction.findFirst({
+    where: { instrumentId },
+    orderBy: [{ asOf: 'desc' }, { updatedAt: 'desc' }],
+    select: { asOf: true, modelVersion: true }
+  })
+  if (!latest) {
+    return null
+  }
+
+  const rows = await prisma.prediction.findMany({
+    where: { instrumentId, asOf: latest.asOf, modelVersion: latest.modelVersion },
+    orderBy: { horizon: 'asc' }
+  })
+  const currentPrice = Number(rows[0].currentPrice)
+  const yesterdayPrice = Number(rows[0].yesterdayPrice)
+
+  const predictions = rows.map((row, i) => {
+    const predictedPrice = Number(row.predictedPrice)
+    const previousPrice = i === 0 ? currentPrice : Number(rows[i - 1].predictedPrice)
+    return {
+      day: row.horizon,
+      date: row.targetDate.toISOString().slice(0, 10),
+      predictedPrice,
+      changeVsYesterday: row.changePercent,
+      changeVsCurrent: percentChange(predictedPrice, currentPrice),
+      changeDayToDay: percentChange(predictedPrice, previousPrice),
+      signal: row.tradeSignal,
+      confidence: row.confidence,
+      lowerBound: toNumber(row.lowerBound),
+      upperBound: toNumber(row.upperBound)
+    }
+  })
+  const last = predictions[predictions.length - 1]
+  const upwardDays = predictions.slice(1).filter((day, i) => day.predictedPrice > predictions[i].predictedPrice).length
+
+  return {
+    success: true,
+    timestamp: new Date().toISOString(),
+    instrumentId,
+    currentPrice,
+    yesterdayPrice,
+    todayChange: percentChange(currentPrice, yesterdayPrice),
+    latestDataDate: latest.asOf.toISOString().slice(0, 10),
+    modelInfo: {
+      predictionSteps: predictions.length,
+      modelVersion: latest.modelVersion,
+      source: 'predictions_table',
+      asOf: latest.asOf.toISOString()
+    },
+    predictions,
+    analysis: {
+      trend: rows[0].trend,
+      recommendation: rows[0].recommendation,
+      description: TREND_DESCRIPTIONS[rows[0].trend],
+      averageChange: predictions.reduce((sum, day) => sum + day.changeVsYesterday, 0) / predictions.length,
+      finalDayChange: last.changeVsYesterday,
+      totalChange: last.changeVsYesterday,
+      upwardDays,
+      downwardDays: predictions.length - 1 - upwardDays,
+      expectedFinalPrice: last.predictedPrice
+    }
+  }
+}
+
+/**
+ * Request a prediction from the long-lived Python prediction server
+ * @returns {Promise<Object>} Prediction results from trained LSTM model
+ */
+async function fetchServerPrediction() {
+  const response = await fetch(`${PREDICTION_SERVER_URL}/predict`)
+  const result = await response.json()
+  if (!result.success) {
+    throw new Error(result.error || 'Prediction failed')
+  }
+  return result
+}
+
+/**
+ * Get an LSTM prediction: a precomputed one when PREDICTION_SOURCE=table, otherwise (or when none
+ * is stored) from the prediction server when configured, or a spawned api_predict.py
+ * @param {string} [instrumentId] - Instrument ID (for precomputed predictions)
+ * @returns {Promise<Object>} Prediction results from trained LSTM model
+ */
+async function executeLSTMPrediction(instrumentId) {
+  if (PREDICTION_SOURCE === 'table' && instrumentId) {
+    const stored = await fetchStoredPrediction(instrumentId)
+    if (stored) {
+      return stored
+    }
+  }
+  if (PREDICTION_SERVER_URL) {
+    return fetchServerPrediction()
+  }
+  return spawnLSTMPrediction()
+}
+
 /**
  * Execute Python LSTM prediction script
  * @returns {Promise<Object>} Prediction results from trained LSTM model
  */
-function executeLSTMPrediction() {
+function spawnLSTMPrediction() {
   return new Promise((resolve, reject) => {
     // Path to the Python script
     const scriptPath = path.join(__dirname, '../../trading_bot/src/api_predict.py')
@@ -105,7 +228,7 @@ export const getPredictions = async (req, res) => {
     }
 
     // Execute LSTM prediction
-    const predictions = await executeLSTMPrediction()
+    const predictions = await executeLSTMPrediction(instrument.id)
 
     // Add instrument information to response
     const response = {
@@ -161,7 +284,7 @@ export const getBatchPredictions = async (req, res) => {
       if (isBTC) {
         // Use LSTM prediction for Bitcoin
         try {
-          const predictions = await executeLSTMPrediction()
+          const predictions = await executeLSTMPrediction(instrument.id)
           results.push({
             instrumentId: instrument.id,
             symbol: instrument.symbol,
@@ -268,6 +268,31 @@ CREATE TABLE `instrument_prices` (
     PRIMARY KEY (`id`)
 ) DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
 
+-- CreateTable
+CREATE TABLE `predictions` (
+    `id` BIGINT NOT NULL AUTO_INCREMENT,
+    `instrument_id` VARCHAR(191) NOT NULL,
+    `as_of` DATETIME(3) NOT NULL,
+    `horizon` SMALLINT NOT NULL,
+    `model_version` VARCHAR(64) NOT NULL,
+    `target_date` DATETIME(3) NOT NULL,
+    `predicted_price` DECIMAL(18, 8) NOT NULL,
+    `lower_bound` DECIMAL(18, 8) NULL,
+    `upper_bound` DECIMAL(18, 8) NULL,
+    `change_percent` DOUBLE NOT NULL,
+    `trade_signal` VARCHAR(8) NOT NULL,
+    `confidence` DOUBLE NOT NULL,
+    `current_price` DECIMAL(18, 8) NOT NULL,
+    `yesterday_price` DECIMAL(18, 8) NOT NULL,
+    `trend` VARCHAR(32) NOT NULL,
+    `recommendation` VARCHAR(16) NOT NULL,
+    `created_at` DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    `updated_at` DATETIME(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+
+    UNIQUE INDEX `uq_prediction_instrument_asof_horizon_model`(`instrument_id`, `as_of`, `horizon`, `model_version`),
+    PRIMARY KEY (`id`)
+) DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+
 -- AddForeignKey
 ALTER TABLE `accounts` ADD CONSTRAINT `accounts_base_currency_id_fkey` FOREIGN KEY (`base_currency_id`) REFERENCES `currencies`(`id`) ON DELETE RESTRICT ON UPDATE CASCADE;
 
@@ -337,3 +362,5 @@ ALTER TABLE `instruments` ADD CONSTRAINT `instruments_currency_id_fkey` FOREIGN
 -- AddForeignKey
 ALTER TABLE `instrument_prices` ADD CONSTRAINT `instrument_prices_instrument_id_fkey` FOREIGN KEY (`instrument_id`) REFERENCES `instruments`(`id`) ON DELETE CASCADE ON UPDATE CASCADE;
 
+-- AddForeignKey
+ALTER TABLE `predictions` ADD CONSTRAINT `predictions_instrument_id_fkey` FOREIGN KEY (`instrument_id`) REFERENCES `instruments`(`id`) ON DELETE CASCADE ON UPDATE CASCADE;
@@ -2,212 +2,349 @@
 Bitcoin Price Prediction API Script
 Loads the trained LSTM model and makes predictions
 Returns JSON output for API consumption
+
+torch (and sklearn, when falling back to scaler.pkl) are imported in load_model rather
+than at module load, so a cold call only pays for what it uses; see profile_startup.py
 """
 
 import numpy as np
-import pandas as pd
-import torch
-import torch.nn as nn
-import pymysql
 from datetime import datetime, timedelta
+import copy
 import pickle
 import warnings
 import os
 import sys
 import json
-from dotenv import load_dotenv
-
-warnings.filterwarnings('ignore')
-
-# Load environment variables from .env file
-load_dotenv('../../server/.env')
-
-# Database configuration from .env
-DB_CONFIG = {
-    'charset': os.getenv('DB_CHARSET', 'utf8mb4'),
-    'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '10')),
-    'cursorclass': pymysql.cursors.DictCursor,
-    'db': os.getenv('DB_NAME'),
-    'host': os.getenv('DB_HOST'),
-    'password': os.getenv('DB_PASSWORD'),
-    'read_timeout': int(os.getenv('DB_READ_TIMEOUT', '10')),
-    'port': int(os.getenv('DB_PORT', '3306')),
-    'user': os.getenv('DB_USER'),
-    'write_timeout': int(os.getenv('DB_WRITE_TIMEOUT', '10')),
-}
+import threading
 
-# Add SSL if connecting to cloud database (Aiven)
-if 'aivencloud.com' in DB_CONFIG.get('host', ''):
-    DB_CONFIG['ssl'] = {'ssl': True}
+from config.settings import BTC_INSTRUMENT_ID
+from strategies.signals import daily_signals, percent_change, sample_confidence, trend
+from utils.db import from_epoch_ms, get_pool
+from utils.prediction_cache import PredictionCache, file_fingerprint
 
-
-class LSTMModel(nn.Module):
-    """LSTM Model for Bitcoin Price Prediction"""
-    def __init__(self, input_size=1, hidden_layer_size=64, output_size=1):
-        super(LSTMModel, self).__init__()
-        self.hidden_layer_size = hidden_layer_size
-        self.lstm = nn.LSTM(input_size, hidden_layer_size)
-        self.linear = nn.Linear(hidden_layer_size, output_size)
-        self.hidden_cell = (torch.zeros(1, 1, self.hidden_layer_size),
-                            torch.zeros(1, 1, self.hidden_layer_size))
-
-    def forward(self, input_seq):
-        lstm_out, self.hidden_cell = self.lstm(input_seq.view(len(input_seq), 1, -1), self.hidden_cell)
-        predictions = self.linear(lstm_out.view(len(input_seq), -1))
-        return predictions[-1]
+warnings.filterwarnings('ignore')
 
 
 class BTCPricePredictor:
     """Bitcoin Price Predictor using trained LSTM model"""
     
-    def __init__(self, model_path='../../best_btc_lstm_model.pth', scaler_path='../../scaler.pkl'):
+    def __init__(self, model_path='../../best_btc_lstm_model.pth', scaler_path='../../scaler.pkl', stateful_forecast=False,
+                 instrument_id=BTC_INSTRUMENT_ID, model_format='eager', prediction_cache=None, pool=None,
+                 uncertainty_samples=100, interval=0.9, compute_mode='fp32'):
         self.model_path = model_path
         self.scaler_path = scaler_path
+        self.instrument_id = instrument_id
+        # 'eager' (fp32 checkpoint), or an export_model.py output: 'torchscript' or 'int8'
+        self.model_format = model_format
+        # Eager models only: 'fp32', 'bf16', 'compile' or 'bf16-compile' (see compute_mode.py)
+        self.compute_mode = compute_mode
         self.model = None
+        self.forecaster = None
         self.scaler = None
+        self.scalers = {}  # instrument_id -> {'min', 'scale'} of its MinMaxScaler
         self.data = None
         self.current_price = None
         self.yesterday_price = None
         self.seq_length = None
         self.prediction_steps = None
-        
-        # Setup device (GPU if available, otherwise CPU)
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.preprocessor = None  # FeaturePipeline of models trained with indicator inputs
+        # Stateful forecasts trade accuracy for speed: only day 1 matches the default sliding-window
+        # forecast, later days can differ by ~10% of the price range; see LSTMModel.forecast
+        self.stateful_forecast = stateful_forecast
+        # Optional PredictionCache; results are reused until a new bar arrives or the model changes
+        self.prediction_cache = prediction_cache
+        self.model_fingerprint = None
+        self.model_files = []  # Files the loaded model and scalers came from
+        # Price source with the ConnectionPool fetch methods (defaults to the shared MySQL pool)
+        self.pool = pool
+        self.device = None  # Chosen in load_model
+        # Held around model invocations only (MC-dropout sampling switches the shared model's dropout
+        # on), so concurrent calls overlap everything else; per-call copies share it
+        self.model_lock = threading.Lock()
+        # MC-dropout prediction intervals: forecast samples per instrument (0 disables) and the
+        # central probability mass between lowerBound and upperBound
+        self.uncertainty_samples = uncertainty_samples
+        self.interval = interval
+        self.dropout = 0.0
+        self.model_metadata = {}  # Training metadata of the artifact (empty for legacy checkpoints)
         
     def load_model(self):
-        """Load the trained model and scaler"""
+        """Load the trained model and scaler (from the compact artifact when it is up to date)"""
         try:
-            # Load model checkpoint
-            checkpoint = torch.load(self.model_path, map_location=self.device, weights_only=False)
+            import torch
+            from export_model import EXPORT_SUFFIXES, export_path, load_exported_model
+            from lstm_model import LSTMForecaster, LSTMModel
+            from model_artifact import artifact_path, is_current, load_artifact, scaler_params
+            
+            # Setup device (GPU if available, otherwise CPU; exported models are CPU-only)
+            use_cuda = torch.cuda.is_available() and self.model_format == 'eager'
+            self.device = torch.device('cuda' if use_cuda else 'cpu')
+            
+            # Weights, scalers and settings in one weights_only file, written by bot.py / export_model.py
+            artifact = load_artifact(artifact_path(self.model_path)) if is_current(self.model_path) else None
+            
+            if self.model_format in EXPORT_SUFFIXES:
+                # Scripted (and possibly int8-quantized) forecaster written by export_model.py
+                self.forecaster, checkpoint = load_exported_model(self.model_path, self.model_format)
+                self.model = self.forecaster
+                model_file = export_path(self.model_path, self.model_format)
+            else:
+                # Load model checkpoint
+                checkpoint = artifact or torch.load(self.model_path, map_location=self.device, weights_only=False)
+                
+                # Initialize and load model, move to device
+                self.dropout = checkpoint.get('dropout', 0.0)
+                self.model = LSTMModel(input_size=checkpoint.get('input_size', 1), hidden_layer_size=checkpoint['hidden_size'],
+                                       dropout=self.dropout)
+                # Artifact weights are memory-mapped; assigning them (instead of copying into fresh
+                # parameters) keeps the pages shared between processes that load the same file
+                self.model.load_state_dict(checkpoint['model_state_dict'], assign=artifact is not None)
+                self.model.to(self.device).eval()
+                self.forecaster = LSTMForecaster(self.model).eval()
+                if self.compute_mode != 'fp32':
+                    self.prepare_compute_mode(checkpoint['seq_length'], checkpoint['prediction_steps'])
+                model_file = artifact_path(self.model_path) if artifact else self.model_path
             self.seq_length = checkpoint['seq_length']
             self.prediction_steps = checkpoint['prediction_steps']
-            hidden_size = checkpoint['hidden_size']
             
-            # Initialize and load model, move to device
-            self.model = LSTMModel(hidden_layer_size=hidden_size).to(self.device)
-            self.model.load_state_dict(checkpoint['model_state_dict'])
-            self.model.eval()
+            feature_config = (artifact or checkpoint).get('feature_config')
+            if feature_config:
+                if self.model_format in EXPORT_SUFFIXES:
+                    raise Exception("Exported models only support close-price checkpoints; use model_format='eager'")
+                from data.data_preprocessor import FeaturePipeline
+                self.preprocessor = FeaturePipeline(**feature_config)
             
-            # Load scaler
-            with open(self.scaler_path, 'rb') as f:
-                self.scaler = pickle.load(f)
+            if artifact:
+                self.scalers = artifact['scalers']
+                self.model_metadata = artifact.get('metadata', {})
+                source_files = [model_file, artifact_path(self.model_path)]
+            else:
+                # Load scalers (older checkpoints hold a single scaler for one instrument)
+                with open(self.scaler_path, 'rb') as f:
+                    scaler = pickle.load(f)
+                instrument_ids = checkpoint.get('instrument_ids') or [BTC_INSTRUMENT_ID]
+                scalers = scaler if isinstance(scaler, dict) else {instrument_ids[0]: scaler}
+                self.scalers = {instrument_id: scaler_params(s) for instrument_id, s in scalers.items()}
+                source_files = [model_file, self.scaler_path]
+            self.select_instrument(self.instrument_id)
+            
+            self.model_files = list(dict.fromkeys(source_files))
+            if self.prediction_cache is not None:
+                self.model_fingerprint = file_fingerprint(*self.model_files)
             
             return True
             
         except Exception as e:
             raise Exception(f"Error loading model: {e}")
     
+    def prepare_compute_mode(self, seq_length, prediction_steps):
+        """Switch to the compute mode if its forecasts match fp32 on random windows; otherwise stay in fp32"""
+        import torch
+        from compute_mode import agrees, compile_module, validate
+        
+        validate(self.compute_mode)
+        input_size = self.model.lstm.input_size
+        window = torch.rand(8, seq_length, input_size, device=self.device)
+        if input_size == 1:
+            forecaster = compile_module(self.forecaster, self.compute_mode)
+            reference = lambda: self.forecaster(window, prediction_steps, self.stateful_forecast)
+            candidate = lambda: forecaster(window, prediction_steps, self.stateful_forecast)
+        else:
+            # Feature models forecast through Python callbacks (forecast_features): bf16 only, not compiled
+            forecaster = self.forecaster
+            reference = candidate = lambda: self.model.encode(window)[0]
+        with torch.no_grad():
+            ok, _ = agrees(self.compute_mode, self.device, reference, candidate)
+        if ok:
+            self.forecaster = forecaster
+        else:
+            self.compute_mode = 'fp32'
+    
+    def check_instrument(self, instrument_id):
+        """Raise unless the model was trained on the instrument"""
+        if instrument_id not in self.scalers:
+            raise Exception(f"Model was not trained on instrument {instrument_id}")
+    
+    def select_instrument(self, instrument_id):
+        """Switch the instrument (and its scaler) that predictions are made for"""
+        self.check_instrument(instrument_id)
+        self.instrument_id = instrument_id
+        self.scaler = self.scalers[instrument_id]
+    
+    def for_instrument(self, instrument_id=None):
+        """Shallow copy with instrument_id (default: this predictor's own) selected
+        
+        The copy shares the loaded model, scalers, cache and pool; the instrument and price
+        data one call sets on it never leak into this predictor or concurrent calls.
+        """
+        view = copy.copy(self)
+        view.select_instrument(instrument_id or self.instrument_id)
+        return view
+    
     def fetch_latest_data_from_db(self):
-        """Fetch latest Bitcoin price data from database"""
+        """Fetch latest price data for the selected instrument from database"""
+        self.set_data(self.fetch_latest_windows([self.instrument_id])[self.instrument_id])
+        return True
+    
+    def fetch_latest_windows(self, instrument_ids):
+        """Fetch the latest bars of several instruments in one round trip"""
         try:
-            connection = pymysql.connect(**DB_CONFIG)
-            cursor = connection.cursor()
-            
-            # Fetch latest data (need at least seq_length + 1 for yesterday's price)
-            cursor.execute(f"""
-                SELECT timestamp, close_price 
-                FROM instrument_prices 
-                WHERE instrument_id = '2376ac2b-fe9f-41ad-bb47-deb6d30d3253'
-                ORDER BY timestamp DESC
-                LIMIT {self.seq_length + 10}
-            """)
-            
-            rows = cursor.fetchall()
-            connection.close()
-            
-            if len(rows) < self.seq_length:
-                raise Exception(f"Not enough data. Need at least {self.seq_length} records, got {len(rows)}")
-            
-            # Convert to DataFrame (reverse to chronological order)
-            df = pd.DataFrame(rows[::-1])
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df['close_price'] = df['close_price'].astype(float)  # Convert Decimal to float
-            df = df.rename(columns={'close_price': 'Close', 'timestamp': 'Date'})
-            df = df.set_index('Date')
-            
-            self.data = df[['Close']].copy()
-            self.current_price = float(self.data['Close'].iloc[-1])
-            self.yesterday_price = float(self.data['Close'].iloc[-2]) if len(self.data) > 1 else self.current_price
-            
-            return True
+            # Need at least seq_length + 1 bars for yesterday's price (feature models also need
+            # enough history for their indicators to settle)
+            limit, columns = self.seq_length + 10, ('close',)
+            if self.preprocessor is not None:
+                limit += self.preprocessor.history_bars
+                columns = ('close', 'volume')
+            latest = (self.pool or get_pool()).fetch_latest_prices(instrument_ids, limit, columns=columns,
+                                                                    dtype=np.float64)
             
         except Exception as e:
             raise Exception(f"Error fetching data: {e}")
+        
+        histories = {}
+        required = self.seq_length + (self.preprocessor.warmup if self.preprocessor is not None else 0)
+        for instrument_id, prices in latest.items():
+            if len(prices['timestamp']) < required:
+                raise Exception(f"Not enough data for instrument {instrument_id}. "
+                                f"Need at least {required} records, got {len(prices['timestamp'])}")
+            
+            histories[instrument_id] = prices
+        
+        return histories
     
-    def predict_future_prices(self):
-        """Predict future prices using sliding window on GPU/CPU"""
-        # Get last sequence
-        last_sequence = self.data['Close'].values[-self.seq_length:]
-        last_sequence_norm = self.scaler.transform(last_sequence.reshape(-1, 1)).flatten()
+    def set_data(self, data):
+        """Use a price history ({'timestamp': epoch ms, 'close': prices} arrays) for the selected instrument"""
+        self.data = data
+        closes = self.data['close']
+        self.current_price = float(closes[-1])
+        self.yesterday_price = float(closes[-2]) if len(closes) > 1 else self.current_price
+    
+    def normalize(self, prices, instrument_id=None):
+        """Scale prices like the instrument's MinMaxScaler.transform"""
+        scaler = self.scalers[instrument_id] if instrument_id else self.scaler
+        return np.asarray(prices, dtype=np.float64) * scaler['scale'] + scaler['min']
+    
+    def denormalize(self, values, instrument_id=None):
+        """Undo normalize, like MinMaxScaler.inverse_transform"""
+        scaler = self.scalers[instrument_id] if instrument_id else self.scaler
+        return (np.asarray(values, dtype=np.float64) - scaler['min']) / scaler['scale']
+    
+    @property
+    def supports_uncertainty(self):
+        """True when results carry MC-dropout intervals (eager models trained with dropout)"""
+        return self.uncertainty_samples > 0 and self.dropout > 0
+    
+    def forecast_windows(self, windows_norm, next_inputs=None, samples=0):
+        """Forecast normalized windows (batch, seq_length[, input_size]) in one batched model invocation
         
-        # Multi-step prediction
-        predictions_norm = []
-        temp_seq = last_sequence_norm.copy()
+        Feature models pass next_inputs (see LSTMModel.forecast_features) to build each step's inputs.
+        samples > 0 returns MC-dropout samples (samples, batch, prediction_steps) instead, also from
+        one batched invocation (see LSTMModel.sample_forecast).
+        """
+        import torch
+        from compute_mode import autocast
+        window = torch.as_tensor(windows_norm, dtype=torch.float32, device=self.device)
+        with self.model_lock, torch.no_grad(), autocast(self.compute_mode, self.device):
+            if samples:
+                predictions_norm = self.model.sample_forecast(window if next_inputs else window.unsqueeze(-1),
+                                                              self.prediction_steps, samples, self.stateful_forecast,
+                                                              next_inputs)
+            elif next_inputs is None:
+                predictions_norm = self.forecaster(window.unsqueeze(-1), self.prediction_steps, self.stateful_forecast)
+            else:
+                predictions_norm = self.model.forecast_features(window, self.prediction_steps, next_inputs,
+                                                                self.stateful_forecast)
+        return predictions_norm.cpu().numpy().astype(np.float64)  # Move back to CPU for numpy operations
+    
+    def forecast_histories(self, histories, instrument_ids, samples=0):
+        """Normalized forecasts (instruments, prediction_steps) from each instrument's latest bars
         
-        with torch.no_grad():
-            for step in range(self.prediction_steps):
-                # Move hidden states to device
-                self.model.hidden_cell = (
-                    torch.zeros(1, 1, self.model.hidden_layer_size).to(self.device),
-                    torch.zeros(1, 1, self.model.hidden_layer_size).to(self.device)
-                )
-                
-                # Move data to device
-                seq_tensor = torch.FloatTensor(temp_seq).to(self.device)
-                y_pred = self.model(seq_tensor)
-                pred_value = y_pred.cpu().item()  # Move back to CPU for numpy operations
-                predictions_norm.append(pred_value)
-                
-                # Slide window
-                temp_seq = np.append(temp_seq[1:], pred_value)
+        With samples > 0: MC-dropout samples (samples, instruments, prediction_steps).
+        """
+        closes = [histories[instrument_id]['close'] for instrument_id in instrument_ids]
+        windows_norm = np.stack([
+            self.normalize(close[-self.seq_length:], instrument_id)
+            for close, instrument_id in zip(closes, instrument_ids)
+        ])
+        if self.preprocessor is None:
+            return self.forecast_windows(windows_norm, samples=samples)
+        
+        # Feature models: indicator columns next to the close, and streaming indicators that
+        # turn each predicted price into the next step's inputs
+        from data.data_preprocessor import ForecastInputs
+        volumes = [histories[instrument_id].get('volume') for instrument_id in instrument_ids]
+        features = [self.preprocessor.transform(close, volume)[-self.seq_length:] for close, volume in zip(closes, volumes)]
+        streams = [self.preprocessor.stream(close, volume) for close, volume in zip(closes, volumes)]
+        # Sampled forecasts repeat the batch sample-major; every copy needs its own indicator state
+        copies = max(samples, 1)
+        next_inputs = ForecastInputs(
+            [stream.copy() for _ in range(copies) for stream in streams] if samples else streams,
+            [lambda value, instrument_id=instrument_id: float(self.denormalize(value, instrument_id))
+             for instrument_id in instrument_ids] * copies,
+            [volume[-1] if volume is not None else None for volume in volumes] * copies
+        )
+        return self.forecast_windows(np.dstack([windows_norm, np.stack(features)]), next_inputs, samples)
+    
+    def predict_future_prices(self):
+        """Predict future prices using sliding window (or stateful steps) on GPU/CPU"""
+        # Multi-step prediction from the last sequence (see LSTMModel.forecast for the two modes)
+        predictions_norm = self.forecast_histories({self.instrument_id: self.data}, [self.instrument_id])[0]
         
         # Inverse transform to actual prices
-        predictions = self.scaler.inverse_transform(
-            np.array(predictions_norm).reshape(-1, 1)
-        ).flatten()
+        predictions = self.denormalize(predictions_norm)
         
         return predictions
     
-    def calculate_signals(self, predictions):
-        """Calculate trading signals and metrics"""
-        base_date = self.data.index[-1]
+    def predict_price_samples(self):
+        """MC-dropout price samples (samples, prediction_steps) for the selected instrument, or None"""
+        if not self.supports_uncertainty:
+            return None
+        samples_norm = self.forecast_histories({self.instrument_id: self.data}, [self.instrument_id],
+                                               samples=self.uncertainty_samples)[:, 0]
+        return self.denormalize(samples_norm)
+    
+    def calculate_signals(self, predictions, samples=None):
+        """Calculate trading signals and metrics
         
-        predictions_data = []
-        prev_price = self.current_price
+        With forecast samples (see predict_price_samples) each day gets lower/upper bounds of the
+        central `interval` of the samples, and its confidence is the share of samples that agree
+        with the day's signal; without them the bounds are None and confidence is the old
+        magnitude heuristic.
+        """
+        base_date = from_epoch_ms(self.data['timestamp'][-1])
         
+        # Calculate changes (the same rules the backtester replays, see strategies/signals.py)
+        predictions = np.asarray(predictions, dtype=np.float64)
+        changes_vs_yesterday = percent_change(predictions, self.yesterday_price)
+        changes_vs_current = percent_change(predictions, self.current_price)
+        changes_day_to_day = percent_change(predictions, np.concatenate([[self.current_price], predictions[:-1]]))
+        buy, confidence = daily_signals(changes_vs_yesterday)
+        lower = upper = [None] * len(predictions)
+        if samples is not None:
+            lower, upper = np.quantile(samples, [(1 - self.interval) / 2, (1 + self.interval) / 2], axis=0)
+            confidence = sample_confidence(percent_change(samples, self.yesterday_price), buy)
+        
+        predictions_data = []
         for i, pred_price in enumerate(predictions):
             future_date = base_date + timedelta(days=i+1)
-            
-            # Calculate changes
-            change_vs_yesterday = ((pred_price - self.yesterday_price) / self.yesterday_price) * 100
-            change_vs_current = ((pred_price - self.current_price) / self.current_price) * 100
-            change_day_to_day = ((pred_price - prev_price) / prev_price) * 100
-            
-            # Determine signal
-            signal = "BUY" if change_vs_yesterday > 0 else "SELL"
-            confidence = 100 - min(abs(change_vs_yesterday) / 2, 100)  # Simple confidence metric
-            
             predictions_data.append({
                 'day': i + 1,
                 'date': future_date.strftime('%Y-%m-%d'),
                 'predictedPrice': float(pred_price),
-                'changeVsYesterday': float(change_vs_yesterday),
-                'changeVsCurrent': float(change_vs_current),
-                'changeDayToDay': float(change_day_to_day),
-                'signal': signal,
-                'confidence': float(confidence)
+                'changeVsYesterday': float(changes_vs_yesterday[i]),
+                'changeVsCurrent': float(changes_vs_current[i]),
+                'changeDayToDay': float(changes_day_to_day[i]),
+                'signal': "BUY" if buy[i] else "SELL",
+                'confidence': float(confidence[i]),
+                'lowerBound': None if lower[i] is None else float(lower[i]),
+                'upperBound': None if upper[i] is None else float(upper[i])
             })
-            
-            prev_price = pred_price
         
         return predictions_data
     
     def get_trend_analysis(self, predictions):
         """Analyze overall trend and provide recommendation"""
-        changes_vs_yesterday = [
-            ((pred - self.yesterday_price) / self.yesterday_price) * 100 
-            for pred in predictions
-        ]
+        changes_vs_yesterday = percent_change(predictions, self.yesterday_price)
         
         avg_change = np.mean(changes_vs_yesterday)
         final_change = changes_vs_yesterday[-1]
@@ -218,25 +355,10 @@ class BTCPricePredictor:
         downward_days = len(predictions) - 1 - upward_days
         
         # Determine trend
-        if avg_change > 2:
-            trend = "STRONG_BULLISH"
-            recommendation = "STRONG_BUY"
-            description = "Strong upward momentum expected"
-        elif avg_change > 0:
-            trend = "BULLISH"
-            recommendation = "BUY"
-            description = "Positive trend expected"
-        elif avg_change > -2:
-            trend = "BEARISH"
-            recommendation = "SELL"
-            description = "Negative trend expected"
-        else:
-            trend = "STRONG_BEARISH"
-            recommendation = "STRONG_SELL"
-            description = "Significant downward pressure"
+        trend_name, recommendation, description = trend(avg_change)
         
         return {
-            'trend': trend,
+            'trend': trend_name,
             'recommendation': recommendation,
             'description': description,
             'averageChange': float(avg_change),
@@ -247,19 +369,110 @@ class BTCPricePredictor:
             'expectedFinalPrice': float(predictions[-1])
         }
     
-    def run(self):
-        """Main execution flow - returns JSON data"""
-        # Load trained model
-        self.load_model()
-        
+    def warm_up(self):
+        """Run one dummy forward pass so the first real request is not slowed by lazy init"""
+        self.forecast_windows(np.zeros((1, self.seq_length)))
+    
+    def cache_keys(self, instrument_ids):
+        """Prediction cache key per instrument (None when it has no data yet)"""
+        latest = (self.pool or get_pool()).fetch_latest_timestamps(instrument_ids)
+        return {
+            instrument_id: None if latest[instrument_id] is None else self.prediction_cache.make_key(
+                instrument_id, latest[instrument_id], self.model_fingerprint,
+                self.seq_length, self.prediction_steps, self.stateful_forecast,
+                self.uncertainty_samples if self.supports_uncertainty else 0, self.interval, self.compute_mode
+            )
+            for instrument_id in instrument_ids
+        }
+    
+    def cached_results(self, keys):
+        """Cached results for the keys that have one"""
+        results = {}
+        for instrument_id, key in keys.items():
+            result = self.prediction_cache.get(key) if key else None
+            if result is not None:
+                results[instrument_id] = result
+        return results
+    
+    def run(self, instrument_id=None):
+        """Main execution flow - returns JSON data (for this predictor's instrument unless one is given)"""
+        # Load trained model (kept across calls by long-lived callers)
+        if self.model is None:
+            self.load_model()
+        return self.for_instrument(instrument_id).run_selected()
+    
+    def run_selected(self):
+        """Predict the selected instrument, through the cache when there is one"""
+        # Reuse the last result while the latest bar and the model are unchanged; concurrent
+        # misses for the same bar wait for one prediction instead of each running the model
+        if self.prediction_cache is not None:
+            key = self.cache_keys([self.instrument_id])[self.instrument_id]
+            if key:
+                return self.prediction_cache.get_or_compute(key, self.predict_selected)
+        return self.predict_selected()
+    
+    def predict_selected(self):
+        """Fetch the selected instrument's latest bars and predict them"""
         # Fetch latest data
         self.fetch_latest_data_from_db()
         
         # Make predictions
         predictions = self.predict_future_prices()
         
+        return self.build_result(predictions, self.predict_price_samples())
+    
+    def run_all(self, instrument_ids=None):
+        """Forecast every instrument with one batched model invocation - returns JSON data"""
+        if self.model is None:
+            self.load_model()
+        instrument_ids = instrument_ids or list(self.scalers)
+        for instrument_id in instrument_ids:
+            self.check_instrument(instrument_id)
+        
+        # Only instruments without a cached result go through the model
+        results = {}
+        if self.prediction_cache is not None:
+            keys = self.cache_keys(instrument_ids)
+            results = self.cached_results(keys)
+        missing = [instrument_id for instrument_id in instrument_ids if instrument_id not in results]
+        if missing:
+            results.update(self.predict_instruments(missing))
+            if self.prediction_cache is not None:
+                for instrument_id in missing:
+                    if keys[instrument_id]:
+                        self.prediction_cache.put(keys[instrument_id], results[instrument_id])
+        
+        return {
+            'success': True,
+            'timestamp': datetime.now().isoformat(),
+            'results': {instrument_id: results[instrument_id] for instrument_id in instrument_ids}
+        }
+    
+    def predict_instruments(self, instrument_ids, histories=None):
+        """Results for several instruments from one batched model invocation (on histories, if given)"""
+        # Fetch latest data for all instruments
+        histories = histories or self.fetch_latest_windows(instrument_ids)
+        
+        # Normalize each window with its instrument's scaler and predict them together
+        predictions_norm = self.forecast_histories(histories, instrument_ids)
+        samples_norm = None
+        if self.supports_uncertainty:
+            samples_norm = self.forecast_histories(histories, instrument_ids, samples=self.uncertainty_samples)
+        
+        results = {}
+        for index, (instrument_id, row) in enumerate(zip(instrument_ids, predictions_norm)):
+            view = self.for_instrument(instrument_id)
+            view.set_data(histories[instrument_id])
+            predictions = view.denormalize(row)
+            samples = None if samples_norm is None else view.denormalize(samples_norm[:, index])
+            results[instrument_id] = view.build_result(predictions, samples)
+        
+        return results
+    
+    def build_result(self, predictions, samples=None):
+        """Build the JSON response for the selected instrument's predictions (and forecast samples)"""
         # Calculate signals
-        predictions_data = self.calculate_signals(predictions)
+        predictions_data = self.calculate_signals(predictions, samples)
         
         # Get trend analysis
         trend_analysis = self.get_trend_analysis(predictions)
@@ -271,14 +484,22 @@ class BTCPricePredictor:
         result = {
             'success': True,
             'timestamp': datetime.now().isoformat(),
+            'instrumentId': self.instrument_id,
             'currentPrice': float(self.current_price),
             'yesterdayPrice': float(self.yesterday_price),
             'todayChange': float(today_change),
-            'latestDataDate': self.data.index[-1].strftime('%Y-%m-%d'),
+            'latestDataDate': from_epoch_ms(self.data['timestamp'][-1]).strftime('%Y-%m-%d'),
             'modelInfo': {
                 'sequenceLength': self.seq_length,
                 'predictionSteps': self.prediction_steps,
-                'device': str(self.device)
+                'device': str(self.device),
+                'computeMode': self.compute_mode,
+                'trainedAt': self.model_metadata.get('created_at'),
+                'uncertainty': {
+                    'method': 'mc_dropout',
+                    'samples': self.uncertainty_samples,
+                    'interval': self.interval
+                } if samples is not None else None
             },
             'predictions': predictions_data,
             'analysis': trend_analysis
@@ -294,14 +515,27 @@ def main():
         script_dir = os.path.dirname(os.path.abspath(__file__))
         os.chdir(script_dir)
         
-        # Create predictor
-        predictor = BTCPricePredictor()
+        # Create predictor (a one-shot process can only reuse results through the on-disk cache)
+        cache_dir = os.getenv('PREDICTION_CACHE_DIR')
+        predictor = BTCPricePredictor(
+            model_format=os.getenv('PREDICTION_MODEL_FORMAT', 'eager'),
+            uncertainty_samples=int(os.getenv('PREDICTION_UNCERTAINTY_SAMPLES', '100')),
+            compute_mode=os.getenv('PREDICTION_COMPUTE_MODE', 'fp32'),
+            prediction_cache=PredictionCache(cache_dir=cache_dir) if cache_dir else None
+        )
         
-        # Run prediction
-        result = predictor.run()
+        # Run prediction: no arguments for Bitcoin, instrument ids for those instruments,
+        # or "all" for every instrument the model was trained on
+        args = sys.argv[1:]
+        if args == ['all']:
+            result = predictor.run_all()
+        elif len(args) > 1:
+            result = predictor.run_all(args)
+        else:
+            result = predictor.run(args[0] if args else None)
         
-        # Output JSON to stdout
-        print(json.dumps(result, indent=2))
+        # Output JSON to stdout (compact; the caller parses it)
+        print(json.dumps(result, separators=(',', ':')))
         
         return 0
         
@@ -311,7 +545,7 @@ def main():
             'error': str(e),
             'timestamp': datetime.now().isoformat()
         }
-        print(json.dumps(error_result, indent=2))
+        print(json.dumps(error_result, separators=(',', ':')))
         return 1
 
 
@@ -0,0 +1,188 @@
+"""
+Vectorized Backtester
+Replays the instrument_prices history: model forecasts for every as-of date in batched
+passes, the trend recommendation rules of api_predict.py, TRADE_AMOUNT position sizing
+and SLIPPAGE costs, with PnL, drawdown, hit rate and turnover computed as array operations
+
+Usage: python backtest.py [instrument_id ...] [--synthetic ROWS] [--allow-short] [--json results.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from api_predict import BTCPricePredictor
+from config.settings import SLIPPAGE, TRADE_AMOUNT
+from data.synthetic import SQLitePriceStore
+from strategies.signals import percent_change, trend_positions
+from utils.db import from_epoch_ms, get_pool
+
+
+def forecast_history(predictor, histories, batch_size=4096):
+    """Forecast from every bar that has a full window before it, all instruments in shared batches
+
+    Returns {instrument_id: predictions (bars - seq_length + 1, prediction_steps)}; row i is the
+    forecast made at the close of bar i + seq_length - 1.
+    """
+    if predictor.preprocessor is not None:
+        raise Exception("Backtesting models trained with indicator features is not supported")
+    windows_norm = [
+        predictor.normalize(np.lib.stride_tricks.sliding_window_view(prices['close'], predictor.seq_length),
+                            instrument_id)
+        for instrument_id, prices in histories.items()
+    ]
+    windows_norm = np.concatenate(windows_norm)
+
+    predictions_norm = np.empty((len(windows_norm), predictor.prediction_steps))
+    for start in range(0, len(windows_norm), batch_size):
+        predictions_norm[start:start + batch_size] = predictor.forecast_windows(windows_norm[start:start + batch_size])
+
+    forecasts = {}
+    offset = 0
+    for instrument_id, prices in histories.items():
+        count = len(prices['close']) - predictor.seq_length + 1
+        forecasts[instrument_id] = predictor.denormalize(predictions_norm[offset:offset + count], instrument_id)
+        offset += count
+    return forecasts
+
+
+def backtest_instrument(closes, predictions, seq_length, trade_amount=TRADE_AMOUNT, slippage=SLIPPAGE,
+                        allow_short=False):
+    """Trade one instrument on its as-of forecasts; returns metrics and the equity curve
+
+    At each close the recommendation (average predicted change vs yesterday, as in
+    get_trend_analysis) sets the position for the next bar: trade_amount units long on
+    BUY/STRONG_BUY, flat (or short with allow_short) on SELL/STRONG_SELL. Every change of
+    position pays `slippage` percent of the traded notional, including closing the position
+    still open after the last bar at its close, so the PnL is net of every cost to go flat.
+    """
+    # As-of bars t = seq_length - 1 .. n - 2 (the last forecast has no next bar to trade)
+    as_of = np.arange(seq_length - 1, len(closes) - 1)
+    predictions = predictions[:len(as_of)]
+    current, yesterday, next_close = closes[as_of], closes[as_of - 1], closes[as_of + 1]
+
+    average_changes = percent_change(predictions, yesterday[:, np.newaxis]).mean(axis=1)
+    positions = trend_positions(average_changes, trade_amount, allow_short)
+
+    # Fills at the as-of close; slippage on every position change, starting flat
+    trades = np.diff(positions, prepend=0.0)
+    costs = np.abs(trades) * current * slippage / 100
+    pnl = positions * (next_close - current) - costs
+    # Close out at the final close (next_close[-1]) so an open position still pays its exit
+    closing_trade = -positions[-1]
+    closing_cost = abs(closing_trade) * next_close[-1] * slippage / 100
+    pnl[-1] -= closing_cost
+    equity = np.cumsum(pnl)
+    drawdown = equity - np.maximum.accumulate(np.maximum(equity, 0.0))
+
+    invested = positions != 0
+    day_one_direction = np.sign(predictions[:, 0] - current) == np.sign(next_close - current)
+    return {
+        'bars': int(len(as_of)),
+        'pnl': float(equity[-1]),
+        'grossPnl': float(np.sum(positions * (next_close - current))),
+        'costs': float(costs.sum() + closing_cost),
+        'closingCost': float(closing_cost),
+        'buyAndHoldPnl': float(trade_amount * (closes[-1] - current[0])),
+        'maxDrawdown': float(-drawdown.min()),
+        'hitRate': float(np.mean(pnl[invested] > 0)) if invested.any() else 0.0,
+        'directionalAccuracy': float(day_one_direction.mean()),
+        'exposure': float(invested.mean()),
+        'trades': int(np.count_nonzero(trades) + (closing_trade != 0)),
+        'turnover': float(np.sum(np.abs(trades) * current) + abs(closing_trade) * next_close[-1]),
+    }, equity
+
+
+def run_backtest(predictor, source, instrument_ids=None, allow_short=False):
+    """Fetch full histories from `source` (a ConnectionPool or SQLitePriceStore) and backtest each instrument"""
+    if predictor.model is None:
+        predictor.load_model()
+    instrument_ids = instrument_ids or list(predictor.scalers)
+
+    start = time.perf_counter()
+    histories = {}
+    for instrument_id in instrument_ids:
+        predictor.check_instrument(instrument_id)
+        histories[instrument_id] = source.fetch_price_history(instrument_id, dtype=np.float64)
+        if len(histories[instrument_id]['close']) < predictor.seq_length + 2:
+            raise Exception(f"Not enough data to backtest instrument {instrument_id}")
+    fetched = time.perf_counter()
+
+    forecasts = forecast_history(predictor, histories)
+    forecasted = time.perf_counter()
+
+    results = {}
+    for instrument_id, prices in histories.items():
+        metrics, _ = backtest_instrument(prices['close'], forecasts[instrument_id], predictor.seq_length,
+                                         allow_short=allow_short)
+        metrics['start'] = from_epoch_ms(prices['timestamp'][predictor.seq_length - 1]).strftime('%Y-%m-%d')
+        metrics['end'] = from_epoch_ms(prices['timestamp'][-1]).strftime('%Y-%m-%d')
+        results[instrument_id] = metrics
+    finished = time.perf_counter()
+
+    return {
+        'tradeAmount': TRADE_AMOUNT,
+        'slippagePercent': SLIPPAGE,
+        'allowShort': allow_short,
+        'instruments': results,
+        'totalPnl': float(sum(metrics['pnl'] for metrics in results.values())),
+        'timings': {
+            'fetchSeconds': fetched - start,
+            'forecastSeconds': forecasted - fetched,
+            'metricsSeconds': finished - forecasted,
+            'forecastsPerSecond': sum(len(f) for f in forecasts.values()) / (forecasted - fetched),
+        },
+    }
+
+
+def print_report(report):
+    print(f"\nBacktest (trade amount {report['tradeAmount']}, slippage {report['slippagePercent']}%"
+          f"{', long/short' if report['allowShort'] else ', long/flat'})")
+    print("=" * 80)
+    for instrument_id, metrics in report['instruments'].items():
+        print(f"\n{instrument_id} ({metrics['start']} to {metrics['end']}, {metrics['bars']} bars)")
+        print(f"  PnL:                  ${metrics['pnl']:,.2f} (gross ${metrics['grossPnl']:,.2f}, "
+              f"costs ${metrics['costs']:,.2f} incl. ${metrics['closingCost']:,.2f} closing the final position)")
+        print(f"  Buy and hold PnL:     ${metrics['buyAndHoldPnl']:,.2f}")
+        print(f"  Max drawdown:         ${metrics['maxDrawdown']:,.2f}")
+        print(f"  Hit rate:             {metrics['hitRate']:.1%} of invested bars")
+        print(f"  Direction accuracy:   {metrics['directionalAccuracy']:.1%} (day-1 forecast)")
+        print(f"  Exposure:             {metrics['exposure']:.1%}")
+        print(f"  Trades / turnover:    {metrics['trades']} / ${metrics['turnover']:,.2f}")
+    timings = report['timings']
+    print(f"\nTotal PnL: ${report['totalPnl']:,.2f}")
+    print(f"Fetch {timings['fetchSeconds']:.2f}s, forecasts {timings['forecastSeconds']:.2f}s "
+          f"({timings['forecastsPerSecond']:,.0f}/s), metrics {timings['metricsSeconds'] * 1000:.1f}ms")
+    print("=" * 80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('instrument_ids', nargs='*', help='Instruments to backtest (default: all the model knows)')
+    parser.add_argument('--synthetic', type=int, metavar='ROWS',
+                        help='Backtest on this many synthetic bars per instrument instead of the database')
+    parser.add_argument('--allow-short', action='store_true', help='Go short on SELL/STRONG_SELL instead of flat')
+    parser.add_argument('--json', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    # Model paths are relative to this script, like api_predict.py
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    predictor = BTCPricePredictor(model_format=os.getenv('PREDICTION_MODEL_FORMAT', 'eager'))
+    predictor.load_model()
+    instrument_ids = args.instrument_ids or list(predictor.scalers)
+    source = SQLitePriceStore.synthetic(instrument_ids, args.synthetic) if args.synthetic else get_pool()
+
+    report = run_backtest(predictor, source, instrument_ids, allow_short=args.allow_short)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Trading Bot Benchmarks
+Times the hot paths offline against synthetic prices in a SQLite stand-in for
+instrument_prices: sequence creation, one training epoch, the latest-bars fetch/decode,
+predict_future_prices, the end-to-end BTCPricePredictor.run() and a strategy engine tick;
+optionally the same training epoch and forecast in each reduced-precision / compiled mode
+of compute_mode.py
+
+Usage: python benchmark.py [--rows 3000] [--instruments 1] [--output results.json]
+                           [--compare baseline.json] [--tolerance 0.2]
+                           [--compute-modes bf16 compile bf16-compile]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import torch
+
+from api_predict import BTCPricePredictor
+from bot import BTCTradingBot
+from compute_mode import COMPUTE_MODES, host_info
+from data.synthetic import SQLitePriceStore
+from strategies.base import TrendStrategy
+from strategies.engine import StrategyEngine, market_snapshot
+
+
+def summarize(latencies, items=1):
+    """p50/p99/mean latency in ms and throughput in items per second"""
+    latencies = np.asarray(latencies)
+    return {
+        'iterations': len(latencies),
+        'items': items,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'mean_ms': float(latencies.mean() * 1000),
+        'throughput': float(items / latencies.mean()),
+    }
+
+
+def time_calls(fn, iterations, warmup=3):
+    """Latency in seconds of each of `iterations` calls to fn()"""
+    for _ in range(warmup):
+        fn()
+    latencies = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+
+def run_benchmarks(rows=3000, instruments=1, iterations=200, epochs=3, seed=0):
+    """Run every stage in a scratch directory; returns {stage: summary}"""
+    instrument_ids = [f"synthetic-{i}" for i in range(instruments)]
+    store = SQLitePriceStore.synthetic(instrument_ids, rows, seed=seed)
+    torch.manual_seed(seed)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as scratch, contextlib.redirect_stdout(io.StringIO()):
+        # The bot writes its checkpoint, scaler and charts to the working directory
+        cwd = os.getcwd()
+        os.chdir(scratch)
+        try:
+            bot = BTCTradingBot(instrument_ids=instrument_ids, price_cache_dir=None, pool=store, render_charts=False)
+            bot.fetch_btc_data_from_db()
+
+            series = bot.scaler.fit_transform(bot.data['Close'].values.reshape(-1, 1)).flatten()
+            windows = len(series) - bot.seq_length
+            results['create_sequences'] = summarize(
+                time_calls(lambda: bot.create_sequences(series, bot.seq_length), iterations), windows
+            )
+
+            results['fetch_price_history'] = summarize(
+                time_calls(lambda: store.fetch_price_history(instrument_ids[0], dtype=np.float64), 20), rows
+            )
+
+            bot.train_model(epochs=epochs, patience=epochs)
+            # Training windows per instrument after the chronological 80/20 split
+            n_train = sum(len(data) - bot.seq_length - math.ceil(0.2 * (len(data) - bot.seq_length))
+                          for data in bot.instrument_data.values())
+            results['train_epoch'] = summarize(bot.epoch_times, n_train)
+
+            predictor = BTCPricePredictor(model_path=bot.best_model_path, scaler_path=bot.scaler_path,
+                                          instrument_id=instrument_ids[0], pool=store)
+            predictor.load_model()
+
+            results['fetch_latest_data'] = summarize(
+                time_calls(predictor.fetch_latest_data_from_db, iterations), predictor.seq_length + 10
+            )
+            results['predict_future_prices'] = summarize(
+                time_calls(predictor.predict_future_prices, iterations)
+            )
+            results['run'] = summarize(time_calls(predictor.run, iterations))
+
+            # Strategy evaluation and order generation only; the snapshot is built once
+            engine = StrategyEngine([TrendStrategy(), TrendStrategy(allow_short=True)], instrument_ids,
+                                    budget_ms=float('inf'))
+            snapshot = market_snapshot(predictor, predictor.fetch_latest_windows(instrument_ids), instrument_ids,
+                                       intervals=False)
+            results['strategy_tick'] = summarize(time_calls(lambda: engine.tick(snapshot), iterations),
+                                                 len(engine.strategies) * instruments)
+            if instruments > 1:
+                results['run_all'] = summarize(time_calls(predictor.run_all, iterations), instruments)
+        finally:
+            os.chdir(cwd)
+            store.close()
+
+    return results
+
+
+def run_compute_modes(modes, rows=3000, iterations=200, epochs=3, seed=0):
+    """Training epoch and forecast latency per compute mode, with their drift from fp32
+
+    Every mode trains from the same seed; forecasts all use the fp32-trained checkpoint so
+    they can be compared directly. The first (compiling) epoch is excluded from the timings.
+    """
+    instrument_ids = ['synthetic-0']
+    store = SQLitePriceStore.synthetic(instrument_ids, rows, seed=seed)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as scratch, contextlib.redirect_stdout(io.StringIO()):
+        cwd = os.getcwd()
+        os.chdir(scratch)
+        try:
+            for mode in ['fp32'] + [mode for mode in modes if mode != 'fp32']:
+                os.makedirs(mode)
+                os.chdir(mode)
+                torch.manual_seed(seed)
+                bot = BTCTradingBot(instrument_ids=instrument_ids, price_cache_dir=None, pool=store, render_charts=False)
+                bot.fetch_btc_data_from_db()
+                _, val_losses = bot.train_model(epochs=epochs + 1, patience=epochs + 1, compute_mode=mode)
+                os.chdir(scratch)
+
+                predictor = BTCPricePredictor(model_path=os.path.join('fp32', bot.best_model_path),
+                                              scaler_path=os.path.join('fp32', bot.scaler_path),
+                                              instrument_id=instrument_ids[0], pool=store, compute_mode=mode)
+                predictor.load_model()
+                predictor.fetch_latest_data_from_db()
+                forecast = predictor.predict_future_prices()
+                results[mode] = {
+                    'train_epoch': summarize(bot.epoch_times[1:]),
+                    'predict_future_prices': summarize(time_calls(predictor.predict_future_prices, iterations)),
+                    'final_val_loss': val_losses[-1],
+                    'forecast': forecast.tolist(),
+                    # False when the mode failed its check against fp32 and fell back
+                    'active': predictor.compute_mode == mode and bot.compute_mode == mode,
+                }
+        finally:
+            os.chdir(cwd)
+            store.close()
+
+    reference = results['fp32']
+    for result in results.values():
+        result['val_loss_change'] = result['final_val_loss'] / reference['final_val_loss'] - 1
+        result['forecast_max_change'] = float(np.max(np.abs(np.asarray(result['forecast']) / reference['forecast'] - 1)))
+    return results
+
+
+def print_compute_modes(results):
+    print(f"\n{'Mode':<14} {'epoch p50':>11} {'speedup':>8} {'forecast p50':>13} {'speedup':>8} "
+          f"{'val loss':>9} {'forecast':>9}")
+    print("-" * 80)
+    reference = results['fp32']
+    for mode, result in results.items():
+        train_speedup = reference['train_epoch']['p50_ms'] / result['train_epoch']['p50_ms']
+        predict_speedup = reference['predict_future_prices']['p50_ms'] / result['predict_future_prices']['p50_ms']
+        print(f"{mode:<14} {result['train_epoch']['p50_ms']:>9.1f}ms {train_speedup:>7.2f}x "
+              f"{result['predict_future_prices']['p50_ms']:>11.3f}ms {predict_speedup:>7.2f}x "
+              f"{result['val_loss_change']:>+8.2%} {result['forecast_max_change']:>+8.3%}"
+              f"{'' if result['active'] else '  (fell back to fp32)'}")
+    best_train = min(results, key=lambda mode: results[mode]['train_epoch']['p50_ms'])
+    best_predict = min(results, key=lambda mode: results[mode]['predict_future_prices']['p50_ms'])
+    print(f"Fastest on this host: TRAINING_COMPUTE_MODE={best_train}, PREDICTION_COMPUTE_MODE={best_predict}")
+    print("val loss / forecast: change of the final validation loss and largest forecast change vs fp32")
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Stages whose p50 latency grew by more than `tolerance` against a previous results file"""
+    regressions = []
+    for key in ('rows', 'instruments', 'epochs'):
+        if results['config'].get(key) != baseline['config'].get(key):
+            print(f"Warning: baseline was run with {key}={baseline['config'].get(key)}, "
+                  f"this run used {key}={results['config'].get(key)}")
+    print(f"\n{'Stage':<24} {'baseline p50':>14} {'p50':>10} {'change':>9}")
+    print("-" * 60)
+    for stage, result in results['stages'].items():
+        if stage not in baseline['stages']:
+            continue
+        before = baseline['stages'][stage]['p50_ms']
+        change = result['p50_ms'] / before - 1
+        print(f"{stage:<24} {before:>12.3f}ms {result['p50_ms']:>8.3f}ms {change:>+8.1%}")
+        if change > tolerance:
+            regressions.append(stage)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=3000, help='Synthetic daily bars per instrument')
+    parser.add_argument('--instruments', type=int, default=1)
+    parser.add_argument('--iterations', type=int, default=200, help='Timed calls per inference stage')
+    parser.add_argument('--epochs', type=int, default=3, help='Timed training epochs')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Previous results JSON to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p50 slowdown before failing')
+    parser.add_argument('--compute-modes', nargs='+', choices=COMPUTE_MODES,
+                        help='Also time training and forecasts in these modes against fp32')
+    args = parser.parse_args()
+
+    stages = run_benchmarks(args.rows, args.instruments, args.iterations, args.epochs)
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'config': vars(args),
+        'environment': {
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'torch_threads': torch.get_num_threads(),
+            **host_info(),
+        },
+        'stages': stages,
+    }
+    if args.compute_modes:
+        results['compute_modes'] = run_compute_modes(args.compute_modes, args.rows, args.iterations, args.epochs)
+
+    print(f"\n{'Stage':<24} {'p50 (ms)':>10} {'p99 (ms)':>10} {'throughput':>14}")
+    print("-" * 60)
+    for stage, result in stages.items():
+        print(f"{stage:<24} {result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} {result['throughput']:>12,.0f}/s")
+    print("Throughput counts windows, rows, training samples, predictions or strategy-instrument "
+          "evaluations per second, by stage")
+    if args.compute_modes:
+        environment = results['environment']
+        print(f"\nHost: {environment['cpu']} ({environment['cpu_capability']}, "
+              f"native bf16: {'yes' if environment['native_bf16'] else 'no'})")
+        print_compute_modes(results['compute_modes'])
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nRegressions over {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,71 +5,77 @@ Fetches data from MySQL database and trains model with early stopping
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import torch
 import torch.nn as nn
 import torch.optim as optim
-import pymysql
 from datetime import datetime, timedelta
 from sklearn.preprocessing import MinMaxScaler
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, mean_absolute_error
 import pickle
+import copy
 import warnings
 import os
-from dotenv import load_dotenv
-
-warnings.filterwarnings('ignore')
-
-# Load environment variables from .env file
-load_dotenv('../../server/.env')
-
-# Database configuration from .env
-DB_CONFIG = {
-    'charset': os.getenv('DB_CHARSET', 'utf8mb4'),
-    'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '10')),
-    'cursorclass': pymysql.cursors.DictCursor,
-    'db': os.getenv('DB_NAME'),
-    'host': os.getenv('DB_HOST'),
-    'password': os.getenv('DB_PASSWORD'),
-    'read_timeout': int(os.getenv('DB_READ_TIMEOUT', '10')),
-    'port': int(os.getenv('DB_PORT', '3306')),
-    'user': os.getenv('DB_USER'),
-    'write_timeout': int(os.getenv('DB_WRITE_TIMEOUT', '10')),
-}
+import sys
+import time
 
+from compute_mode import agrees, autocast, compile_module, validate
+from config.settings import INSTRUMENT_IDS
+from data.data_preprocessor import FeaturePipeline, ForecastInputs
+from data.price_cache import PriceCache
+from data.window_dataset import SlidingWindowDataset
+from lstm_model import LSTMModel
+from model_artifact import artifact_path, save_artifact, scaler_params, training_metadata, unscale
+from utils.charts import ChartRenderer, charts_enabled
+from utils.checkpoint import CheckpointWriter, atomic_torch_save, atomic_write, snapshot
+from utils.db import get_pool
+from utils.telemetry import TrainingTelemetry
 
-class LSTMModel(nn.Module):
-    """LSTM Model for Bitcoin Price Prediction"""
-    def __init__(self, input_size=1, hidden_layer_size=64, output_size=1):
-        super(LSTMModel, self).__init__()
-        self.hidden_layer_size = hidden_layer_size
-        self.lstm = nn.LSTM(input_size, hidden_layer_size)
-        self.linear = nn.Linear(hidden_layer_size, output_size)
-        self.hidden_cell = (torch.zeros(1, 1, self.hidden_layer_size),
-                            torch.zeros(1, 1, self.hidden_layer_size))
-
-    def forward(self, input_seq):
-        lstm_out, self.hidden_cell = self.lstm(input_seq.view(len(input_seq), 1, -1), self.hidden_cell)
-        predictions = self.linear(lstm_out.view(len(input_seq), -1))
-        return predictions[-1]
+warnings.filterwarnings('ignore')
 
 
 class BTCTradingBot:
     """Bitcoin Trading Bot with LSTM Predictions"""
     
-    def __init__(self, seq_length=10, prediction_steps=5, hidden_size=64):
+    def __init__(self, seq_length=10, prediction_steps=5, hidden_size=64, batch_size=64, stateful_forecast=False,
+                 instrument_ids=None, price_cache_dir='price_cache', pool=None, features=None, dropout=0.1,
+                 render_charts=True):
         self.seq_length = seq_length
         self.prediction_steps = prediction_steps
         self.hidden_size = hidden_size
-        self.scaler = MinMaxScaler(feature_range=(0, 1))
+        # Dropout before the output layer; api_predict.py samples it (MC dropout) for prediction intervals
+        self.dropout = dropout
+        self.batch_size = batch_size
+        # Stateful forecasts only match sliding-window ones on day 1; see LSTMModel.forecast
+        self.stateful_forecast = stateful_forecast
+        # One shared model; each instrument is normalized by its own scaler
+        self.instrument_ids = list(instrument_ids or INSTRUMENT_IDS)
+        self.scalers = {instrument_id: MinMaxScaler(feature_range=(0, 1)) for instrument_id in self.instrument_ids}
+        self.instrument_data = {}
+        # self.scaler / self.data / self.current_price refer to the first (primary) instrument
+        self.scaler = self.scalers[self.instrument_ids[0]]
         self.model = None
+        self.optimizer = None
         self.data = None
         self.current_price = None
         self.best_model_path = 'best_btc_lstm_model.pth'
         self.scaler_path = 'scaler.pkl'
+        # Local copy of instrument_prices; only rows newer than its watermark are fetched (None disables it)
+        self.price_cache = PriceCache(price_cache_dir) if price_cache_dir else None
+        # Price source with the ConnectionPool fetch methods (defaults to the shared MySQL pool)
+        self.pool = pool
+        # Indicator inputs next to the normalized close (names from data/data_preprocessor.py FEATURES)
+        self.preprocessor = FeaturePipeline(features) if features else None
+        self.input_size = 1 + (len(self.preprocessor.features) if self.preprocessor else 0)
         self.best_val_loss = float('inf')
         self.patience_counter = 0
+        self.compute_mode = 'fp32'  # Of the last train_model call, after any fallback
+        self.epoch_times = []  # Seconds per epoch (training + validation) of the last train_model call
+        # Writes checkpoints off the training thread; save_model only snapshots into memory
+        self.checkpoint_writer = CheckpointWriter(self.write_checkpoint)
+        self.written_scaler = None
+        self.scaler_state = None  # Serialized scalers for checkpoints, rebuilt only after a (re)fit
+        # PNG charts are drawn on a background thread after training/prediction (render_charts=False skips them)
+        self.charts = ChartRenderer(render_charts)
         
         # Setup device (GPU if available, otherwise CPU)
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -80,40 +86,38 @@ class BTCTradingBot:
             print(f"   Memory Available: {torch.cuda.get_device_properties(0).total_memory / 1e9:.2f} GB")
         
     def fetch_btc_data_from_db(self):
-        """Fetch Bitcoin price data from MySQL database"""
-        print("Fetching Bitcoin data from database...")
+        """Fetch price data for every configured instrument from MySQL database"""
+        print(f"Fetching price data for {len(self.instrument_ids)} instrument(s) from database...")
         try:
-            connection = pymysql.connect(**DB_CONFIG)
-            cursor = connection.cursor()
-            
-            # Fetch instrument_prices data
-            cursor.execute("""
-                SELECT timestamp, close_price 
-                FROM instrument_prices 
-                WHERE instrument_id = '2376ac2b-fe9f-41ad-bb47-deb6d30d3253'
-                ORDER BY timestamp ASC
-            """)
+            pool = self.pool or get_pool()
             
-            rows = cursor.fetchall()
-            connection.close()
-            
-            if not rows:
-                print("No data found in database")
-                return False
-            
-            # Convert to DataFrame
-            df = pd.DataFrame(rows)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df['close_price'] = df['close_price'].astype(float)  # Convert Decimal to float
-            df = df.rename(columns={'close_price': 'Close', 'timestamp': 'Date'})
-            df = df.set_index('Date')
+            for instrument_id in self.instrument_ids:
+                if self.price_cache:
+                    new_rows = self.price_cache.refresh(pool, instrument_id)
+                    df = self.load_cached_prices(instrument_id)
+                    if df is None:
+                        print(f"No data found in database for instrument {instrument_id}")
+                        return False
+                    self.instrument_data[instrument_id] = df
+                    print(f"Loaded {len(df)} records for {instrument_id} ({new_rows} new since last run)")
+                    print(f"  Date range: {df.index[0]} to {df.index[-1]}")
+                    continue
+                
+                # Stream instrument_prices data straight into arrays
+                prices = pool.fetch_price_history(instrument_id, columns=('close', 'volume'), dtype=np.float64)
+                if not len(prices['timestamp']):
+                    print(f"No data found in database for instrument {instrument_id}")
+                    return False
+                
+                df = self.prices_to_frame(prices)
+                self.instrument_data[instrument_id] = df
+                
+                print(f"Fetched {len(df)} records for {instrument_id}")
+                print(f"  Date range: {df.index[0]} to {df.index[-1]}")
             
-            self.data = df[['Close']].copy()
+            self.data = self.instrument_data[self.instrument_ids[0]]
             self.current_price = float(self.data['Close'].iloc[-1])
-            
-            print(f"Fetched {len(self.data)} records from database")
-            print(f"Date range: {df.index[0]} to {df.index[-1]}")
-            print(f"Current BTC Price: ${self.current_price:,.2f}")
+            print(f"Current Price ({self.instrument_ids[0]}): ${self.current_price:,.2f}")
             return True
             
         except Exception as e:
@@ -122,32 +126,116 @@ class BTCTradingBot:
             traceback.print_exc()
             return False
     
+    def load_cached_prices(self, instrument_id):
+        """Close prices of one instrument from the local price cache as a DataFrame"""
+        prices = self.price_cache.load(instrument_id)
+        if not len(prices['timestamp']):
+            return None
+        return self.prices_to_frame(prices)
+    
+    def prices_to_frame(self, prices):
+        """Build the Close (and Volume, when fetched) DataFrame from timestamp/close/volume arrays"""
+        index = pd.to_datetime(prices['timestamp'], unit='ms').rename('Date')
+        columns = {'Close': prices['close']}
+        if 'volume' in prices:
+            columns['Volume'] = prices['volume']
+        return pd.DataFrame(columns, index=index)
+    
+    def model_inputs(self, instrument_id, fit=False):
+        """Normalized close of one instrument, plus feature columns when configured
+        
+        Returns (inputs, first_bar): inputs is 1-D, or (bars, input_size) with the close in
+        column 0; feature models drop the indicator warm-up, so inputs start at bar first_bar.
+        """
+        df = self.instrument_data[instrument_id]
+        closes = df['Close'].values.reshape(-1, 1)
+        scaler = self.scalers[instrument_id]
+        if fit:
+            self.scaler_state = None
+        normalized = (scaler.fit_transform(closes) if fit else scaler.transform(closes)).flatten()
+        if self.preprocessor is None:
+            return normalized, 0
+        
+        features = self.preprocessor.transform(df['Close'].values, df['Volume'].values if 'Volume' in df else None)
+        first_bar = self.preprocessor.warmup
+        return np.column_stack([normalized, features])[first_bar:], first_bar
+    
     def create_sequences(self, data, seq_length):
-        """Create sequences for LSTM training"""
-        xs, ys = [], []
-        for i in range(len(data) - seq_length):
-            x = data[i:(i + seq_length)]
-            y = data[i + seq_length]
-            xs.append(x)
-            ys.append(y)
-        return np.array(xs), np.array(ys)
+        """Create sequences for LSTM training (read-only strided views, no copy)"""
+        dataset = SlidingWindowDataset(data, seq_length, dtype=np.asarray(data).dtype)
+        return dataset.X, dataset.y
+    
+    def save_model(self, wait=False):
+        """Queue the best model, optimizer state and scaler for the background checkpoint writer
+        
+        Only an in-memory CPU snapshot is taken here; the files are written atomically by
+        write_checkpoint on the writer thread (see utils/checkpoint.py), so the epoch loop never
+        waits on disk. wait=True blocks until they are on disk.
+        """
+        feature_config = self.preprocessor.config() if self.preprocessor else None
+        # Scalers do not change after fitting, so every save shares one serialized copy
+        scaler_file, scalers = self.scaler_snapshot()
+        self.checkpoint_writer.submit({
+            'checkpoint': snapshot({
+                'model_state_dict': self.model.state_dict(),
+                'hidden_size': self.hidden_size,
+                'seq_length': self.seq_length,
+                'prediction_steps': self.prediction_steps,
+                'best_val_loss': self.best_val_loss,
+                'instrument_ids': self.instrument_ids,
+                'input_size': self.input_size,
+                'feature_config': feature_config,
+                'dropout': self.dropout,
+                'compute_mode': self.compute_mode,
+                # Resume state for fine_tune: optimizer moments and the newest bar trained on per instrument
+                'optimizer_state_dict': self.optimizer.state_dict() if self.optimizer else None,
+                'data_watermarks': self.data_watermarks()
+            }),
+            'scaler': scaler_file,
+            'scalers': scalers,
+            'model_path': os.path.abspath(self.best_model_path),
+            'scaler_path': os.path.abspath(self.scaler_path),
+        })
+        if wait:
+            self.checkpoint_writer.flush()
     
-    def save_model(self):
-        """Save the best model and scaler"""
-        torch.save({
-            'model_state_dict': self.model.state_dict(),
-            'hidden_size': self.hidden_size,
-            'seq_length': self.seq_length,
-            'prediction_steps': self.prediction_steps,
-            'best_val_loss': self.best_val_loss
-        }, self.best_model_path)
-        
-        # Save scaler
-        with open(self.scaler_path, 'wb') as f:
-            pickle.dump(self.scaler, f)
-        print(f"Model saved to {self.best_model_path}")
+    def scaler_snapshot(self):
+        """(scaler.pkl contents, private copy of self.scalers), built once per fit
+        
+        scaler.pkl holds a plain scaler for one instrument, {instrument_id: scaler} for several.
+        """
+        if self.scaler_state is None:
+            self.scaler_state = (pickle.dumps(self.scaler if len(self.instrument_ids) == 1 else self.scalers),
+                                 copy.deepcopy(self.scalers))
+        return self.scaler_state
+    
+    def write_checkpoint(self, state):
+        """Write one save_model snapshot (runs on the checkpoint writer thread)"""
+        checkpoint = state['checkpoint']
+        
+        # The scaler is fitted once per training run; rewrite it only when it changed
+        if state['scaler'] != self.written_scaler or not os.path.exists(state['scaler_path']):
+            atomic_write(state['scaler_path'], lambda f: f.write(state['scaler']))
+            self.written_scaler = state['scaler']
+        atomic_torch_save(checkpoint, state['model_path'])
+        
+        # Self-contained inference artifact (weights_only/mmap load, no sklearn); written last so
+        # it is never older than the checkpoint
+        save_artifact(artifact_path(state['model_path']), checkpoint['model_state_dict'], checkpoint['hidden_size'],
+                      checkpoint['seq_length'], checkpoint['prediction_steps'], checkpoint['instrument_ids'],
+                      state['scalers'], feature_config=checkpoint['feature_config'], dropout=checkpoint['dropout'],
+                      metadata=training_metadata(checkpoint))
+        print(f"Model saved to {state['model_path']} (Val Loss: {checkpoint['best_val_loss']:.6f})")
+    
+    def data_watermarks(self):
+        """Timestamp (epoch ms) of the newest bar loaded per instrument"""
+        return {instrument_id: int(df.index[-1].value // 1_000_000) for instrument_id, df in self.instrument_data.items()}
     
     def plot_training_history(self, train_losses, val_losses, best_epoch):
+        """Queue the training history chart; it is drawn in the background by self.charts"""
+        self.charts.submit(self.render_training_history, list(train_losses), list(val_losses), best_epoch)
+    
+    def render_training_history(self, plt, train_losses, val_losses, best_epoch):
         """Plot training and validation loss"""
         plt.figure(figsize=(10, 6))
         plt.plot(train_losses, label='Training Loss', linewidth=2)
@@ -163,144 +251,375 @@ class BTCTradingBot:
         print("Training history saved as 'training_history.png'")
         plt.close()
     
-    def train_model(self, epochs=200, patience=20):
-        """Train the LSTM model with early stopping on GPU/CPU"""
+    def train_model(self, epochs=200, patience=20, batch_size=None, eval_batch_size=4096, lazy_batches=False,
+                    learning_rate=0.001, epoch_callback=None, telemetry=None, compute_mode='fp32'):
+        """Train the LSTM model in mini-batches with early stopping on GPU/CPU
+        
+        epoch_callback(epoch, train_loss, val_loss) runs after every epoch; returning True stops
+        training early (used by sweep.py to prune trials that are falling behind).
+        telemetry (a utils/telemetry.py TrainingTelemetry) selects where per-phase timings, gradient
+        norms and losses are written and which epochs are profiled; the records are always kept
+        in self.telemetry.
+        compute_mode (see compute_mode.py) runs the training steps with bf16 autocast and/or
+        torch.compile; validation, and so early stopping, always runs in fp32.
+        """
+        if telemetry is None:
+            telemetry = TrainingTelemetry()
+        elif self.device.type == 'cuda' and telemetry.synchronize is None:
+            # Phase timings are only meaningful once the queued kernels have finished
+            telemetry.synchronize = torch.cuda.synchronize
+        self.telemetry = telemetry
+        setup_start = time.perf_counter()
+        batch_size = batch_size or self.batch_size
         print(f"\nTraining LSTM Model (max {epochs} epochs with early stopping)...")
         print(f"   Device: {self.device}")
-        
-        # Normalize data
-        df_normalized = self.scaler.fit_transform(self.data['Close'].values.reshape(-1, 1)).flatten()
-        
-        # Create sequences
-        X, y = self.create_sequences(df_normalized, self.seq_length)
-        X_train, X_val, y_train, y_val = train_test_split(
-            X, y, test_size=0.2, random_state=42, shuffle=False  # Don't shuffle for time series
-        )
+        print(f"   Batch size: {batch_size}")
+        
+        # Normalize each instrument with its own scaler and create sequences as strided windows
+        # (chronological split per instrument, don't shuffle for time series)
+        train_sets, val_sets = [], []
+        if self.preprocessor is not None:
+            # Indicators have very different ranges; standardize them with stats pooled over the
+            # instruments (fitted on the whole history like the close scalers, saved in feature_config)
+            frames = [self.instrument_data[instrument_id] for instrument_id in self.instrument_ids]
+            self.preprocessor.fit([(df['Close'].values, df['Volume'].values if 'Volume' in df else None) for df in frames])
+        for instrument_id in self.instrument_ids:
+            inputs, _ = self.model_inputs(instrument_id, fit=True)
+            train_set, val_set = SlidingWindowDataset(inputs, self.seq_length).split(test_size=0.2)
+            train_sets.append(train_set)
+            val_sets.append(val_set)
+        n_train = sum(len(train_set) for train_set in train_sets)
+        
+        # Stack sequences into float32 tensors (batch, seq_length, 1) on the device,
+        # or copy each training batch out of the strided views only when it is needed
+        if lazy_batches:
+            train_batches = [(train_set, start) for train_set in train_sets
+                             for start in range(0, len(train_set), batch_size)]
+        else:
+            train_tensors = [train_set.tensors(device=self.device) for train_set in train_sets]
+            X_train = torch.cat([X for X, _ in train_tensors])
+            y_train = torch.cat([y for _, y in train_tensors])
+            train_batches = [(None, start) for start in range(0, n_train, batch_size)]
+        val_tensors = [val_set.tensors(device=self.device) for val_set in val_sets]
+        X_val = torch.cat([X for X, _ in val_tensors])
+        y_val = torch.cat([y for _, y in val_tensors])
+        n_val = len(X_val)
+        telemetry.setup(time.perf_counter() - setup_start, n_train, n_val, self.device)
         
         # Initialize model and move to device (GPU/CPU)
-        self.model = LSTMModel(hidden_layer_size=self.hidden_size).to(self.device)
-        optimizer = optim.Adam(self.model.parameters(), lr=0.001)
+        self.model = LSTMModel(input_size=self.input_size, hidden_layer_size=self.hidden_size,
+                               dropout=self.dropout).to(self.device)
+        optimizer = self.optimizer = optim.Adam(self.model.parameters(), lr=learning_rate)
         loss_function = nn.MSELoss()
+        val_loss_function = nn.MSELoss(reduction='sum')
+        compute_mode, train_forward, optimizer_step = self.prepare_compute_mode(
+            compute_mode, X_val[:batch_size], y_val[:batch_size], loss_function)
+        self.compute_mode = compute_mode  # After any fallback
         
         # Training loop with early stopping
         train_losses = []
         val_losses = []
         best_epoch = 0
+        total_train_time = 0.0
+        self.epoch_times = []
         
         for epoch in range(epochs):
             # Training phase
+            telemetry.start_epoch(epoch + 1)
             self.model.train()
-            epoch_train_loss = 0
-            for seq, labels in zip(X_train, y_train):
-                optimizer.zero_grad()
+            epoch_train_loss = torch.zeros((), device=self.device)
+            grad_norm_sum = torch.zeros((), device=self.device)
+            grad_norm_max = torch.zeros((), device=self.device)
+            epoch_start = time.perf_counter()
+            for train_set, start in train_batches:
+                with telemetry.phase('data'):
+                    if lazy_batches:
+                        seq_batch, label_batch = train_set.tensors(start, start + batch_size, device=self.device)
+                    else:
+                        seq_batch = X_train[start:start + batch_size]
+                        label_batch = y_train[start:start + batch_size]
                 
-                # Move hidden states to device
-                self.model.hidden_cell = (
-                    torch.zeros(1, 1, self.model.hidden_layer_size).to(self.device),
-                    torch.zeros(1, 1, self.model.hidden_layer_size).to(self.device)
-                )
-                
-                # Move data to device
-                seq_tensor = torch.FloatTensor(seq).to(self.device)
-                label_tensor = torch.FloatTensor([labels]).to(self.device)
-                
-                y_pred = self.model(seq_tensor)
-                loss = loss_function(y_pred, label_tensor)
-                loss.backward()
-                torch.nn.utils.clip_grad_norm_(self.model.parameters(), 1.0)  # Prevent exploding gradients
-                optimizer.step()
-                epoch_train_loss += loss.item()
+                with telemetry.phase('forward'):
+                    optimizer.zero_grad()
+                    with autocast(compute_mode, self.device):
+                        y_pred = train_forward(seq_batch)
+                        loss = loss_function(y_pred.float(), label_batch)
+                with telemetry.phase('backward'):
+                    loss.backward()
+                    # Prevent exploding gradients; the returned norm is the one before clipping
+                    grad_norm = torch.nn.utils.clip_grad_norm_(self.model.parameters(), 1.0)
+                with telemetry.phase('optimizer'):
+                    optimizer_step()
+                # Weight by batch size so the epoch loss stays a per-sample mean
+                epoch_train_loss += loss.detach() * len(seq_batch)
+                grad_norm_sum += grad_norm
+                grad_norm_max = torch.maximum(grad_norm_max, grad_norm)
             
-            avg_train_loss = epoch_train_loss / len(X_train)
+            avg_train_loss = epoch_train_loss.item() / n_train
             train_losses.append(avg_train_loss)
+            epoch_train_time = time.perf_counter() - epoch_start
+            total_train_time += epoch_train_time
             
-            # Validation phase
+            # Validation phase (whole validation set in a few large forward passes)
             self.model.eval()
             epoch_val_loss = 0
-            with torch.no_grad():
-                for seq, labels in zip(X_val, y_val):
-                    # Move hidden states to device
-                    self.model.hidden_cell = (
-                        torch.zeros(1, 1, self.model.hidden_layer_size).to(self.device),
-                        torch.zeros(1, 1, self.model.hidden_layer_size).to(self.device)
-                    )
-                    
-                    # Move data to device
-                    seq_tensor = torch.FloatTensor(seq).to(self.device)
-                    label_tensor = torch.FloatTensor([labels]).to(self.device)
-                    
-                    y_pred = self.model(seq_tensor)
-                    loss = loss_function(y_pred, label_tensor)
-                    epoch_val_loss += loss.item()
+            with telemetry.phase('validation'), torch.no_grad():
+                for start in range(0, n_val, eval_batch_size):
+                    y_pred = self.model(X_val[start:start + eval_batch_size])
+                    epoch_val_loss += val_loss_function(y_pred, y_val[start:start + eval_batch_size]).item()
             
-            avg_val_loss = epoch_val_loss / len(X_val)
+            avg_val_loss = epoch_val_loss / n_val
             val_losses.append(avg_val_loss)
             
             # Print progress
             if (epoch + 1) % 10 == 0:
-                print(f'  Epoch {epoch+1}/{epochs} - Train Loss: {avg_train_loss:.6f}, Val Loss: {avg_val_loss:.6f}')
+                print(f'  Epoch {epoch+1}/{epochs} - Train Loss: {avg_train_loss:.6f}, Val Loss: {avg_val_loss:.6f}, '
+                      f'{n_train / epoch_train_time:,.0f} samples/sec')
             
             # Early stopping and save best model
-            if avg_val_loss < self.best_val_loss:
+            improved = avg_val_loss < self.best_val_loss
+            if improved:
                 self.best_val_loss = avg_val_loss
                 best_epoch = epoch + 1
                 self.patience_counter = 0
-                # Save best model
-                self.save_model()
+                # Save best model (an in-memory snapshot; the checkpoint thread writes it)
+                with telemetry.phase('checkpoint'):
+                    self.save_model()
             else:
                 self.patience_counter += 1
-                if self.patience_counter >= patience:
-                    print(f"\nEarly stopping triggered at epoch {epoch+1}")
-                    print(f"  Best model was at epoch {best_epoch} with Val Loss: {self.best_val_loss:.6f}")
-                    break
+            
+            self.epoch_times.append(time.perf_counter() - epoch_start)
+            telemetry.end_epoch(epoch + 1, self.epoch_times[-1], avg_train_loss, avg_val_loss, n_train,
+                                grad_norm_sum.item() / len(train_batches), grad_norm_max.item(),
+                                optimizer.param_groups[0]['lr'], improved)
+            
+            if self.patience_counter >= patience:
+                print(f"\nEarly stopping triggered at epoch {epoch+1}")
+                print(f"  Best model was at epoch {best_epoch} with Val Loss: {self.best_val_loss:.6f}")
+                break
+            
+            if epoch_callback is not None and epoch_callback(epoch + 1, avg_train_loss, avg_val_loss):
+                print(f"\nStopped by epoch callback at epoch {epoch+1}")
+                break
+        
+        # Wait for the last queued checkpoint so the files on disk hold the best model
+        writer = self.checkpoint_writer
+        flush_start = time.perf_counter()
+        writer.flush()
+        telemetry.totals['checkpoint'] += time.perf_counter() - flush_start
+        print(f"\nCheckpoints: {writer.written} written, {writer.coalesced} superseded before being written")
         
         print(f"\nModel training completed!")
         print(f"  Best Epoch: {best_epoch}")
         print(f"  Best Validation Loss: {self.best_val_loss:.6f}")
         print(f"  Final Train Loss: {train_losses[-1]:.6f}")
         print(f"  Final Val Loss: {val_losses[-1]:.6f}")
+        print(f"  Training Throughput: {n_train * len(train_losses) / total_train_time:,.0f} samples/sec")
+        summary = telemetry.finish(best_epoch, self.best_val_loss)
+        print("  Time per phase: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in summary['phases'].items()))
         
         # Plot training history
         self.plot_training_history(train_losses, val_losses, best_epoch)
         
         return train_losses, val_losses
+    
+    def prepare_compute_mode(self, compute_mode, X_check, y_check, loss_function):
+        """(compute mode, forward, optimizer step) for train_model
+        
+        The mode's loss and gradients on one batch must match fp32 (see compute_mode.py);
+        otherwise, or if it fails to compile, training falls back to the fp32 eager model.
+        """
+        validate(compute_mode)
+        if compute_mode == 'fp32':
+            return 'fp32', self.model, self.optimizer.step
+        start = time.perf_counter()
+        forward = compile_module(self.model, compute_mode)
+        
+        def candidate_loss():
+            # With gradients, so a compile failure in the backward graph surfaces here too
+            loss = loss_function(forward(X_check).float(), y_check)
+            loss.backward()
+            return loss
+        
+        # Dropout off so both runs see the same network
+        self.model.eval()
+        with torch.no_grad():
+            reference = loss_function(self.model(X_check), y_check)
+        ok, difference = agrees(compute_mode, self.device, lambda: reference, candidate_loss, relative=True)
+        self.model.zero_grad()
+        if not ok:
+            return 'fp32', self.model, self.optimizer.step
+        print(f"   Compute mode: {compute_mode} (loss within {difference:.1e} of fp32, "
+              f"ready in {time.perf_counter() - start:.1f}s)")
+        return compute_mode, forward, compile_module(self.optimizer.step, compute_mode)
+        
+    def fine_tune(self, max_steps=200, batch_size=None, replay_ratio=0.5, tolerance=0.0, seed=0, min_val_windows=10):
+        """Warm-start the saved model on bars newer than its data watermark instead of retraining
+        
+        Loads the checkpoint with its optimizer state and scalers, then takes at most max_steps
+        optimizer steps on batches mixing the new windows with a random replay sample of older
+        training windows (replay_ratio of each batch). The result is saved only if the loss on
+        the validation windows from before the watermark does not grow by more than tolerance
+        (there must be at least min_val_windows of them, and both losses must be finite).
+        Returns True if a new model was promoted, False if not, and None if the checkpoint
+        cannot be fine-tuned (a full train_model run is needed).
+        """
+        batch_size = batch_size or self.batch_size
+        if not os.path.exists(self.best_model_path):
+            print(f"No checkpoint at {self.best_model_path}; a full retrain is needed")
+            return None
+        checkpoint = torch.load(self.best_model_path, map_location=self.device, weights_only=False)
+        watermarks = checkpoint.get('data_watermarks')
+        if not watermarks or checkpoint.get('optimizer_state_dict') is None:
+            print("Checkpoint has no data watermark or optimizer state; a full retrain is needed")
+            return None
+        if list(checkpoint.get('instrument_ids') or []) != self.instrument_ids:
+            print("Checkpoint was trained on different instruments; a full retrain is needed")
+            return None
+        feature_config = checkpoint.get('feature_config')
+        saved_pipeline = FeaturePipeline(**feature_config) if feature_config else None
+        if ((saved_pipeline.settings() if saved_pipeline else None)
+                != (self.preprocessor.settings() if self.preprocessor else None)):
+            print("Checkpoint was trained with different features; a full retrain is needed")
+            return None
+        
+        # Keep the checkpoint's normalization; refitting the scalers would shift every input
+        with open(self.scaler_path, 'rb') as f:
+            scaler = pickle.load(f)
+        self.scalers = scaler if isinstance(scaler, dict) else {self.instrument_ids[0]: scaler}
+        self.scaler = self.scalers[self.instrument_ids[0]]
+        self.scaler_state = None
+        self.preprocessor = saved_pipeline  # With the checkpoint's feature scaling stats
+        self.seq_length = checkpoint['seq_length']
+        self.hidden_size = checkpoint['hidden_size']
+        self.dropout = checkpoint.get('dropout', 0.0)
+        
+        # Per instrument: windows whose target is newer than the watermark, older training
+        # windows to replay, and validation windows (the last 20% before the watermark)
+        datasets, new_indices, replay_indices, val_indices = [], [], [], []
+        for instrument_id in self.instrument_ids:
+            inputs, first_bar = self.model_inputs(instrument_id)
+            dataset = SlidingWindowDataset(inputs, self.seq_length)
+            target_dates = self.instrument_data[instrument_id].index.values[first_bar + self.seq_length:]
+            target_ms = target_dates.astype('datetime64[ms]').astype(np.int64)
+            n_old = int(np.searchsorted(target_ms, watermarks.get(instrument_id, -1), side='right'))
+            n_val = int(np.ceil(0.2 * n_old))
+            datasets.append(dataset)
+            new_indices.append(np.arange(n_old, len(dataset)))
+            replay_indices.append(np.arange(0, n_old - n_val))
+            val_indices.append(np.arange(n_old - n_val, n_old))
+        n_new = sum(len(indices) for indices in new_indices)
+        if n_new == 0:
+            print("No new bars since the checkpoint's data watermark; model is up to date")
+            return False
+        n_val = sum(len(indices) for indices in val_indices)
+        if n_val < min_val_windows:
+            # Without validation windows the promotion check below could not reject anything
+            print(f"Only {n_val} validation window(s) before the data watermark (need {min_val_windows}); "
+                  f"a full retrain is needed")
+            return None
+        
+        self.model = LSTMModel(input_size=self.input_size, hidden_layer_size=self.hidden_size,
+                               dropout=self.dropout).to(self.device)
+        self.model.load_state_dict(checkpoint['model_state_dict'])
+        optimizer = self.optimizer = optim.Adam(self.model.parameters(), lr=0.001)
+        optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+        loss_function = nn.MSELoss()
+        
+        val_tensors = [dataset.take(indices, device=self.device) for dataset, indices in zip(datasets, val_indices)]
+        X_val = torch.cat([X for X, _ in val_tensors])
+        y_val = torch.cat([y for _, y in val_tensors])
         
-    def predict_future(self):
-        """Predict future prices using sliding window on GPU/CPU"""
+        def validation_loss():
+            self.model.eval()
+            with torch.no_grad():
+                return loss_function(self.model(X_val), y_val).item()
+        
+        baseline_loss = validation_loss()
+        print(f"\nFine-tuning on {n_new} new window(s) (max {max_steps} steps, baseline Val Loss: {baseline_loss:.6f})")
+        
+        # (dataset, window) rows so batches can sample across instruments
+        new_pool = np.concatenate([np.column_stack([np.full(len(indices), d), indices])
+                                   for d, indices in enumerate(new_indices)])
+        replay_pool = np.concatenate([np.column_stack([np.full(len(indices), d), indices])
+                                      for d, indices in enumerate(replay_indices)])
+        rng = np.random.default_rng(seed)
+        n_replay = min(len(replay_pool), int(batch_size * replay_ratio))
+        n_fresh = min(len(new_pool), batch_size - n_replay)
+        # A few passes over the new windows, capped by max_steps
+        steps = min(max_steps, int(np.ceil(4 * len(new_pool) / n_fresh)))
+        
+        start_time = time.perf_counter()
+        self.model.train()
+        for step in range(steps):
+            picks = np.concatenate([new_pool[rng.choice(len(new_pool), n_fresh, replace=False)],
+                                    replay_pool[rng.choice(len(replay_pool), n_replay, replace=False)]])
+            batches = [datasets[d].take(picks[picks[:, 0] == d, 1], device=self.device)
+                       for d in np.unique(picks[:, 0])]
+            seq_batch = torch.cat([X for X, _ in batches])
+            label_batch = torch.cat([y for _, y in batches])
+            
+            optimizer.zero_grad()
+            loss = loss_function(self.model(seq_batch), label_batch)
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(self.model.parameters(), 1.0)  # Prevent exploding gradients
+            optimizer.step()
+        
+        tuned_loss = validation_loss()
+        print(f"  {steps} steps in {time.perf_counter() - start_time:.2f}s - Val Loss: {baseline_loss:.6f} -> {tuned_loss:.6f}")
+        
+        # Promote only if the model did not get worse on data it was validated on before
+        # (a NaN loss compares False, so it is rejected explicitly rather than promoted)
+        if not (np.isfinite(baseline_loss) and np.isfinite(tuned_loss)):
+            print("  Validation loss is not finite; keeping the existing model")
+            self.model.load_state_dict(checkpoint['model_state_dict'])
+            return False
+        if tuned_loss > baseline_loss * (1 + tolerance):
+            print("  Validation loss regressed; keeping the existing model")
+            self.model.load_state_dict(checkpoint['model_state_dict'])
+            return False
+        self.best_val_loss = tuned_loss
+        self.save_model(wait=True)
+        return True
+    
+    def predict_future(self, instrument_id=None):
+        """Predict future prices using sliding window (or stateful steps) on GPU/CPU"""
+        instrument_id = instrument_id or self.instrument_ids[0]
         print(f"\nPredicting next {self.prediction_steps} days...")
+        return self.predict_all([instrument_id])[instrument_id]
+    
+    def predict_all(self, instrument_ids=None):
+        """Predict future prices for several instruments in one batched forward pass"""
+        instrument_ids = instrument_ids or self.instrument_ids
         
-        # Get last sequence
-        last_sequence = self.data['Close'].values[-self.seq_length:]
-        last_sequence_norm = self.scaler.transform(last_sequence.reshape(-1, 1)).flatten()
+        # Get last sequence of every instrument, normalized with its own scaler
+        windows = np.stack([self.model_inputs(instrument_id)[0][-self.seq_length:] for instrument_id in instrument_ids])
         
-        # Multi-step prediction
+        # Multi-step prediction (see LSTMModel.forecast for the two modes)
         self.model.eval()
-        predictions_norm = []
-        temp_seq = last_sequence_norm.copy()
-        
-        with torch.no_grad():
-            for step in range(self.prediction_steps):
-                # Move hidden states to device
-                self.model.hidden_cell = (
-                    torch.zeros(1, 1, self.model.hidden_layer_size).to(self.device),
-                    torch.zeros(1, 1, self.model.hidden_layer_size).to(self.device)
-                )
-                
-                # Move data to device
-                seq_tensor = torch.FloatTensor(temp_seq).to(self.device)
-                y_pred = self.model(seq_tensor)
-                pred_value = y_pred.cpu().item()  # Move back to CPU for numpy operations
-                predictions_norm.append(pred_value)
-                
-                # Slide window
-                temp_seq = np.append(temp_seq[1:], pred_value)
+        window = torch.as_tensor(windows, dtype=torch.float32, device=self.device)
+        if self.preprocessor is None:
+            predictions_norm = self.model.forecast(window.unsqueeze(-1), self.prediction_steps,
+                                                   stateful=self.stateful_forecast)
+        else:
+            # Each predicted price goes through streaming indicators to build the next input row
+            frames = [self.instrument_data[instrument_id] for instrument_id in instrument_ids]
+            volumes = [df['Volume'].values if 'Volume' in df else None for df in frames]
+            next_inputs = ForecastInputs(
+                [self.preprocessor.stream(df['Close'].values, volume) for df, volume in zip(frames, volumes)],
+                [lambda value, params=scaler_params(self.scalers[instrument_id]): float(unscale(value, params))
+                 for instrument_id in instrument_ids],
+                [volume[-1] if volume is not None else None for volume in volumes]
+            )
+            predictions_norm = self.model.forecast_features(window, self.prediction_steps, next_inputs,
+                                                            stateful=self.stateful_forecast)
+        predictions_norm = predictions_norm.cpu().numpy().astype(np.float64)  # Move back to CPU for numpy operations
         
         # Inverse transform to actual prices
-        predictions = self.scaler.inverse_transform(
-            np.array(predictions_norm).reshape(-1, 1)
-        ).flatten()
-        
-        return predictions
+        return {
+            instrument_id: self.scalers[instrument_id].inverse_transform(row.reshape(-1, 1)).flatten()
+            for instrument_id, row in zip(instrument_ids, predictions_norm)
+        }
     
     def calculate_percentage_change(self, predictions):
         """Calculate percentage change from current price"""
@@ -341,11 +660,16 @@ class BTCTradingBot:
         return changes
     
     def plot_predictions(self, predictions):
+        """Queue the prediction chart; it is drawn in the background by self.charts"""
+        # Last 30 days, copied so the worker never sees later updates
+        self.charts.submit(self.render_predictions, self.data['Close'].values[-30:].copy(),
+                           np.array(predictions), self.current_price)
+    
+    def render_predictions(self, plt, historical_prices, predictions, current_price):
         """Plot historical data with future predictions (dotted line)"""
         print("\nGenerating prediction chart...")
         
         # Prepare data
-        historical_prices = self.data['Close'].values[-30:]  # Last 30 days
         historical_dates = pd.date_range(
             end=datetime.now(), 
             periods=len(historical_prices), 
@@ -378,7 +702,7 @@ class BTCTradingBot:
                 marker='s', markersize=6, alpha=0.7)
         
         # Formatting
-        plt.axhline(y=self.current_price, color='gray', linestyle=':', alpha=0.5, label='Current Price')
+        plt.axhline(y=current_price, color='gray', linestyle=':', alpha=0.5, label='Current Price')
         plt.xlabel('Date', fontsize=12)
         plt.ylabel('BTC Price (USD)', fontsize=12)
         plt.title('Bitcoin Price Prediction - LSTM Model', fontsize=14, fontweight='bold')
@@ -391,10 +715,9 @@ class BTCTradingBot:
         # Save plot
         plt.savefig('btc_prediction.png', dpi=150, bbox_inches='tight')
         print("✓ Chart saved as 'btc_prediction.png'")
-        plt.show()
     
-    def run(self):
-        """Main execution flow - Training mode"""
+    def run(self, incremental=False, telemetry=None, compute_mode='fp32'):
+        """Main execution flow - Training mode (incremental: fine-tune the saved model on new bars)"""
         print("\n" + "="*80)
         print("BITCOIN TRADING BOT - TRAINING MODE")
         print("="*80)
@@ -404,12 +727,16 @@ class BTCTradingBot:
             print("\nFailed to fetch data from database")
             return
         
+        # Warm-start from the checkpoint; fall back to a full retrain when it cannot be fine-tuned
+        if incremental and self.fine_tune() is not None:
+            return
+        
         # Train model with early stopping
         print("\n" + "="*80)
         print("Starting training with early stopping (patience=20)...")
         print("This will prevent overfitting and exploding gradients")
         print("="*80)
-        self.train_model(epochs=200, patience=20)
+        self.train_model(epochs=200, patience=20, telemetry=telemetry, compute_mode=compute_mode)
         
         print("\n" + "="*80)
         print("Training Complete!")
@@ -417,9 +744,13 @@ class BTCTradingBot:
         print(f"\nSaved Files:")
         print(f"  - Best model: {self.best_model_path}")
         print(f"  - Scaler: {self.scaler_path}")
-        print(f"  - Training history: training_history.png")
+        if self.charts.enabled:
+            print(f"  - Training history: training_history.png (rendering in the background)")
         print(f"\nNext step: Run 'predict_price.py' to make predictions!")
         print("="*80)
+        
+        # The results are in; finish any chart still rendering before the process exits
+        self.charts.wait()
 
 
 if __name__ == "__main__":
@@ -427,11 +758,18 @@ if __name__ == "__main__":
     bot = BTCTradingBot(
         seq_length=10,          # Use 10 days of history
         prediction_steps=5,      # Predict 5 days ahead
-        hidden_size=64          # LSTM hidden layer size
+        hidden_size=64,         # LSTM hidden layer size
+        batch_size=64,          # Sequences per optimizer step
+        features=None,          # e.g. ['return', 'volatility', 'rsi', 'macd', 'macd_signal', 'volume_z']
+        render_charts=charts_enabled(sys.argv[1:])  # --no-charts or CHARTS=0 skips the PNGs
     )
     
     try:
-        bot.run()
+        # python bot.py --incremental fine-tunes the saved model on bars added since it was trained
+        # TRAINING_METRICS_PATH / TRAINING_PROMETHEUS_PATH / TRAINING_PROFILE_EPOCHS enable training telemetry
+        # TRAINING_COMPUTE_MODE: fp32 (default), bf16, compile or bf16-compile (see compute_mode.py)
+        bot.run(incremental='--incremental' in sys.argv[1:], telemetry=TrainingTelemetry.from_env(),
+                compute_mode=os.getenv('TRAINING_COMPUTE_MODE', 'fp32'))
     except KeyboardInterrupt:
         print("\n\nBot stopped by user")
     except Exception as e:
@@ -0,0 +1,91 @@
+"""
+Compute Modes
+Opt-in reduced-precision and compiled execution of LSTMModel for training and inference:
+'fp32' (default, eager), 'bf16' (bfloat16 autocast), 'compile' (torch.compile) and
+'bf16-compile'. A mode is checked against fp32 before it is used and falls back to fp32
+when it fails to run or disagrees by more than its tolerance.
+"""
+
+import contextlib
+import sys
+
+import torch
+
+COMPUTE_MODES = ['fp32', 'bf16', 'compile', 'bf16-compile']
+
+# Largest accepted difference from fp32: absolute on normalized (0-1) forecasts, relative on losses
+TOLERANCES = {'fp32': 0.0, 'bf16': 3e-2, 'compile': 1e-4, 'bf16-compile': 3e-2}
+
+
+def validate(mode):
+    if mode not in COMPUTE_MODES:
+        raise ValueError(f"Unknown compute mode {mode!r} (available: {COMPUTE_MODES})")
+    return mode
+
+
+def uses_bf16(mode):
+    return mode.startswith('bf16')
+
+
+def uses_compile(mode):
+    return mode.endswith('compile')
+
+
+def autocast(mode, device):
+    """bfloat16 autocast for bf16 modes, a no-op otherwise"""
+    if not uses_bf16(mode):
+        return contextlib.nullcontext()
+    return torch.autocast(device_type=device.type, dtype=torch.bfloat16)
+
+
+def compile_module(module, mode):
+    """torch.compile the module (or function) for compile modes; compilation happens on the first call"""
+    return torch.compile(module) if uses_compile(mode) else module
+
+
+def native_bf16():
+    """True if the CPU has bfloat16 instructions (AVX512-BF16 or AMX); elsewhere bf16 is emulated"""
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+
+def host_info():
+    """What decides which mode pays off on this host"""
+    cpu = None
+    try:
+        with open('/proc/cpuinfo') as f:
+            cpu = next((line.split(':', 1)[1].strip() for line in f if line.startswith('model name')), None)
+    except OSError:
+        pass
+    return {
+        'cpu': cpu,
+        'cpu_capability': torch.backends.cpu.get_cpu_capability(),
+        'native_bf16': native_bf16(),
+    }
+
+
+def agrees(mode, device, reference, candidate, relative=False):
+    """Compare candidate() run under mode's autocast with reference() in fp32
+
+    Returns (ok, difference); a candidate that raises or differs by more than the mode's
+    tolerance is reported on stderr and gives ok=False, so the caller falls back to fp32.
+    """
+    try:
+        expected = reference().detach().float()
+        with autocast(mode, device):
+            actual = candidate().detach().float()
+        difference = (actual - expected).abs().max().item()
+        if relative:
+            difference /= max(expected.abs().max().item(), 1e-12)
+    except Exception as e:
+        print(f"Compute mode {mode} failed ({type(e).__name__}: {e}); falling back to fp32", file=sys.stderr)
+        return False, None
+    if not difference <= TOLERANCES[mode]:
+        print(f"Compute mode {mode} differs from fp32 by {difference:.2e} (tolerance {TOLERANCES[mode]:.0e}); "
+              f"falling back to fp32", file=sys.stderr)
+        return False, difference
+    return True, difference
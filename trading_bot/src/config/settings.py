@@ -5,9 +5,16 @@ API_SECRET = "your_api_secret_here"
 BASE_URL = "https://api.yourtradingplatform.com"
 
 TRADING_PAIR = "BTC/USD"
-TRADE_AMOUNT = 0.01
+TRADE_AMOUNT = 0.01  # Position size in units of the instrument (0.01 BTC, not $0.01)
+# Per-instrument sizes in units, {instrument_id: units}; instruments not listed trade TRADE_AMOUNT
+TRADE_AMOUNTS = {}
 SLIPPAGE = 0.5
 
+# instruments.id values the LSTM is trained on and forecasts
+# (run `npm run instruments` in server/ to list them)
+BTC_INSTRUMENT_ID = "2376ac2b-fe9f-41ad-bb47-deb6d30d3253"
+INSTRUMENT_IDS = [BTC_INSTRUMENT_ID]
+
 LOGGING_LEVEL = "INFO"
 LOG_FILE = "trading_bot.log"
 
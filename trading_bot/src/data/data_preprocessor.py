@@ -0,0 +1,292 @@
+"""
+Feature Pipeline
+Technical indicators for the LSTM inputs: log returns, rolling volatility, RSI, MACD and
+volume z-scores. transform() computes them for a whole history with vectorized pandas
+operations; StreamingFeatures updates the same indicators in O(1) per new bar, so live
+inference and multi-step forecasts never recompute the history.
+
+Once fit() has stored per-feature means and standard deviations (saved with the rest of
+config() in checkpoints), both modes return standardized features with undefined values
+set to 0, the training mean. Missing volumes are carried forward from the last known bar.
+
+Both modes use the same recurrences (EMAs seeded with the first value, Wilder smoothing
+for RSI, population standard deviation over fixed windows), so they agree to within
+floating-point rounding.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+# Every available feature, in input column order
+FEATURES = ['return', 'volatility', 'rsi', 'macd', 'macd_signal', 'volume_z']
+
+
+class RollingWindow:
+    """Fixed-size window of the latest values with O(1) mean and population std"""
+
+    def __init__(self, size):
+        self.values = np.zeros(size)
+        self.size = size
+        self.count = 0
+        self.position = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, value):
+        if self.count == self.size:
+            old = self.values[self.position]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.values[self.position] = value
+        self.total += value
+        self.total_sq += value * value
+        self.position = (self.position + 1) % self.size
+        if self.position == 0:
+            # Re-sum once per wrap so add/subtract rounding never accumulates
+            self.total = float(self.values[:self.count].sum())
+            self.total_sq = float(np.dot(self.values[:self.count], self.values[:self.count]))
+
+    def full(self):
+        return self.count == self.size
+
+    def mean(self):
+        return self.total / self.count
+
+    def std(self):
+        mean = self.mean()
+        return float(np.sqrt(max(self.total_sq / self.count - mean * mean, 0.0)))
+
+
+class FeaturePipeline:
+    """Indicator settings and the batch transform; see the module docstring"""
+
+    def __init__(self, features=None, volatility_window=20, volume_window=20, rsi_period=14,
+                 macd_fast=12, macd_slow=26, macd_signal=9, means=None, stds=None):
+        self.features = list(features or FEATURES)
+        unknown = set(self.features) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown features: {sorted(unknown)} (available: {FEATURES})")
+        self.volatility_window = volatility_window
+        self.volume_window = volume_window
+        self.rsi_period = rsi_period
+        self.macd_fast = macd_fast
+        self.macd_slow = macd_slow
+        self.macd_signal = macd_signal
+        # Per-feature scaling stats from fit(); None for an unfitted pipeline (raw features)
+        self.means = None if means is None else np.asarray(means, dtype=np.float64)
+        self.stds = None if stds is None else np.asarray(stds, dtype=np.float64)
+
+    def config(self):
+        """Constructor arguments, stored in checkpoints so inference rebuilds the same pipeline"""
+        return dict(self.settings(),
+                    means=None if self.means is None else self.means.tolist(),
+                    stds=None if self.stds is None else self.stds.tolist())
+
+    def settings(self):
+        """Indicator settings without the scaling stats (what decides the features computed)"""
+        return {
+            'features': self.features,
+            'volatility_window': self.volatility_window,
+            'volume_window': self.volume_window,
+            'rsi_period': self.rsi_period,
+            'macd_fast': self.macd_fast,
+            'macd_slow': self.macd_slow,
+            'macd_signal': self.macd_signal,
+        }
+
+    @property
+    def fitted(self):
+        return self.means is not None
+
+    def fit(self, histories):
+        """Fit the scaling stats on (close, volume) histories, skipping each warm-up"""
+        rows = np.concatenate([self.raw_transform(close, volume)[self.warmup:] for close, volume in histories])
+        self.means = np.nan_to_num(np.nanmean(rows, axis=0))
+        stds = np.nan_to_num(np.nanstd(rows, axis=0))
+        self.stds = np.where(stds > 0, stds, 1.0)
+        return self
+
+    def scale(self, rows):
+        """Standardize feature rows with the fitted stats; NaN (undefined) becomes 0"""
+        if not self.fitted:
+            return rows
+        return np.nan_to_num((rows - self.means) / self.stds, nan=0.0)
+
+    @property
+    def needs_volume(self):
+        return 'volume_z' in self.features
+
+    @property
+    def warmup(self):
+        """Leading bars whose features are undefined or still settling; dropped from training"""
+        return max(self.volatility_window + 1, self.volume_window, self.rsi_period + 1,
+                   self.macd_slow + self.macd_signal)
+
+    @property
+    def history_bars(self):
+        """Bars of history after which the EMAs have forgotten their starting value (to ~1e-9)"""
+        return self.warmup + 20 * self.macd_slow
+
+    def compute(self, close, volume=None):
+        """All indicators and the EMA state behind them, as pandas Series"""
+        close = pd.Series(np.asarray(close, dtype=np.float64))
+        returns = np.log(close).diff()
+        delta = close.diff()
+
+        # Wilder smoothing (alpha = 1 / period) of gains and losses, starting at the first change
+        alpha = 1 / self.rsi_period
+        avg_gain = delta.clip(lower=0).iloc[1:].ewm(alpha=alpha, adjust=False).mean().reindex(close.index)
+        avg_loss = (-delta).clip(lower=0).iloc[1:].ewm(alpha=alpha, adjust=False).mean().reindex(close.index)
+        moves = avg_gain + avg_loss
+        rsi = (avg_gain / moves.where(moves > 0)).fillna(0.5).where(avg_gain.notna())
+
+        ema_fast = close.ewm(span=self.macd_fast, adjust=False).mean()
+        ema_slow = close.ewm(span=self.macd_slow, adjust=False).mean()
+        macd = (ema_fast - ema_slow) / close  # Relative to price so instruments share a scale
+        macd_signal = macd.ewm(span=self.macd_signal, adjust=False).mean()
+
+        series = {
+            'return': returns,
+            'volatility': returns.rolling(self.volatility_window).std(ddof=0),
+            'rsi': rsi,
+            'macd': macd,
+            'macd_signal': macd_signal,
+            'ema_fast': ema_fast,
+            'ema_slow': ema_slow,
+            'avg_gain': avg_gain,
+            'avg_loss': avg_loss,
+        }
+        if self.needs_volume:
+            if volume is None:
+                raise ValueError("The volume_z feature needs volume data")
+            volume = pd.Series(np.asarray(volume, dtype=np.float64)).ffill()
+            series['volume'] = volume
+            std = volume.rolling(self.volume_window).std(ddof=0)
+            volume_z = (volume - volume.rolling(self.volume_window).mean()) / std.where(std > 0)
+            series['volume_z'] = volume_z.fillna(0.0).where(std.notna())
+        return series
+
+    def raw_transform(self, close, volume=None):
+        """Unscaled feature matrix (bars, len(features)); NaN where a feature is undefined"""
+        series = self.compute(close, volume)
+        return np.column_stack([series[feature].to_numpy() for feature in self.features])
+
+    def transform(self, close, volume=None):
+        """Feature matrix (bars, len(features)) for a whole history, scaled once the pipeline is fitted"""
+        return self.scale(self.raw_transform(close, volume))
+
+    def stream(self, close, volume=None):
+        """StreamingFeatures positioned after the given history, ready for the next bar"""
+        close = np.asarray(close, dtype=np.float64)
+        series = self.compute(close, volume)
+        state = StreamingFeatures(self)
+        state.count = len(close)
+        state.prev_close = float(close[-1])
+        for name in ('ema_fast', 'ema_slow', 'avg_gain', 'avg_loss', 'macd_signal'):
+            value = series[name].iloc[-1]
+            setattr(state, name, None if np.isnan(value) else float(value))
+
+        # Refill the rolling windows with the values they would hold after replaying the history
+        for value in series['return'].to_numpy()[1:][-self.volatility_window:]:
+            state.returns.push(value)
+        if self.needs_volume:
+            volumes = series['volume'].to_numpy()
+            for value in volumes[~np.isnan(volumes)][-self.volume_window:]:
+                state.volumes.push(value)
+            state.last_volume = None if np.isnan(volumes[-1]) else float(volumes[-1])
+        return state
+
+
+class StreamingFeatures:
+    """Indicator state updated one bar at a time; update() costs O(1) regardless of history length"""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.count = 0
+        self.prev_close = None
+        self.ema_fast = None
+        self.ema_slow = None
+        self.avg_gain = None
+        self.avg_loss = None
+        self.macd_signal = None
+        self.last_volume = None  # Stands in for missing volumes
+        self.returns = RollingWindow(pipeline.volatility_window)
+        self.volumes = RollingWindow(pipeline.volume_window)
+
+    def copy(self):
+        """Independent copy (e.g. to roll a forecast forward without touching the live state)"""
+        return copy.deepcopy(self)
+
+    def update(self, close, volume=None):
+        """Add one bar; returns its feature row in pipeline.features order (scaled once fitted)"""
+        pipeline = self.pipeline
+        close = float(close)
+        row = {'return': np.nan, 'volatility': np.nan, 'rsi': np.nan}
+
+        if self.prev_close is None:
+            self.ema_fast = self.ema_slow = close
+        else:
+            row['return'] = np.log(close / self.prev_close)
+            self.returns.push(row['return'])
+            if self.returns.full():
+                row['volatility'] = self.returns.std()
+
+            delta = close - self.prev_close
+            gain, loss = max(delta, 0.0), max(-delta, 0.0)
+            if self.avg_gain is None:
+                self.avg_gain, self.avg_loss = gain, loss
+            else:
+                alpha = 1 / pipeline.rsi_period
+                self.avg_gain += alpha * (gain - self.avg_gain)
+                self.avg_loss += alpha * (loss - self.avg_loss)
+            moves = self.avg_gain + self.avg_loss
+            row['rsi'] = self.avg_gain / moves if moves > 0 else 0.5
+
+            self.ema_fast += 2 / (pipeline.macd_fast + 1) * (close - self.ema_fast)
+            self.ema_slow += 2 / (pipeline.macd_slow + 1) * (close - self.ema_slow)
+
+        row['macd'] = (self.ema_fast - self.ema_slow) / close
+        if self.macd_signal is None:
+            self.macd_signal = row['macd']
+        else:
+            self.macd_signal += 2 / (pipeline.macd_signal + 1) * (row['macd'] - self.macd_signal)
+        row['macd_signal'] = self.macd_signal
+
+        if pipeline.needs_volume:
+            if volume is not None and not np.isnan(volume):
+                self.last_volume = float(volume)
+            row['volume_z'] = np.nan
+            # Like the batch forward fill: until a volume is seen there is nothing to push
+            if self.last_volume is not None:
+                self.volumes.push(self.last_volume)
+                if self.volumes.full():
+                    std = self.volumes.std()
+                    row['volume_z'] = (self.last_volume - self.volumes.mean()) / std if std > 0 else 0.0
+
+        self.prev_close = close
+        self.count += 1
+        return pipeline.scale(np.array([row[feature] for feature in pipeline.features]))
+
+
+class ForecastInputs:
+    """next_inputs callback for LSTMModel.forecast_features
+
+    Feeds each instrument's predicted (normalized) value back as a price through its
+    streaming indicators and returns the next input rows; future volume is held at the
+    last observed bar.
+    """
+
+    def __init__(self, streams, denormalizers, volumes=None):
+        self.streams = streams
+        self.denormalizers = denormalizers  # Per instrument: normalized value -> price
+        self.volumes = volumes or [None] * len(streams)
+
+    def __call__(self, predicted):
+        return np.stack([
+            np.concatenate([[value], stream.update(denormalize(value), volume)])
+            for value, stream, denormalize, volume in zip(predicted, self.streams, self.denormalizers, self.volumes)
+        ])
@@ -0,0 +1,111 @@
+"""
+Local Price Cache
+Columnar per-instrument copy of instrument_prices, refreshed from a timestamp watermark
+
+Each column is a raw little-endian file that new rows are appended to in place, and
+meta.json records the committed row count and the watermark. A refresh therefore reads one
+small file and writes only the new rows, however long the cached history is.
+"""
+
+import json
+import os
+
+import numpy as np
+
+
+# Column name -> dtype; timestamps are milliseconds since the Unix epoch (DATETIME values taken as naive UTC)
+COLUMNS = {
+    'timestamp': np.dtype('<i8'),
+    'open': np.dtype('<f8'),
+    'close': np.dtype('<f8'),
+    'volume': np.dtype('<f8'),
+}
+
+META_FILE = 'meta.json'
+
+
+class PriceCache:
+    """(timestamp, open, close, volume) arrays per instrument, stored as append-only column files
+
+    meta.json is only replaced (atomically) after every column has been appended and synced,
+    so it always describes complete rows. Bytes past its row count, left by a crash mid-append,
+    are ignored by readers and truncated by the next append.
+    """
+
+    def __init__(self, cache_dir='price_cache'):
+        self.cache_dir = cache_dir
+
+    def path(self, instrument_id, column):
+        return os.path.join(self.cache_dir, instrument_id, f"{column}.bin")
+
+    def meta_path(self, instrument_id):
+        return os.path.join(self.cache_dir, instrument_id, META_FILE)
+
+    def meta(self, instrument_id):
+        """{'rows': committed rows, 'watermark': newest timestamp or None}"""
+        try:
+            with open(self.meta_path(instrument_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return self.migrate(instrument_id)
+
+    def migrate(self, instrument_id):
+        """Convert a cache written as whole .npy files (before append-only columns), if any"""
+        legacy = {column: os.path.join(self.cache_dir, instrument_id, f"{column}.npy") for column in COLUMNS}
+        if not all(os.path.exists(path) for path in legacy.values()):
+            return {'rows': 0, 'watermark': None}
+        columns = {column: np.load(path) for column, path in legacy.items()}
+        length = min(len(values) for values in columns.values())
+        self.append(instrument_id, {column: values[:length] for column, values in columns.items()},
+                    {'rows': 0, 'watermark': None})
+        for path in legacy.values():
+            os.remove(path)
+        return self.meta(instrument_id)
+
+    def load(self, instrument_id):
+        """Cached columns of one instrument (empty arrays when nothing is cached yet)"""
+        rows = self.meta(instrument_id)['rows']
+        return {
+            column: np.fromfile(self.path(instrument_id, column), dtype=dtype, count=rows)
+            if rows else np.empty(0, dtype=dtype)
+            for column, dtype in COLUMNS.items()
+        }
+
+    def watermark(self, instrument_id):
+        """Timestamp (epoch ms) of the newest cached row, or None"""
+        return self.meta(instrument_id)['watermark']
+
+    def append(self, instrument_id, new_columns, meta=None):
+        """Append rows to the cached columns in place, then commit the new row count"""
+        meta = meta or self.meta(instrument_id)
+        count = len(new_columns['timestamp'])
+        os.makedirs(os.path.join(self.cache_dir, instrument_id), exist_ok=True)
+        for column, dtype in COLUMNS.items():
+            with open(self.path(instrument_id, column), 'ab') as f:
+                # Drop bytes of an append that crashed before its commit
+                f.truncate(meta['rows'] * dtype.itemsize)
+                f.write(np.ascontiguousarray(new_columns[column], dtype=dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        path = self.meta_path(instrument_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'rows': meta['rows'] + count,
+                       'watermark': int(new_columns['timestamp'][-1]) if count else meta['watermark']}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def refresh(self, source, instrument_id):
+        """Fetch rows newer than the watermark from `source` (a ConnectionPool) and append them
+
+        Returns the number of new rows.
+        """
+        meta = self.meta(instrument_id)
+        # Range scan on the (instrument_id, timestamp) unique index, decoded straight into arrays
+        new_columns = source.fetch_price_history(instrument_id, columns=('open', 'close', 'volume'),
+                                                 since=meta['watermark'], dtype=np.float64)
+        if len(new_columns['timestamp']):
+            self.append(instrument_id, new_columns, meta)
+        return len(new_columns['timestamp'])
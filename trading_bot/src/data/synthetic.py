@@ -0,0 +1,135 @@
+"""
+Synthetic Price Data
+Geometric Brownian motion price series and a SQLite stand-in for instrument_prices
+with the same fetch (and predictions write) methods as utils.db.ConnectionPool, for offline
+runs and benchmarks
+"""
+
+import sqlite3
+import threading
+
+import numpy as np
+
+from utils.db import PREDICTION_COLUMNS, PREDICTION_KEY, read_price_arrays
+
+DAY_MS = 24 * 60 * 60 * 1000
+START_MS = 1420070400000  # 2015-01-01
+
+# ConnectionPool column names -> instrument_prices columns
+SQL_COLUMNS = {
+    'open': 'open_price',
+    'close': 'close_price',
+    'volume': 'volume',
+}
+
+
+def generate_prices(count, start_price=30000.0, drift=0.0005, volatility=0.035, start_ms=START_MS,
+                    interval_ms=DAY_MS, seed=0):
+    """Daily bars following geometric Brownian motion; returns timestamp/open/close/volume arrays"""
+    rng = np.random.default_rng(seed)
+    log_returns = (drift - 0.5 * volatility ** 2) + volatility * rng.standard_normal(count)
+    close = start_price * np.exp(np.cumsum(log_returns))
+    return {
+        'timestamp': start_ms + np.arange(count, dtype=np.int64) * interval_ms,
+        'open': np.concatenate([[start_price], close[:-1]]),
+        'close': close,
+        'volume': rng.lognormal(mean=10.0, sigma=0.5, size=count),
+    }
+
+
+class SQLitePriceStore:
+    """instrument_prices in SQLite (in memory by default), timestamps stored as epoch ms"""
+
+    def __init__(self, path=':memory:'):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS instrument_prices (
+                instrument_id TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
+                open_price REAL,
+                close_price REAL,
+                volume REAL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS instrument_prices_instrument_id_timestamp_key
+                ON instrument_prices (instrument_id, timestamp DESC);
+        """)
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS predictions (
+                {', '.join(PREDICTION_COLUMNS)},
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE ({', '.join(PREDICTION_KEY)})
+            )
+        """)
+
+    @classmethod
+    def synthetic(cls, instrument_ids, count, seed=0, path=':memory:'):
+        """Store filled with `count` generated bars per instrument"""
+        store = cls(path)
+        for i, instrument_id in enumerate(instrument_ids):
+            store.insert(instrument_id, generate_prices(count, start_price=30000.0 / (i + 1), seed=seed + i))
+        return store
+
+    def insert(self, instrument_id, prices):
+        """Insert timestamp/open/close/volume arrays for one instrument"""
+        rows = zip([instrument_id] * len(prices['timestamp']), prices['timestamp'].tolist(),
+                   prices['open'].tolist(), prices['close'].tolist(), prices['volume'].tolist())
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO instrument_prices VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def query_arrays(self, query, params, columns, dtype, capacity=None):
+        with self.lock:
+            cursor = self.connection.execute(query, params)
+            try:
+                return read_price_arrays(cursor, columns, dtype, capacity=capacity)
+            finally:
+                cursor.close()
+
+    def fetch_price_history(self, instrument_id, columns=('close',), since=None, dtype=np.float32):
+        """See utils.db.stream_prices"""
+        select = ', '.join(['timestamp'] + [SQL_COLUMNS[column] for column in columns])
+        query = f"SELECT {select} FROM instrument_prices WHERE instrument_id = ?"
+        params = [instrument_id]
+        if since is not None:
+            query += " AND timestamp > ?"
+            params.append(int(since))
+        return self.query_arrays(query + " ORDER BY timestamp ASC", params, columns, dtype)
+
+    def fetch_latest_prices(self, instrument_ids, limit, columns=('close',), dtype=np.float32):
+        """See utils.db.stream_latest_prices"""
+        select = ', '.join(['timestamp'] + [SQL_COLUMNS[column] for column in columns])
+        query = f"SELECT {select} FROM instrument_prices WHERE instrument_id = ? ORDER BY timestamp DESC LIMIT ?"
+        latest = {}
+        for instrument_id in instrument_ids:
+            arrays = self.query_arrays(query, [instrument_id, limit], columns, dtype, capacity=limit)
+            # Rows come newest first; reverse into chronological order
+            latest[instrument_id] = {name: np.ascontiguousarray(values[::-1]) for name, values in arrays.items()}
+        return latest
+
+    def fetch_latest_timestamps(self, instrument_ids):
+        """See utils.db.latest_timestamps"""
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT instrument_id, MAX(timestamp) FROM instrument_prices "
+                f"WHERE instrument_id IN ({', '.join(['?'] * len(instrument_ids))}) GROUP BY instrument_id",
+                list(instrument_ids)
+            ).fetchall()
+        latest = dict(rows)
+        return {instrument_id: latest.get(instrument_id) for instrument_id in instrument_ids}
+
+    def write_predictions(self, rows, batch_size=1000):
+        """See utils.db.upsert_predictions"""
+        updates = ', '.join(f"{column} = excluded.{column}" for column in PREDICTION_COLUMNS if column not in PREDICTION_KEY)
+        query = (f"INSERT INTO predictions ({', '.join(PREDICTION_COLUMNS)}) "
+                 f"VALUES ({', '.join(['?'] * len(PREDICTION_COLUMNS))}) "
+                 f"ON CONFLICT ({', '.join(PREDICTION_KEY)}) DO UPDATE SET {updates}, updated_at = CURRENT_TIMESTAMP")
+        values = [tuple(row[column] for column in PREDICTION_COLUMNS) for row in rows]
+        for start in range(0, len(values), batch_size):
+            with self.lock, self.connection:
+                self.connection.executemany(query, values[start:start + batch_size])
+        return len(values)
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,61 @@
+"""
+Sliding Window Dataset
+Zero-copy (X, y) training windows over a normalized price series
+"""
+
+import numpy as np
+import torch
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class SlidingWindowDataset:
+    """Windows of seq_length values and the value that follows each one, as strided views
+
+    `series` is 1-D (one input per step) or 2-D (steps, features); with features, column 0
+    is the predicted value (the normalized close) and windows carry every column.
+    """
+
+    def __init__(self, series, seq_length, dtype=np.float32):
+        self.series = np.ascontiguousarray(series, dtype=dtype)
+        self.seq_length = seq_length
+        if len(self.series) <= seq_length:
+            raise ValueError(f"Not enough data. Need more than {seq_length} values, got {len(self.series)}")
+
+        # X[i] is series[i:i + seq_length] and y[i] is series[i + seq_length]; both share memory with series
+        if self.series.ndim == 1:
+            self.X = sliding_window_view(self.series, seq_length)[:-1]
+            self.y = self.series[seq_length:]
+        else:
+            self.X = sliding_window_view(self.series, seq_length, axis=0)[:-1].transpose(0, 2, 1)
+            self.y = self.series[seq_length:, 0]
+
+    def __len__(self):
+        return len(self.y)
+
+    def subset(self, start, stop):
+        """Windows start..stop as a new dataset over the same memory"""
+        return SlidingWindowDataset(self.series[start:stop + self.seq_length], self.seq_length, self.series.dtype)
+
+    def split(self, test_size=0.2):
+        """Chronological train/validation split, sized like train_test_split(shuffle=False)"""
+        n_val = int(np.ceil(test_size * len(self)))
+        n_train = len(self) - n_val
+        return self.subset(0, n_train), self.subset(n_train, len(self))
+
+    def batch(self, start, stop):
+        """Materialize windows start..stop into contiguous arrays"""
+        # copy(), not ascontiguousarray: a single window is already contiguous but read-only
+        return self.X[start:stop].copy(), self.y[start:stop].copy()
+
+    def tensors(self, start=0, stop=None, device='cpu'):
+        """Windows start..stop as float32 tensors shaped (batch, seq_length, features) and (batch, 1)"""
+        return self.to_tensors(*self.batch(start, len(self) if stop is None else stop), device)
+
+    def take(self, indices, device='cpu'):
+        """Windows at arbitrary indices (e.g. a random replay sample) as tensors like tensors()"""
+        return self.to_tensors(np.ascontiguousarray(self.X[indices]), self.y[indices], device)
+
+    def to_tensors(self, X, y, device):
+        X = torch.from_numpy(X).to(device=device, dtype=torch.float32)
+        y = torch.from_numpy(y).to(device=device, dtype=torch.float32).unsqueeze(-1)
+        return (X.unsqueeze(-1) if X.dim() == 2 else X), y
@@ -0,0 +1,139 @@
+"""
+Model Export for CPU Inference
+Writes a frozen TorchScript forecaster and a dynamically quantized int8 variant
+from the trained checkpoint, then benchmarks both against the fp32 eager model
+"""
+
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from lstm_model import LSTMForecaster, LSTMModel
+from model_artifact import export_artifact
+
+warnings.filterwarnings('ignore')
+
+# File written next to the checkpoint for each exported format
+EXPORT_SUFFIXES = {
+    'torchscript': '.ts.pt',
+    'int8': '.int8.ts.pt',
+}
+
+
+def export_path(model_path, model_format):
+    """Path of the exported module for a checkpoint, e.g. best_btc_lstm_model.int8.ts.pt"""
+    return os.path.splitext(model_path)[0] + EXPORT_SUFFIXES[model_format]
+
+
+def load_eager_model(model_path):
+    """Load the fp32 eager LSTMModel and its checkpoint on CPU"""
+    checkpoint = torch.load(model_path, map_location='cpu', weights_only=False)
+    model = LSTMModel(input_size=checkpoint.get('input_size', 1), hidden_layer_size=checkpoint['hidden_size'],
+                      dropout=checkpoint.get('dropout', 0.0))
+    model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+    return model, checkpoint
+
+
+def load_exported_model(model_path, model_format):
+    """Load an exported forecaster; returns (module, metadata) where metadata mirrors the checkpoint keys"""
+    extra_files = {'metadata.json': ''}
+    module = torch.jit.load(export_path(model_path, model_format), map_location='cpu', _extra_files=extra_files)
+    module.eval()
+    return module, json.loads(extra_files['metadata.json'])
+
+
+def export_models(model_path='../../best_btc_lstm_model.pth'):
+    """Script and freeze the forecaster in fp32 and dynamic int8; returns {format: path}"""
+    model, checkpoint = load_eager_model(model_path)
+    if checkpoint.get('feature_config'):
+        raise Exception("Only close-price models can be exported; feature models build inputs in Python")
+    metadata = json.dumps({
+        'hidden_size': checkpoint['hidden_size'],
+        'seq_length': checkpoint['seq_length'],
+        'prediction_steps': checkpoint['prediction_steps'],
+        'instrument_ids': checkpoint.get('instrument_ids'),
+        'source': os.path.basename(model_path),
+    })
+
+    forecaster = LSTMForecaster(model).eval()
+    variants = {
+        'torchscript': forecaster,
+        # int8 weights for the LSTM and Linear layers; activations are quantized on the fly
+        'int8': torch.ao.quantization.quantize_dynamic(forecaster, {nn.LSTM, nn.Linear}, dtype=torch.qint8),
+    }
+
+    paths = {}
+    for model_format, module in variants.items():
+        scripted = torch.jit.freeze(torch.jit.script(module))
+        paths[model_format] = export_path(model_path, model_format)
+        torch.jit.save(scripted, paths[model_format], _extra_files={'metadata.json': metadata})
+        print(f"Saved {model_format} model to {paths[model_format]}")
+    return paths
+
+
+def benchmark(model_path='../../best_btc_lstm_model.pth', iterations=500, stateful=False):
+    """Single-request forecast latency and drift of each format against the fp32 eager model"""
+    torch.manual_seed(0)
+    model, checkpoint = load_eager_model(model_path)
+    seq_length, steps = checkpoint['seq_length'], checkpoint['prediction_steps']
+
+    # Random-walk windows in the scaler's [0, 1] range
+    windows = torch.cumsum(torch.randn(iterations, seq_length, 1) * 0.02, dim=1) + torch.rand(iterations, 1, 1)
+    windows = windows.clamp(0, 1)
+
+    variants = {'eager': LSTMForecaster(model).eval()}
+    for model_format in EXPORT_SUFFIXES:
+        variants[model_format], _ = load_exported_model(model_path, model_format)
+
+    results = {}
+    reference = None
+    with torch.no_grad():
+        for name, module in variants.items():
+            # Warm up (TorchScript optimizes on the first calls)
+            for i in range(10):
+                module(windows[i:i + 1], steps, stateful)
+
+            latencies = np.empty(iterations)
+            outputs = torch.empty(iterations, steps)
+            for i in range(iterations):
+                start = time.perf_counter()
+                outputs[i] = module(windows[i:i + 1], steps, stateful)[0]
+                latencies[i] = time.perf_counter() - start
+
+            if reference is None:
+                reference = outputs
+            drift = (outputs - reference).abs()
+            results[name] = {
+                'p50_ms': float(np.percentile(latencies, 50) * 1000),
+                'p99_ms': float(np.percentile(latencies, 99) * 1000),
+                'max_drift': float(drift.max()),
+                'mean_drift': float(drift.mean()),
+            }
+
+    print(f"\n{'Format':<14} {'p50 (ms)':>10} {'p99 (ms)':>10} {'max drift':>12} {'mean drift':>12}")
+    print("-" * 62)
+    for name, result in results.items():
+        print(f"{name:<14} {result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} "
+              f"{result['max_drift']:>12.2e} {result['mean_drift']:>12.2e}")
+    print("Drift is in scaled units (fraction of the training min-max price range)")
+    return results
+
+
+def main():
+    """Export the compact artifact and both formats for the trained model, then benchmark them"""
+    model_path = sys.argv[1] if len(sys.argv) > 1 else '../../best_btc_lstm_model.pth'
+    print(f"Saved compact artifact to {export_artifact(model_path)}")
+    export_models(model_path)
+    benchmark(model_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
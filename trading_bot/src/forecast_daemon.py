@@ -0,0 +1,281 @@
+"""
+Streaming Forecast Daemon
+Keeps every instrument's LSTM state in memory and republishes its forecast as new bars land
+in instrument_prices, instead of reloading model, data and window through
+BTCPricePredictor.run() for each forecast
+
+Each poll reads the latest timestamp of every instrument in one query and fetches only the
+rows past an instrument's watermark. A new bar advances that instrument's (h, c) by one LSTM
+cell step and shifts its scaled window; the forecast then rolls forward from that state
+(the stateful forecast mode). Every `--reencode-every` bars the state is rebuilt from the
+window, so it never drifts far from the fixed-length windows the model was trained on.
+Work per bar is the same however long the daemon has been running.
+
+Usage: python forecast_daemon.py [instrument_id ...] [--interval 30] [--output-dir DIR]
+                                 [--reencode-every BARS] [--synthetic ROWS]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import torch
+
+from api_predict import BTCPricePredictor
+from compute_mode import autocast
+from data.synthetic import SQLitePriceStore, generate_prices
+from utils.checkpoint import atomic_write
+from utils.db import get_pool
+
+
+class InstrumentStream:
+    """In-memory forecast state of one instrument: watermark, scaled input window and (h, c)"""
+
+    def __init__(self, instrument_id, history, predictor):
+        self.instrument_id = instrument_id
+        close = history['close']
+        self.volume = history.get('volume')
+        rows = predictor.normalize(close[-predictor.seq_length:], instrument_id)[:, None]
+        self.features = None  # StreamingFeatures of feature models
+        if predictor.preprocessor is not None:
+            features = predictor.preprocessor.transform(close, self.volume)[-predictor.seq_length:]
+            rows = np.hstack([rows, features])
+            self.features = predictor.preprocessor.stream(close, self.volume)
+            self.volume = float(self.volume[-1])
+        self.window = rows.astype(np.float32)
+        # The last two bars are all build_result needs (current and yesterday's price)
+        self.timestamps = history['timestamp'][-2:].copy()
+        self.closes = close[-2:].astype(np.float64)
+        self.watermark = int(self.timestamps[-1])
+        self.hidden = None
+        self.bars_since_encode = 0
+        self.bars = 0
+
+    @property
+    def data(self):
+        """Latest bars in the form BTCPricePredictor.set_data expects"""
+        return {'timestamp': self.timestamps, 'close': self.closes}
+
+
+class ForecastDaemon:
+    """Advances each instrument's LSTM state one bar at a time and publishes refreshed forecasts"""
+
+    def __init__(self, predictor, instrument_ids=None, source=None, reencode_every=None, publish=None):
+        self.predictor = predictor
+        self.instrument_ids = instrument_ids
+        # Price source with the ConnectionPool fetch methods (defaults to the shared MySQL pool)
+        self.source = source
+        # Bars between rebuilds of (h, c) from the window (default: once per window length)
+        self.reencode_every = reencode_every
+        self.publish = publish or (lambda result: print(json.dumps(result, separators=(',', ':')), flush=True))
+        self.streams = {}
+        self.columns = ('close',)
+        self.bars_processed = 0
+        self.update_seconds = 0.0
+
+    def start(self):
+        """Load the model and seed every instrument's window and state from its latest bars"""
+        predictor = self.predictor
+        if predictor.model is None:
+            predictor.load_model()
+        if predictor.model_format != 'eager':
+            raise Exception("The forecast daemon steps the LSTM cell directly; use model_format='eager'")
+        self.source = self.source or predictor.pool or get_pool()
+        predictor.pool = self.source
+        self.instrument_ids = self.instrument_ids or list(predictor.scalers)
+        self.reencode_every = self.reencode_every or predictor.seq_length
+        if predictor.preprocessor is not None:
+            self.columns = ('close', 'volume')
+
+        histories = predictor.fetch_latest_windows(self.instrument_ids)
+        for instrument_id in self.instrument_ids:
+            stream = InstrumentStream(instrument_id, histories[instrument_id], predictor)
+            self.encode(stream)
+            self.streams[instrument_id] = stream
+        return [self.forecast(stream) for stream in self.streams.values()]
+
+    def tensor(self, values):
+        return torch.as_tensor(values, dtype=torch.float32, device=self.predictor.device)
+
+    def encode(self, stream):
+        """Rebuild (h, c) from the stream's window (seq_length cell steps)"""
+        with torch.no_grad(), autocast(self.predictor.compute_mode, self.predictor.device):
+            _, stream.hidden = self.predictor.model.encode(self.tensor(stream.window).unsqueeze(0))
+        stream.bars_since_encode = 0
+
+    def advance(self, stream, timestamp, close, volume=None):
+        """Feed one new bar: shift the window and take one LSTM cell step"""
+        row = self.predictor.normalize([close], stream.instrument_id)
+        if stream.features is not None:
+            row = np.concatenate([row, stream.features.update(close, volume)])
+            stream.volume = volume
+        stream.window[:-1] = stream.window[1:]
+        stream.window[-1] = row
+
+        stream.bars_since_encode += 1
+        if stream.bars_since_encode >= self.reencode_every:
+            self.encode(stream)
+        else:
+            with torch.no_grad(), autocast(self.predictor.compute_mode, self.predictor.device):
+                _, stream.hidden = self.predictor.model.step(self.tensor(row).unsqueeze(0), stream.hidden)
+
+        stream.timestamps = np.array([stream.timestamps[-1], timestamp])
+        stream.closes = np.array([stream.closes[-1], close])
+        stream.watermark = int(timestamp)
+        stream.bars += 1
+
+    def rollout(self, stream, samples=0):
+        """Normalized forecast (prediction_steps,) from the stream's state, or MC-dropout samples (samples, prediction_steps)"""
+        predictor = self.predictor
+        model = predictor.model
+        copies = max(samples, 1)
+        hidden = tuple(state.repeat(1, copies, 1) for state in stream.hidden) if samples else stream.hidden
+        next_inputs = None
+        if stream.features is not None:
+            # Indicators roll forward on copies, so the live state only ever sees real bars
+            from data.data_preprocessor import ForecastInputs
+            denormalize = lambda value: float(predictor.denormalize(value, stream.instrument_id))
+            next_inputs = ForecastInputs([stream.features.copy() for _ in range(copies)],
+                                         [denormalize] * copies, [stream.volume] * copies)
+
+        with predictor.model_lock:
+            training = model.dropout.training
+            model.dropout.train(bool(samples))
+            try:
+                with torch.no_grad(), autocast(predictor.compute_mode, predictor.device):
+                    predictions_norm = model.rollout(hidden, predictor.prediction_steps, next_inputs)
+            finally:
+                model.dropout.train(training)
+        predictions_norm = predictions_norm.float().cpu().numpy().astype(np.float64)
+        return predictions_norm if samples else predictions_norm[0]
+
+    def forecast(self, stream):
+        """Result JSON (as api_predict.py) for the stream's latest bar"""
+        predictor = self.predictor.for_instrument(stream.instrument_id)
+        predictor.set_data(stream.data)
+        predictions = predictor.denormalize(self.rollout(stream))
+        samples = None
+        if predictor.supports_uncertainty:
+            samples = predictor.denormalize(self.rollout(stream, predictor.uncertainty_samples))
+        result = predictor.build_result(predictions, samples)
+        result['streaming'] = {
+            'barsSinceStart': stream.bars,
+            'barsSinceEncode': stream.bars_since_encode,
+            'reencodeEvery': self.reencode_every
+        }
+        return result
+
+    def poll(self):
+        """Feed every bar added since the last poll; returns the refreshed results"""
+        latest = self.source.fetch_latest_timestamps(self.instrument_ids)
+        results = []
+        for instrument_id, timestamp in latest.items():
+            stream = self.streams[instrument_id]
+            if timestamp is None or int(timestamp) <= stream.watermark:
+                continue
+            bars = self.source.fetch_price_history(instrument_id, self.columns, since=stream.watermark,
+                                                   dtype=np.float64)
+
+            start = time.perf_counter()
+            for i, timestamp in enumerate(bars['timestamp']):
+                self.advance(stream, int(timestamp), float(bars['close'][i]),
+                             float(bars['volume'][i]) if 'volume' in bars else None)
+            self.update_seconds += time.perf_counter() - start
+            self.bars_processed += len(bars['timestamp'])
+
+            if len(bars['timestamp']):
+                result = self.forecast(stream)
+                self.publish(result)
+                results.append(result)
+        return results
+
+    def run(self, interval=30, stop_event=None):
+        """Poll every `interval` seconds until stop_event is set (or forever)"""
+        stop_event = stop_event or threading.Event()
+        for result in self.start():
+            self.publish(result)
+        print(f"Streaming forecasts for {len(self.streams)} instruments every {interval}s", file=sys.stderr)
+        while not stop_event.wait(interval):
+            try:
+                self.poll()
+            except Exception as e:
+                # A failed poll (e.g. a dropped connection) is retried on the next one; watermarks are unchanged
+                print(f"Error polling prices: {e}", file=sys.stderr)
+
+    def stats(self):
+        per_bar = self.update_seconds / self.bars_processed * 1000 if self.bars_processed else None
+        return {'bars': self.bars_processed, 'update_ms_per_bar': per_bar}
+
+
+def file_publisher(output_dir):
+    """Publish each result to stdout and atomically to <output_dir>/<instrument_id>.json"""
+    os.makedirs(output_dir, exist_ok=True)
+
+    def publish(result):
+        line = json.dumps(result, separators=(',', ':'))
+        print(line, flush=True)
+        path = os.path.join(output_dir, f"{result['instrumentId']}.json")
+        atomic_write(path, lambda f: f.write(line.encode()))
+    return publish
+
+
+def replay_synthetic(store, instrument_ids, rows, interval, stop_event):
+    """Fill the store with `rows` generated bars per instrument, then add one more per instrument every interval"""
+    prices = {instrument_id: generate_prices(2 * rows, start_price=30000.0 / (i + 1), seed=i)
+              for i, instrument_id in enumerate(instrument_ids)}
+    for instrument_id, series in prices.items():
+        store.insert(instrument_id, {name: values[:rows] for name, values in series.items()})
+
+    def feed():
+        for bar in range(rows, 2 * rows):
+            if stop_event.wait(interval):
+                return
+            for instrument_id, series in prices.items():
+                store.insert(instrument_id, {name: values[bar:bar + 1] for name, values in series.items()})
+    threading.Thread(target=feed, name='synthetic-feed', daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('instrument_ids', nargs='*', help='Instruments to follow (default: all the model knows)')
+    parser.add_argument('--interval', type=float, default=float(os.getenv('FORECAST_POLL_INTERVAL', '30')),
+                        help='Seconds between polls of instrument_prices')
+    parser.add_argument('--reencode-every', type=int,
+                        help='Bars between rebuilds of the LSTM state from the window (default: seq_length)')
+    parser.add_argument('--output-dir', help='Also keep the latest result per instrument in this directory')
+    parser.add_argument('--synthetic', type=int, metavar='ROWS',
+                        help='Start from this many synthetic bars per instrument instead of the database; '
+                             'one new bar per instrument arrives every interval')
+    args = parser.parse_args()
+
+    # Model paths are relative to this script, like api_predict.py
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    predictor = BTCPricePredictor(
+        uncertainty_samples=int(os.getenv('PREDICTION_UNCERTAINTY_SAMPLES', '100')),
+        compute_mode=os.getenv('PREDICTION_COMPUTE_MODE', 'fp32')
+    )
+    predictor.load_model()
+    instrument_ids = args.instrument_ids or list(predictor.scalers)
+    stop_event = threading.Event()
+    source = None
+    if args.synthetic:
+        source = SQLitePriceStore()
+        replay_synthetic(source, instrument_ids, args.synthetic, args.interval, stop_event)
+    daemon = ForecastDaemon(predictor, instrument_ids, source, args.reencode_every,
+                            file_publisher(args.output_dir) if args.output_dir else None)
+
+    try:
+        daemon.run(args.interval, stop_event)
+    except KeyboardInterrupt:
+        stats = daemon.stats()
+        if stats['bars']:
+            print(f"Processed {stats['bars']} bars, {stats['update_ms_per_bar']:.3f}ms per bar", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
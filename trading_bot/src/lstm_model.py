@@ -0,0 +1,149 @@
+"""
+LSTM Model for Bitcoin Price Prediction
+Shared by the training bot and the prediction scripts
+"""
+
+import torch
+import torch.nn as nn
+
+
+class LSTMModel(nn.Module):
+    """LSTM Model for Bitcoin Price Prediction"""
+    def __init__(self, input_size=1, hidden_layer_size=64, output_size=1, dropout=0.0):
+        super(LSTMModel, self).__init__()
+        self.hidden_layer_size = hidden_layer_size
+        self.lstm = nn.LSTM(input_size, hidden_layer_size)
+        # On the LSTM output; besides regularizing training it powers MC-dropout sampling (sample_forecast)
+        self.dropout = nn.Dropout(dropout)
+        self.linear = nn.Linear(hidden_layer_size, output_size)
+        self.hidden_cell = (torch.zeros(1, 1, self.hidden_layer_size),
+                            torch.zeros(1, 1, self.hidden_layer_size))
+
+    def forward(self, input_seq):
+        if input_seq.dim() == 3:
+            # Batched input (batch, seq_length, features): each sequence starts from a zero state
+            lstm_out, _ = self.lstm(input_seq.transpose(0, 1))
+            return self.linear(self.dropout(lstm_out[-1]))
+        lstm_out, self.hidden_cell = self.lstm(input_seq.view(len(input_seq), 1, -1), self.hidden_cell)
+        predictions = self.linear(self.dropout(lstm_out.view(len(input_seq), -1)))
+        return predictions[-1]
+
+    def encode(self, window):
+        """Run windows (batch, seq_length, features) from a zero state; returns the next-value prediction and (h, c)"""
+        lstm_out, hidden = self.lstm(window.transpose(0, 1))
+        return self.linear(self.dropout(lstm_out[-1])), hidden
+
+    def step(self, value, hidden):
+        """Advance one time step from (h, c) with inputs (batch, features)"""
+        lstm_out, hidden = self.lstm(value.unsqueeze(0), hidden)
+        return self.linear(self.dropout(lstm_out[0])), hidden
+
+    @torch.no_grad()
+    def forecast(self, window, steps, stateful=False):
+        """Autoregressive forecast for windows (batch, seq_length, 1); returns (batch, steps)
+
+        The default sliding-window mode re-runs the model over the last seq_length values
+        at every step, exactly like training. Stateful mode encodes the window once and
+        then feeds each prediction back through a single LSTM cell step carrying (h, c),
+        so each extra step costs one cell instead of seq_length. Only its first step is
+        identical. Later steps also see the values that slid out of the window, which the
+        model never saw in training, so they are a cheaper approximation rather than the same
+        forecast: on trained checkpoints they differ by up to ~0.1 in scaled units (a tenth
+        of the training price range) within 10 steps.
+        """
+        return LSTMForecaster(self)(window, steps, stateful)
+
+    @torch.no_grad()
+    def forecast_features(self, window, steps, next_inputs, stateful=False):
+        """Autoregressive forecast for multi-feature windows (batch, seq_length, input_size)
+
+        next_inputs(predictions) maps one step's predicted values (a (batch,) array) to the
+        next input rows (batch, input_size), e.g. by feeding the predicted price through
+        streaming indicators. Modes are as in forecast().
+        """
+        predictions = window.new_empty(len(window), steps)
+        pred, hidden = self.encode(window)
+        for step in range(steps):
+            predictions[:, step] = pred[:, 0]
+            if step == steps - 1:
+                break
+            row = torch.as_tensor(next_inputs(pred[:, 0].cpu().numpy()), dtype=window.dtype, device=window.device)
+            if stateful:
+                pred, hidden = self.step(row, hidden)
+            else:
+                window = torch.cat([window[:, 1:], row.unsqueeze(1)], dim=1)
+                pred, _ = self.encode(window)
+        return predictions
+
+    @torch.no_grad()
+    def rollout(self, hidden, steps, next_inputs=None):
+        """Stateful forecast (batch, steps) from an (h, c) state that has already seen the latest bar
+
+        The first value is the output for h; each later one is a single cell step fed the
+        previous value (or next_inputs(values) for feature models, as in forecast_features).
+        rollout(encode(window)[1], steps) equals forecast(window, steps, stateful=True).
+        """
+        h = hidden[0]
+        predictions = h.new_empty(h.shape[1], steps)
+        pred = self.linear(self.dropout(h[-1]))
+        for step in range(steps):
+            predictions[:, step] = pred[:, 0]
+            if step == steps - 1:
+                break
+            row = pred if next_inputs is None else torch.as_tensor(next_inputs(pred[:, 0].cpu().numpy()),
+                                                                   dtype=h.dtype, device=h.device)
+            pred, hidden = self.step(row, hidden)
+        return predictions
+
+    @torch.no_grad()
+    def sample_forecast(self, window, steps, samples, stateful=False, next_inputs=None):
+        """MC-dropout forecast samples (samples, batch, steps) from one batched pass
+
+        Every window is repeated `samples` times along the batch (sample-major) and forecast
+        with dropout active, so each copy follows its own autoregressive path. Feature models
+        pass next_inputs for the repeated batch, as in forecast_features().
+        """
+        repeated = window.repeat(samples, 1, 1)
+        training = self.dropout.training
+        self.dropout.train()
+        try:
+            if next_inputs is None:
+                predictions = self.forecast(repeated, steps, stateful)
+            else:
+                predictions = self.forecast_features(repeated, steps, next_inputs, stateful)
+        finally:
+            self.dropout.train(training)
+        return predictions.view(samples, len(window), steps)
+
+
+class LSTMForecaster(nn.Module):
+    """Inference-only view of an LSTMModel that TorchScript can compile and quantize"""
+    def __init__(self, model):
+        super(LSTMForecaster, self).__init__()
+        self.lstm = model.lstm
+        self.dropout = model.dropout
+        self.linear = model.linear
+
+    def forward(self, window: torch.Tensor, steps: int, stateful: bool = False) -> torch.Tensor:
+        """See LSTMModel.forecast"""
+        batch, seq_length, features = window.shape
+        predictions = window.new_empty(batch, steps)
+
+        if stateful:
+            lstm_out, hidden = self.lstm(window.transpose(0, 1))
+            pred = self.linear(self.dropout(lstm_out[-1]))
+            predictions[:, 0] = pred[:, 0]
+            for step in range(1, steps):
+                lstm_out, hidden = self.lstm(pred.unsqueeze(0), hidden)
+                pred = self.linear(self.dropout(lstm_out[0]))
+                predictions[:, step] = pred[:, 0]
+            return predictions
+
+        # One buffer holds the window followed by the predictions, so sliding never reallocates
+        buffer = torch.cat([window, window.new_empty(batch, steps, features)], dim=1)
+        for step in range(steps):
+            lstm_out, _ = self.lstm(buffer[:, step:step + seq_length].transpose(0, 1))
+            pred = self.linear(self.dropout(lstm_out[-1]))
+            buffer[:, seq_length + step] = pred
+            predictions[:, step] = pred[:, 0]
+        return predictions
@@ -0,0 +1,115 @@
+"""
+Compact Inference Artifact
+Model weights, per-instrument scaler parameters, forecast settings and training metadata in
+one versioned file that loads with torch.load(weights_only=True, mmap=True), without
+unpickling sklearn objects. Memory-mapped weights are read from the page cache on demand, so
+worker processes loading the same artifact share its pages instead of each holding a copy.
+"""
+
+import os
+import pickle
+from datetime import datetime
+
+import numpy as np
+import torch
+
+from config.settings import BTC_INSTRUMENT_ID
+from utils.checkpoint import atomic_torch_save
+
+# File written next to the checkpoint, e.g. best_btc_lstm_model.compact.pt
+ARTIFACT_SUFFIX = '.compact.pt'
+
+# Bumped when the layout changes; version 1 artifacts predate the 'version' key
+ARTIFACT_VERSION = 2
+
+
+def artifact_path(model_path):
+    """Path of the compact artifact for a checkpoint"""
+    return os.path.splitext(model_path)[0] + ARTIFACT_SUFFIX
+
+
+def is_current(model_path):
+    """True if the compact artifact exists and is not older than the checkpoint it was made from"""
+    path = artifact_path(model_path)
+    if not os.path.exists(path):
+        return False
+    return not os.path.exists(model_path) or os.path.getmtime(path) >= os.path.getmtime(model_path)
+
+
+def scaler_params(scaler):
+    """Parameters of a fitted single-feature MinMaxScaler: scaled = price * scale + min"""
+    return {'min': float(scaler.min_[0]), 'scale': float(scaler.scale_[0])}
+
+
+def unscale(values, params):
+    """Model outputs -> prices, like MinMaxScaler.inverse_transform (params from scaler_params)"""
+    return (np.asarray(values, dtype=np.float64) - params['min']) / params['scale']
+
+
+def save_artifact(path, model_state_dict, hidden_size, seq_length, prediction_steps, instrument_ids, scalers,
+                  feature_config=None, dropout=0.0, metadata=None):
+    """Write the artifact atomically; scalers is {instrument_id: fitted MinMaxScaler}
+
+    metadata holds plain values describing the training run (validation loss, newest bar per
+    instrument, ...); the creation time and torch version are always added.
+    """
+    atomic_torch_save({
+        'version': ARTIFACT_VERSION,
+        'model_state_dict': {name: tensor.detach().cpu() for name, tensor in model_state_dict.items()},
+        'hidden_size': hidden_size,
+        'seq_length': seq_length,
+        'prediction_steps': prediction_steps,
+        'instrument_ids': list(instrument_ids),
+        'scalers': {instrument_id: scaler_params(scaler) for instrument_id, scaler in scalers.items()},
+        # FeaturePipeline.config() of feature models (None: close price only)
+        'input_size': 1 + (len(feature_config['features']) if feature_config else 0),
+        'feature_config': feature_config,
+        'dropout': dropout,  # Enables MC-dropout prediction intervals when > 0
+        'metadata': {
+            'created_at': datetime.now().isoformat(),
+            'torch_version': str(torch.__version__),
+            **(metadata or {}),
+        },
+    }, path)
+
+
+def load_artifact(path, mmap=True):
+    """Load an artifact on CPU; only tensors and plain Python values are allowed
+
+    With mmap=True the tensors are backed by the file (copy-on-write) rather than read into
+    private memory; load them with load_state_dict(..., assign=True) to keep it that way.
+    """
+    artifact = torch.load(path, map_location='cpu', weights_only=True, mmap=mmap)
+    version = artifact.get('version', 1)
+    if version > ARTIFACT_VERSION:
+        raise Exception(f"Model artifact {path} has version {version}; "
+                        f"this code reads versions up to {ARTIFACT_VERSION}")
+    return artifact
+
+
+def training_metadata(checkpoint):
+    """Artifact metadata from a bot.py checkpoint"""
+    best_val_loss = checkpoint.get('best_val_loss')
+    return {
+        'best_val_loss': None if best_val_loss is None else float(best_val_loss),
+        # Newest bar trained on per instrument (epoch ms)
+        'data_watermarks': checkpoint.get('data_watermarks'),
+        'compute_mode': checkpoint.get('compute_mode'),
+    }
+
+
+def export_artifact(model_path='../../best_btc_lstm_model.pth', scaler_path='../../scaler.pkl'):
+    """Build the artifact from an existing checkpoint and scaler.pkl; returns its path"""
+    checkpoint = torch.load(model_path, map_location='cpu', weights_only=False)
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+
+    # Older checkpoints hold a single scaler for one instrument
+    instrument_ids = checkpoint.get('instrument_ids') or [BTC_INSTRUMENT_ID]
+    scalers = scaler if isinstance(scaler, dict) else {instrument_ids[0]: scaler}
+
+    path = artifact_path(model_path)
+    save_artifact(path, checkpoint['model_state_dict'], checkpoint['hidden_size'], checkpoint['seq_length'],
+                  checkpoint['prediction_steps'], list(scalers), scalers, checkpoint.get('feature_config'),
+                  checkpoint.get('dropout', 0.0), training_metadata(checkpoint))
+    return path
@@ -6,59 +6,28 @@ Shows buy/sell signals with percentage changes and visualization
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import torch
-import torch.nn as nn
-import pymysql
 from datetime import datetime, timedelta
 import pickle
 import warnings
-import os
-from dotenv import load_dotenv
-
-warnings.filterwarnings('ignore')
-
-# Load environment variables from .env file
-load_dotenv('../../server/.env')
-
-# Database configuration from .env
-DB_CONFIG = {
-    'charset': os.getenv('DB_CHARSET', 'utf8mb4'),
-    'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '10')),
-    'cursorclass': pymysql.cursors.DictCursor,
-    'db': os.getenv('DB_NAME'),
-    'host': os.getenv('DB_HOST'),
-    'password': os.getenv('DB_PASSWORD'),
-    'read_timeout': int(os.getenv('DB_READ_TIMEOUT', '10')),
-    'port': int(os.getenv('DB_PORT', '3306')),
-    'user': os.getenv('DB_USER'),
-    'write_timeout': int(os.getenv('DB_WRITE_TIMEOUT', '10')),
-}
-
+import sys
 
+from config.settings import BTC_INSTRUMENT_ID
+from lstm_model import LSTMModel
+from utils.charts import ChartRenderer, charts_enabled
+from utils.db import get_pool
 
-class LSTMModel(nn.Module):
-    """LSTM Model for Bitcoin Price Prediction"""
-    def __init__(self, input_size=1, hidden_layer_size=64, output_size=1):
-        super(LSTMModel, self).__init__()
-        self.hidden_layer_size = hidden_layer_size
-        self.lstm = nn.LSTM(input_size, hidden_layer_size)
-        self.linear = nn.Linear(hidden_layer_size, output_size)
-        self.hidden_cell = (torch.zeros(1, 1, self.hidden_layer_size),
-                            torch.zeros(1, 1, self.hidden_layer_size))
-
-    def forward(self, input_seq):
-        lstm_out, self.hidden_cell = self.lstm(input_seq.view(len(input_seq), 1, -1), self.hidden_cell)
-        predictions = self.linear(lstm_out.view(len(input_seq), -1))
-        return predictions[-1]
+warnings.filterwarnings('ignore')
 
 
 class BTCPricePredictor:
     """Bitcoin Price Predictor using trained LSTM model"""
     
-    def __init__(self, model_path='best_btc_lstm_model.pth', scaler_path='scaler.pkl'):
+    def __init__(self, model_path='best_btc_lstm_model.pth', scaler_path='scaler.pkl', stateful_forecast=False,
+                 instrument_id=BTC_INSTRUMENT_ID, render_charts=True):
         self.model_path = model_path
         self.scaler_path = scaler_path
+        self.instrument_id = instrument_id
         self.model = None
         self.scaler = None
         self.data = None
@@ -66,6 +35,12 @@ class BTCPricePredictor:
         self.yesterday_price = None
         self.seq_length = None
         self.prediction_steps = None
+        self.preprocessor = None  # FeaturePipeline of models trained with indicator inputs
+        # Stateful forecasts trade accuracy for speed: only day 1 matches the default sliding-window
+        # forecast, later days can differ by ~10% of the price range; see LSTMModel.forecast
+        self.stateful_forecast = stateful_forecast
+        # PNG chart drawn on a background thread after the predictions are shown (render_charts=False skips it)
+        self.charts = ChartRenderer(render_charts)
         
         # Setup device (GPU if available, otherwise CPU)
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -83,19 +58,32 @@ class BTCPricePredictor:
             self.prediction_steps = checkpoint['prediction_steps']
             hidden_size = checkpoint['hidden_size']
             
-            # Initialize and load model, move to device
-            self.model = LSTMModel(hidden_layer_size=hidden_size).to(self.device)
+            # Initialize and load model, move to device (feature models take indicator columns too)
+            self.model = LSTMModel(input_size=checkpoint.get('input_size', 1), hidden_layer_size=hidden_size,
+                                   dropout=checkpoint.get('dropout', 0.0)).to(self.device)
             self.model.load_state_dict(checkpoint['model_state_dict'])
             self.model.eval()
+            feature_config = checkpoint.get('feature_config')
+            if feature_config:
+                from data.data_preprocessor import FeaturePipeline
+                self.preprocessor = FeaturePipeline(**feature_config)
             
-            # Load scaler
+            # Load scaler (older checkpoints hold a single scaler for one instrument)
             with open(self.scaler_path, 'rb') as f:
-                self.scaler = pickle.load(f)
+                scaler = pickle.load(f)
+            instrument_ids = checkpoint.get('instrument_ids', [BTC_INSTRUMENT_ID])
+            scalers = scaler if isinstance(scaler, dict) else {instrument_ids[0]: scaler}
+            if self.instrument_id not in scalers:
+                print(f"Model was not trained on instrument {self.instrument_id}")
+                return False
+            self.scaler = scalers[self.instrument_id]
             
             print(f"Model loaded successfully!")
             print(f"Sequence length: {self.seq_length} days")
             print(f"Prediction steps: {self.prediction_steps} days")
             print(f"Hidden size: {hidden_size}")
+            if self.preprocessor is not None:
+                print(f"Features: {', '.join(self.preprocessor.features)}")
             print(f"Best validation loss: {checkpoint['best_val_loss']:.6f}")
             return True
             
@@ -109,33 +97,28 @@ class BTCPricePredictor:
         """Fetch latest Bitcoin price data from database"""
         print("\nFetching latest Bitcoin data from database...")
         try:
-            connection = pymysql.connect(**DB_CONFIG)
-            cursor = connection.cursor()
-            
-            # Fetch latest data (need at least seq_length + 1 for yesterday's price)
-            cursor.execute(f"""
-                SELECT timestamp, close_price 
-                FROM instrument_prices 
-                WHERE instrument_id = '2376ac2b-fe9f-41ad-bb47-deb6d30d3253'
-                ORDER BY timestamp DESC
-                LIMIT {self.seq_length + 10}
-            """)
+            # Fetch latest data (need at least seq_length + 1 for yesterday's price; feature
+            # models also need enough history for their indicators to settle)
+            limit, columns, required = self.seq_length + 10, ('close',), self.seq_length
+            if self.preprocessor is not None:
+                limit += self.preprocessor.history_bars
+                columns = ('close', 'volume')
+                required += self.preprocessor.warmup
+            prices = get_pool().fetch_latest_prices(
+                [self.instrument_id], limit, columns=columns, dtype=np.float64
+            )[self.instrument_id]
             
-            rows = cursor.fetchall()
-            connection.close()
-            
-            if len(rows) < self.seq_length:
-                print(f"Not enough data. Need at least {self.seq_length} records, got {len(rows)}")
+            if len(prices['timestamp']) < required:
+                print(f"Not enough data. Need at least {required} records, got {len(prices['timestamp'])}")
                 return False
             
-            # Convert to DataFrame (reverse to chronological order)
-            df = pd.DataFrame(rows[::-1])
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df['close_price'] = df['close_price'].astype(float)  # Convert Decimal to float
-            df = df.rename(columns={'close_price': 'Close', 'timestamp': 'Date'})
-            df = df.set_index('Date')
+            # Convert to DataFrame (already in chronological order)
+            index = pd.to_datetime(prices['timestamp'], unit='ms').rename('Date')
+            df = pd.DataFrame({'Close': prices['close']}, index=index)
+            if 'volume' in prices:
+                df['Volume'] = prices['volume']
             
-            self.data = df[['Close']].copy()
+            self.data = df.copy()
             self.current_price = float(self.data['Close'].iloc[-1])
             self.yesterday_price = float(self.data['Close'].iloc[-2]) if len(self.data) > 1 else self.current_price
             
@@ -157,38 +140,37 @@ class BTCPricePredictor:
             return False
     
     def predict_future_prices(self):
-        """Predict future prices using sliding window on GPU/CPU"""
+        """Predict future prices using sliding window (or stateful steps) on GPU/CPU"""
         print(f"\nPredicting next {self.prediction_steps} days...")
         
         # Get last sequence
         last_sequence = self.data['Close'].values[-self.seq_length:]
         last_sequence_norm = self.scaler.transform(last_sequence.reshape(-1, 1)).flatten()
         
-        # Multi-step prediction
-        predictions_norm = []
-        temp_seq = last_sequence_norm.copy()
-        
-        with torch.no_grad():
-            for step in range(self.prediction_steps):
-                # Move hidden states to device
-                self.model.hidden_cell = (
-                    torch.zeros(1, 1, self.model.hidden_layer_size).to(self.device),
-                    torch.zeros(1, 1, self.model.hidden_layer_size).to(self.device)
-                )
-                
-                # Move data to device
-                seq_tensor = torch.FloatTensor(temp_seq).to(self.device)
-                y_pred = self.model(seq_tensor)
-                pred_value = y_pred.cpu().item()  # Move back to CPU for numpy operations
-                predictions_norm.append(pred_value)
-                
-                # Slide window
-                temp_seq = np.append(temp_seq[1:], pred_value)
+        # Multi-step prediction (see LSTMModel.forecast for the two modes)
+        self.model.eval()
+        if self.preprocessor is None:
+            window = torch.as_tensor(last_sequence_norm, dtype=torch.float32, device=self.device).view(1, -1, 1)
+            predictions_norm = self.model.forecast(window, self.prediction_steps, stateful=self.stateful_forecast)
+        else:
+            # Indicator columns next to the close; each predicted price updates them for the next step
+            from data.data_preprocessor import ForecastInputs
+            close = self.data['Close'].values
+            volume = self.data['Volume'].values if 'Volume' in self.data else None
+            features = self.preprocessor.transform(close, volume)[-self.seq_length:]
+            window = torch.as_tensor(np.column_stack([last_sequence_norm, features]), dtype=torch.float32,
+                                     device=self.device).unsqueeze(0)
+            next_inputs = ForecastInputs(
+                [self.preprocessor.stream(close, volume)],
+                [lambda value: float(self.scaler.inverse_transform([[value]])[0, 0])],
+                [volume[-1] if volume is not None else None]
+            )
+            predictions_norm = self.model.forecast_features(window, self.prediction_steps, next_inputs,
+                                                            stateful=self.stateful_forecast)
+        predictions_norm = predictions_norm.cpu().numpy().astype(np.float64).flatten()  # Move back to CPU for numpy operations
         
         # Inverse transform to actual prices
-        predictions = self.scaler.inverse_transform(
-            np.array(predictions_norm).reshape(-1, 1)
-        ).flatten()
+        predictions = self.scaler.inverse_transform(predictions_norm.reshape(-1, 1)).flatten()
         
         print("Predictions generated!")
         return predictions
@@ -284,15 +266,22 @@ class BTCPricePredictor:
         return predictions, changes_vs_yesterday
     
     def plot_predictions(self, predictions):
+        """Queue the prediction chart; it is drawn in the background by self.charts"""
+        _, changes_vs_yesterday = self.calculate_percentage_changes(predictions)
+        # Last 30 days, copied so the worker never sees later updates
+        self.charts.submit(self.render_predictions, self.data['Close'].iloc[-30:].copy(), np.array(predictions),
+                           changes_vs_yesterday, self.current_price, self.yesterday_price)
+    
+    def render_predictions(self, plt, history, predictions, changes_vs_yesterday, current_price, yesterday_price):
         """Plot historical data with future predictions"""
         print("\nGenerating prediction chart...")
         
         # Prepare historical data (last 30 days)
-        historical_prices = self.data['Close'].values[-30:]
-        historical_dates = self.data.index[-30:]
+        historical_prices = history.values
+        historical_dates = history.index
         
         # Future dates
-        base_date = self.data.index[-1]
+        base_date = history.index[-1]
         future_dates = [base_date + timedelta(days=i+1) for i in range(self.prediction_steps)]
         
         # Create figure with 2 subplots
@@ -315,12 +304,12 @@ class BTCPricePredictor:
                 marker='s', markersize=7, alpha=0.8)
         
         # Add current price line
-        ax1.axhline(y=self.current_price, color='green', linestyle=':', 
-                   alpha=0.6, label=f'Current Price: ${self.current_price:,.0f}')
+        ax1.axhline(y=current_price, color='green', linestyle=':', 
+                   alpha=0.6, label=f'Current Price: ${current_price:,.0f}')
         
         # Add yesterday's price line
-        ax1.axhline(y=self.yesterday_price, color='orange', linestyle=':', 
-                   alpha=0.6, label=f"Yesterday's Price: ${self.yesterday_price:,.0f}")
+        ax1.axhline(y=yesterday_price, color='orange', linestyle=':', 
+                   alpha=0.6, label=f"Yesterday's Price: ${yesterday_price:,.0f}")
         
         # Formatting
         ax1.set_xlabel('Date', fontsize=12, fontweight='bold')
@@ -332,8 +321,6 @@ class BTCPricePredictor:
         ax1.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:,.0f}'))
         
         # ===== PLOT 2: Percentage Change =====
-        _, changes_vs_yesterday = self.calculate_percentage_changes(predictions)
-        
         colors = ['green' if c > 0 else 'red' for c in changes_vs_yesterday]
         bars = ax2.bar(range(1, self.prediction_steps + 1), changes_vs_yesterday, 
                       color=colors, alpha=0.7, edgecolor='black', linewidth=1.5)
@@ -360,7 +347,6 @@ class BTCPricePredictor:
         # Save plot
         plt.savefig('btc_prediction.png', dpi=150, bbox_inches='tight')
         print("Chart saved as 'btc_prediction.png'")
-        plt.show()
     
     def run(self):
         """Main execution flow"""
@@ -386,12 +372,16 @@ class BTCPricePredictor:
         self.plot_predictions(predictions)
         
         print("\nPrediction complete!")
+        
+        # The predictions are shown; finish the chart before the process exits
+        self.charts.wait()
 
 
 if __name__ == "__main__":
     predictor = BTCPricePredictor(
         model_path='best_btc_lstm_model.pth',
-        scaler_path='scaler.pkl'
+        scaler_path='scaler.pkl',
+        render_charts=charts_enabled(sys.argv[1:])  # --no-charts or CHARTS=0 skips the PNG
     )
     
     try:
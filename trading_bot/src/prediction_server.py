@@ -0,0 +1,165 @@
+"""
+Bitcoin Price Prediction Server
+Keeps the trained LSTM model loaded in one long-lived process
+Serves the same JSON as api_predict.py over local HTTP
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from api_predict import BTCPricePredictor
+from utils.prediction_cache import PredictionCache
+
+HOST = os.getenv('PREDICTION_SERVER_HOST', '127.0.0.1')
+PORT = int(os.getenv('PREDICTION_SERVER_PORT', '8001'))
+
+
+class PredictionService:
+    """Owns a warm BTCPricePredictor shared by concurrent requests
+
+    Requests run in parallel: each call keeps its instrument and price data on a per-call copy of
+    the predictor (BTCPricePredictor.for_instrument), and only the model invocations themselves
+    take the predictor's model_lock. Database reads and cache hits never wait on other requests.
+    """
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+        self.status = 'loading'
+        self.error = None
+        self.started_at = datetime.now()
+        self.ready_at = None
+        self.requests_served = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Load and warm up the model (run in a background thread)"""
+        try:
+            start = time.perf_counter()
+            self.predictor.load_model()
+            self.predictor.warm_up()
+            self.ready_at = datetime.now()
+            self.status = 'ready'
+            print(f"Model ready in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+        except Exception as e:
+            self.error = str(e)
+            self.status = 'error'
+            print(f"Failed to load model: {e}", file=sys.stderr)
+
+    def predict(self, instrument_id=None):
+        """Run one prediction on the shared model"""
+        return self.call(self.predictor.run, instrument_id)
+
+    def predict_all(self, instrument_ids=None):
+        """Forecast several instruments in one batched model invocation"""
+        return self.call(self.predictor.run_all, instrument_ids)
+
+    def call(self, method, *args):
+        """Run a predictor method once the model is ready"""
+        if self.status != 'ready':
+            raise Exception(f"Prediction server not ready (status: {self.status})")
+
+        result = method(*args)
+        with self.lock:
+            self.requests_served += 1
+        return result
+
+    def health(self):
+        """Readiness report for load balancers and the Node server"""
+        return {
+            'status': self.status,
+            'ready': self.status == 'ready',
+            'error': self.error,
+            'startedAt': self.started_at.isoformat(),
+            'readyAt': self.ready_at.isoformat() if self.ready_at else None,
+            'requestsServed': self.requests_served,
+            'cache': self.predictor.prediction_cache.stats() if self.predictor.prediction_cache else None,
+            'modelInfo': {
+                'sequenceLength': self.predictor.seq_length,
+                'predictionSteps': self.predictor.prediction_steps,
+                'device': str(self.predictor.device)
+            }
+        }
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler: GET /predict[?instrument=id], GET /predict/all[?instrument=id&...] and GET /health"""
+
+    service = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip('/')
+        instrument_ids = parse_qs(url.query).get('instrument', [])
+
+        if path == '/health':
+            health = self.service.health()
+            self.send_json(200 if health['ready'] else 503, health)
+        elif path in ('', '/predict', '/predict/all'):
+            try:
+                if path == '/predict/all':
+                    self.send_json(200, self.service.predict_all(instrument_ids or None))
+                else:
+                    self.send_json(200, self.service.predict(instrument_ids[0] if instrument_ids else None))
+            except Exception as e:
+                self.send_json(500, {
+                    'success': False,
+                    'error': str(e),
+                    'timestamp': datetime.now().isoformat()
+                })
+        else:
+            self.send_json(404, {'success': False, 'error': f"Unknown path: {path}"})
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep stdout clean; access logs go to stderr
+        print(f"{self.address_string()} - {format % args}", file=sys.stderr)
+
+
+def main():
+    """Start the prediction server"""
+    # Model paths are relative to this script, same as api_predict.py
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(script_dir)
+
+    prediction_cache = PredictionCache(
+        max_entries=int(os.getenv('PREDICTION_CACHE_SIZE', '256')),
+        ttl=float(os.getenv('PREDICTION_CACHE_TTL', '3600')),
+        cache_dir=os.getenv('PREDICTION_CACHE_DIR')
+    )
+    service = PredictionService(BTCPricePredictor(
+        model_format=os.getenv('PREDICTION_MODEL_FORMAT', 'eager'),
+        uncertainty_samples=int(os.getenv('PREDICTION_UNCERTAINTY_SAMPLES', '100')),
+        compute_mode=os.getenv('PREDICTION_COMPUTE_MODE', 'fp32'),
+        prediction_cache=prediction_cache
+    ))
+    threading.Thread(target=service.start, daemon=True).start()
+
+    PredictionRequestHandler.service = service
+    server = ThreadingHTTPServer((HOST, PORT), PredictionRequestHandler)
+    server.daemon_threads = True
+    print(f"Prediction server listening on http://{HOST}:{PORT}", file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nPrediction server stopped by user", file=sys.stderr)
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
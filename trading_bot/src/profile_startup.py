@@ -0,0 +1,111 @@
+"""
+Startup Profile for api_predict.py
+Measures a cold process from spawn to first prediction, broken into import, model load
+and forecast phases, lists the slowest imports, and fails when time-to-first-prediction
+exceeds the budget (for CI tracking)
+
+Usage: python profile_startup.py [--budget-ms 2500] [--runs 3] [--db] [--json results.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Runs in a fresh interpreter; prints wall-clock milestones as JSON on stdout
+PROBE = r"""
+import json, sys, time
+marks = {'start': time.time()}
+import api_predict
+marks['imported'] = time.time()
+predictor = api_predict.BTCPricePredictor(model_format=sys.argv[1])
+predictor.load_model()
+marks['model_loaded'] = time.time()
+if sys.argv[2] == 'db':
+    predictor.run()
+else:
+    import numpy as np
+    # Synthetic history so the forecast path runs without a database
+    count = predictor.seq_length + 10
+    predictor.set_data({
+        'timestamp': 1700000000000 + np.arange(count, dtype=np.int64) * 86400000,
+        'close': np.linspace(30000.0, 31000.0, count),
+    })
+    predictor.build_result(predictor.predict_future_prices())
+marks['first_prediction'] = time.time()
+print(json.dumps(marks))
+"""
+
+
+def parse_importtime(stderr, top=10):
+    """Slowest top-level imports from `python -X importtime` output, as (module, cumulative ms)"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented under the module that triggered them
+        if not name[1:].startswith(' '):
+            imports.append((name.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:top]
+
+
+def profile_once(model_format='eager', use_db=False):
+    """Spawn one cold api_predict process; returns phase timings in ms and the slowest imports"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    spawned = time.time()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE, model_format, 'db' if use_db else 'offline'],
+        cwd=script_dir, capture_output=True, text=True
+    )
+    if process.returncode != 0:
+        raise Exception(f"Startup probe failed:\n{process.stderr[-2000:]}")
+
+    marks = json.loads(process.stdout.strip().splitlines()[-1])
+    return {
+        'interpreter_ms': (marks['start'] - spawned) * 1000,
+        'imports_ms': (marks['imported'] - marks['start']) * 1000,
+        'load_model_ms': (marks['model_loaded'] - marks['imported']) * 1000,
+        'first_prediction_ms': (marks['first_prediction'] - marks['model_loaded']) * 1000,
+        'time_to_first_prediction_ms': (marks['first_prediction'] - spawned) * 1000,
+        'slowest_imports': parse_importtime(process.stderr),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('STARTUP_BUDGET_MS', '2500')),
+                        help='Fail if the median time-to-first-prediction exceeds this (env STARTUP_BUDGET_MS)')
+    parser.add_argument('--runs', type=int, default=3, help='Cold starts to measure (the median is reported)')
+    parser.add_argument('--model-format', default=os.getenv('PREDICTION_MODEL_FORMAT', 'eager'))
+    parser.add_argument('--db', action='store_true', help='Include the database fetch (needs server/.env)')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    runs = [profile_once(args.model_format, args.db) for _ in range(args.runs)]
+    phases = [key for key in runs[0] if key.endswith('_ms')]
+    median = {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in phases}
+
+    print(f"\nCold start of api_predict.py ({args.model_format}, {'db' if args.db else 'offline'}, "
+          f"median of {args.runs})")
+    print("-" * 50)
+    for key in phases:
+        print(f"{key[:-3]:<28} {median[key]:>10.1f} ms")
+    print("\nSlowest top-level imports (first run):")
+    for name, ms in runs[0]['slowest_imports']:
+        print(f"  {name:<36} {ms:>10.1f} ms")
+
+    passed = median['time_to_first_prediction_ms'] <= args.budget_ms
+    print(f"\nTime to first prediction: {median['time_to_first_prediction_ms']:.1f} ms "
+          f"(budget {args.budget_ms:.0f} ms) - {'OK' if passed else 'OVER BUDGET'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'median': median, 'budget_ms': args.budget_ms, 'passed': passed, 'runs': runs}, f, indent=2)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Strategy Runner
+Runs the strategy engine (strategies/engine.py) in one long-lived process: every interval it
+fetches the latest bars of all instruments in one round trip, forecasts them in one batched
+model call and evaluates every strategy on them, publishing the resulting orders as JSON lines.
+Ticks are skipped while no instrument has a new bar.
+
+Usage: python run_strategies.py [instrument_id ...] [--strategies trend interval]
+                                [--interval 30] [--budget-ms 250] [--notional USD] [--synthetic ROWS]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from api_predict import BTCPricePredictor
+from data.synthetic import SQLitePriceStore
+from forecast_daemon import replay_synthetic
+from strategies.base import STRATEGIES
+from strategies.engine import StrategyEngine, market_snapshot
+from utils.db import get_pool
+
+
+def run(predictor, engine, source, interval=30, stop_event=None, publish=None):
+    """Tick every `interval` seconds until stop_event is set (or forever)"""
+    stop_event = stop_event or threading.Event()
+    publish = publish or (lambda order: print(json.dumps(order, separators=(',', ':')), flush=True))
+    instrument_ids = engine.instrument_ids
+    latest = None
+    while True:
+        try:
+            start = time.perf_counter()
+            timestamps = source.fetch_latest_timestamps(instrument_ids)
+            if timestamps != latest:
+                histories = predictor.fetch_latest_windows(instrument_ids)
+                snapshot = market_snapshot(predictor, histories, instrument_ids, engine.uses_intervals)
+                for order in engine.tick(snapshot, time.perf_counter() - start):
+                    publish(order)
+                latest = timestamps
+        except Exception as e:
+            # Retried on the next tick (e.g. a dropped connection)
+            print(f"Error running tick: {e}", file=sys.stderr)
+        if stop_event.wait(interval):
+            return
+
+
+def print_stats(stats):
+    print(f"\n{stats['ticks']} ticks, {stats['strategies']} strategies x {stats['instruments']} instruments, "
+          f"{stats['overruns']} over the {stats['budgetMs']:.0f}ms budget", file=sys.stderr)
+    print(f"Orders: {stats['ordersSent']} sent, {stats['ordersDropped']} dropped", file=sys.stderr)
+    for phase, latency in stats['latency'].items():
+        print(f"  {phase:<12} p50 {latency['p50_ms']:8.3f}ms  p99 {latency['p99_ms']:8.3f}ms  "
+              f"max {latency['max_ms']:8.3f}ms", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('instrument_ids', nargs='*', help='Instruments to trade (default: all the model knows)')
+    parser.add_argument('--strategies', nargs='+', choices=sorted(STRATEGIES), default=['trend'])
+    parser.add_argument('--interval', type=float, default=30, help='Seconds between ticks')
+    parser.add_argument('--budget-ms', type=float, default=250, help='Latency budget per tick')
+    parser.add_argument('--notional', type=float,
+                        help='Size every position by this value in quote currency instead of '
+                             'TRADE_AMOUNT / TRADE_AMOUNTS units')
+    parser.add_argument('--synthetic', type=int, metavar='ROWS',
+                        help='Start from this many synthetic bars per instrument instead of the database; '
+                             'one new bar per instrument arrives every interval')
+    args = parser.parse_args()
+
+    # Model paths are relative to this script, like api_predict.py
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    predictor = BTCPricePredictor(
+        model_format=os.getenv('PREDICTION_MODEL_FORMAT', 'eager'),
+        uncertainty_samples=int(os.getenv('PREDICTION_UNCERTAINTY_SAMPLES', '100')),
+        compute_mode=os.getenv('PREDICTION_COMPUTE_MODE', 'fp32')
+    )
+    predictor.load_model()
+    predictor.warm_up()
+    instrument_ids = args.instrument_ids or list(predictor.scalers)
+
+    stop_event = threading.Event()
+    if args.synthetic:
+        source = SQLitePriceStore()
+        replay_synthetic(source, instrument_ids, args.synthetic, args.interval, stop_event)
+    else:
+        source = get_pool()
+    predictor.pool = source
+
+    engine = StrategyEngine([STRATEGIES[name](notional=args.notional) for name in args.strategies], instrument_ids,
+                            budget_ms=args.budget_ms)
+    try:
+        run(predictor, engine, source, args.interval, stop_event)
+    except KeyboardInterrupt:
+        stop_event.set()
+    print_stats(engine.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
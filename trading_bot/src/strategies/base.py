@@ -0,0 +1,103 @@
+"""
+Strategy Interface
+A strategy maps one tick of market data and model forecasts for every instrument (a
+MarketSnapshot, see engine.py) to target positions with array operations. The engine turns
+position changes into orders, so a strategy never tracks fills itself.
+
+Positions are in units of each instrument. A strategy sizes them from trade_amount (units,
+one number or per instrument, defaulting to TRADE_AMOUNTS / TRADE_AMOUNT from settings) or,
+when notional is given, from a quote-currency value converted at each tick's current price.
+"""
+
+import abc
+
+import numpy as np
+
+from config.settings import TRADE_AMOUNT, TRADE_AMOUNTS
+from strategies.signals import percent_change, trend_positions
+
+
+class Strategy(abc.ABC):
+    """Base class: subclasses implement target_positions (instantiating one that does not raises TypeError)"""
+    name = 'strategy'
+    uses_intervals = False  # True if target_positions reads snapshot.lower / snapshot.upper
+
+    def __init__(self, trade_amount=None, name=None, notional=None):
+        self.trade_amount = trade_amount  # Units: a number, {instrument_id: units} or None for the settings
+        self.notional = notional  # Quote currency per position (number or dict); overrides trade_amount
+        self.unit_sizes = {}  # instrument_ids tuple -> trade_amount per instrument
+        if name:
+            self.name = name
+
+    def sizes(self, snapshot):
+        """Position size in units per instrument, a (instruments,) array aligned with snapshot.instrument_ids"""
+        if self.notional is not None:
+            return per_instrument(self.notional, snapshot.instrument_ids, 'notional') / snapshot.current
+        key = tuple(snapshot.instrument_ids)
+        if key not in self.unit_sizes:
+            if self.trade_amount is None:
+                self.unit_sizes[key] = np.array([TRADE_AMOUNTS.get(instrument_id, TRADE_AMOUNT)
+                                                 for instrument_id in key], dtype=np.float64)
+            else:
+                self.unit_sizes[key] = per_instrument(self.trade_amount, key, 'trade_amount')
+        return self.unit_sizes[key]
+
+    @abc.abstractmethod
+    def target_positions(self, snapshot):
+        """Target position in units per instrument, a (instruments,) array aligned with snapshot.instrument_ids"""
+
+
+class TrendStrategy(Strategy):
+    """The recommendation rules of api_predict.py and backtest.py: long one position size on BUY and
+    STRONG_BUY (average predicted change vs yesterday), flat or short on SELL and STRONG_SELL"""
+    name = 'trend'
+
+    def __init__(self, trade_amount=None, allow_short=False, name=None, notional=None):
+        super(TrendStrategy, self).__init__(trade_amount, name, notional)
+        self.allow_short = allow_short
+
+    def target_positions(self, snapshot):
+        average_changes = percent_change(snapshot.forecasts, snapshot.yesterday[:, np.newaxis]).mean(axis=1)
+        return trend_positions(average_changes, self.sizes(snapshot), self.allow_short)
+
+
+class IntervalStrategy(Strategy):
+    """Trades only when the whole prediction interval for `horizon` days ahead is on one side of
+    the current price: long when its lower bound is above, short (if allowed) when its upper bound
+    is below, flat otherwise or when the model has no intervals"""
+    name = 'interval'
+    uses_intervals = True
+
+    def __init__(self, trade_amount=None, horizon=1, allow_short=False, name=None, notional=None):
+        super(IntervalStrategy, self).__init__(trade_amount, name, notional)
+        self.horizon = horizon
+        self.allow_short = allow_short
+
+    def target_positions(self, snapshot):
+        if snapshot.lower is None:
+            return np.zeros(len(snapshot.instrument_ids))
+        lower = snapshot.lower[:, self.horizon - 1]
+        upper = snapshot.upper[:, self.horizon - 1]
+        direction = np.where(lower > snapshot.current, 1.0, 0.0)
+        if self.allow_short:
+            direction = np.where(upper < snapshot.current, -1.0, direction)
+        return self.sizes(snapshot) * direction
+
+
+def per_instrument(size, instrument_ids, what):
+    """A number or {instrument_id: value} as a (instruments,) array"""
+    if not isinstance(size, dict):
+        return np.full(len(instrument_ids), float(size))
+    missing = [instrument_id for instrument_id in instrument_ids if instrument_id not in size]
+    if missing:
+        raise Exception(f"No {what} for instruments {missing}")
+    return np.array([size[instrument_id] for instrument_id in instrument_ids], dtype=np.float64)
+
+
+# Strategies selectable by name from run_strategies.py; keyword arguments set the sizing
+STRATEGIES = {
+    'trend': lambda **sizing: TrendStrategy(**sizing),
+    'trend-short': lambda **sizing: TrendStrategy(allow_short=True, name='trend-short', **sizing),
+    'interval': lambda **sizing: IntervalStrategy(**sizing),
+    'interval-short': lambda **sizing: IntervalStrategy(allow_short=True, name='interval-short', **sizing),
+}
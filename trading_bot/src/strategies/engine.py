@@ -0,0 +1,183 @@
+"""
+Strategy Engine
+Runs any number of strategies over every instrument each tick. Market data and model
+forecasts for all instruments are aligned arrays (one batched model call per tick), each
+strategy returns its target positions as one array, and the engine turns the changes into
+orders priced with SLIPPAGE. Every tick is timed per phase against a latency budget.
+"""
+
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from config.settings import BTC_INSTRUMENT_ID, SLIPPAGE, TRADING_PAIR
+
+
+class MarketSnapshot:
+    """One tick for every instrument: latest bar, previous close and forecasts, as aligned arrays
+
+    forecasts, lower and upper are (instruments, prediction_steps) prices; lower/upper (the
+    prediction interval) are None when the model has no MC-dropout intervals.
+    """
+
+    def __init__(self, instrument_ids, timestamps, current, yesterday, forecasts, lower=None, upper=None):
+        self.instrument_ids = list(instrument_ids)
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.current = np.asarray(current, dtype=np.float64)
+        self.yesterday = np.asarray(yesterday, dtype=np.float64)
+        self.forecasts = np.asarray(forecasts, dtype=np.float64)
+        self.lower = lower
+        self.upper = upper
+
+
+def market_snapshot(predictor, histories, instrument_ids, intervals=True):
+    """MarketSnapshot from each instrument's latest bars (BTCPricePredictor.fetch_latest_windows)
+
+    All instruments are forecast in one batched model invocation and unscaled together. With
+    intervals (and a model that supports them) a second batched invocation draws the MC-dropout
+    samples for lower/upper; it costs uncertainty_samples times the forecast, so only pass it
+    when a strategy uses them (StrategyEngine.uses_intervals).
+    """
+    closes = [histories[instrument_id]['close'] for instrument_id in instrument_ids]
+    minimum = np.array([predictor.scalers[instrument_id]['min'] for instrument_id in instrument_ids])[:, np.newaxis]
+    scale = np.array([predictor.scalers[instrument_id]['scale'] for instrument_id in instrument_ids])[:, np.newaxis]
+
+    forecasts = (predictor.forecast_histories(histories, instrument_ids) - minimum) / scale
+    lower = upper = None
+    if intervals and predictor.supports_uncertainty:
+        samples = (predictor.forecast_histories(histories, instrument_ids, samples=predictor.uncertainty_samples)
+                   - minimum) / scale
+        lower, upper = np.quantile(samples, [(1 - predictor.interval) / 2, (1 + predictor.interval) / 2], axis=0)
+
+    return MarketSnapshot(
+        instrument_ids,
+        [histories[instrument_id]['timestamp'][-1] for instrument_id in instrument_ids],
+        [close[-1] for close in closes],
+        [close[-2] for close in closes],
+        forecasts, lower, upper
+    )
+
+
+class LatencyStats:
+    """Latency per phase over the last `window` ticks (bounded memory however long the engine runs)"""
+
+    def __init__(self, window=1000):
+        self.samples = {}
+        self.window = window
+
+    def record(self, phase, seconds):
+        self.samples.setdefault(phase, deque(maxlen=self.window)).append(seconds)
+
+    def summary(self):
+        """{phase: {'p50_ms', 'p99_ms', 'max_ms'}}"""
+        summary = {}
+        for phase, samples in self.samples.items():
+            latencies = np.fromiter(samples, dtype=np.float64) * 1000
+            summary[phase] = {
+                'p50_ms': float(np.percentile(latencies, 50)),
+                'p99_ms': float(np.percentile(latencies, 99)),
+                'max_ms': float(latencies.max()),
+            }
+        return summary
+
+
+class StrategyEngine:
+    """Evaluates strategies on MarketSnapshots and emits the orders that move positions to their targets
+
+    Positions are held per (strategy, instrument) in one array. A tick whose total latency
+    (market data and forecasts, strategies, orders) exceeds budget_ms is an overrun: its
+    orders are dropped, since they were computed from prices that are too old to trade on,
+    and positions stay as they were.
+    """
+
+    def __init__(self, strategies, instrument_ids, slippage=SLIPPAGE, budget_ms=250.0, stats_window=1000):
+        self.strategies = list(strategies)
+        self.instrument_ids = list(instrument_ids)
+        self.slippage = slippage
+        self.budget_ms = budget_ms
+        self.positions = np.zeros((len(self.strategies), len(self.instrument_ids)))
+        # Order symbol per instrument; the primary instrument trades as TRADING_PAIR
+        self.symbols = [TRADING_PAIR if instrument_id == BTC_INSTRUMENT_ID else instrument_id
+                        for instrument_id in self.instrument_ids]
+        self.latency = LatencyStats(stats_window)
+        self.ticks = 0
+        self.overruns = 0
+        self.orders_sent = 0
+        self.orders_dropped = 0
+
+    @property
+    def uses_intervals(self):
+        """True if any strategy needs prediction intervals in its snapshots"""
+        return any(strategy.uses_intervals for strategy in self.strategies)
+
+    def evaluate(self, snapshot):
+        """Target positions (strategies, instruments)"""
+        targets = np.empty_like(self.positions)
+        for i, strategy in enumerate(self.strategies):
+            targets[i] = strategy.target_positions(snapshot)
+        return targets
+
+    def orders(self, snapshot, targets):
+        """Orders that move positions to targets, filled at the current price plus slippage"""
+        deltas = targets - self.positions
+        strategy_index, instrument_index = np.nonzero(np.abs(deltas) > 1e-12)
+        quantity = deltas[strategy_index, instrument_index]
+        side = np.where(quantity > 0, 1.0, -1.0)
+        price = snapshot.current[instrument_index] * (1 + side * self.slippage / 100)
+        notional = np.abs(quantity) * price
+
+        return [{
+            'strategy': self.strategies[s].name,
+            'instrumentId': self.instrument_ids[i],
+            'symbol': self.symbols[i],
+            'side': 'BUY' if sign > 0 else 'SELL',
+            'quantity': abs(q),
+            'price': p,
+            'notional': n,
+            'asOf': int(snapshot.timestamps[i]),
+        } for s, i, q, sign, p, n in zip(strategy_index.tolist(), instrument_index.tolist(), quantity.tolist(),
+                                         side.tolist(), price.tolist(), notional.tolist())]
+
+    def tick(self, snapshot, market_seconds=0.0):
+        """Run every strategy on one snapshot; returns the orders to send ([] on an overrun)
+
+        market_seconds is the time already spent fetching prices and forecasting for this tick,
+        which counts against the budget.
+        """
+        start = time.perf_counter()
+        targets = self.evaluate(snapshot)
+        evaluated = time.perf_counter()
+        orders = self.orders(snapshot, targets)
+        finished = time.perf_counter()
+
+        total = market_seconds + finished - start
+        self.latency.record('market', market_seconds)
+        self.latency.record('strategies', evaluated - start)
+        self.latency.record('orders', finished - evaluated)
+        self.latency.record('tick', total)
+        self.ticks += 1
+
+        if total * 1000 > self.budget_ms:
+            self.overruns += 1
+            self.orders_dropped += len(orders)
+            print(f"Tick took {total * 1000:.1f}ms (budget {self.budget_ms:.0f}ms); "
+                  f"dropped {len(orders)} orders", file=sys.stderr)
+            return []
+
+        self.positions = targets
+        self.orders_sent += len(orders)
+        return orders
+
+    def stats(self):
+        return {
+            'strategies': len(self.strategies),
+            'instruments': len(self.instrument_ids),
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'budgetMs': self.budget_ms,
+            'ordersSent': self.orders_sent,
+            'ordersDropped': self.orders_dropped,
+            'latency': self.latency.summary(),
+        }
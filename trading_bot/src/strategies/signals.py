@@ -0,0 +1,64 @@
+"""
+Signal Rules
+The BUY/SELL and trend recommendation rules of api_predict.py as array operations,
+shared by the prediction API, the backtester and the strategy engine
+"""
+
+import numpy as np
+
+# Average predicted change vs yesterday (%) above which each trend applies, strongest first
+TREND_THRESHOLDS = [
+    (2, 'STRONG_BULLISH', 'STRONG_BUY', "Strong upward momentum expected"),
+    (0, 'BULLISH', 'BUY', "Positive trend expected"),
+    (-2, 'BEARISH', 'SELL', "Negative trend expected"),
+]
+LOWEST_TREND = ('STRONG_BEARISH', 'STRONG_SELL', "Significant downward pressure")
+
+# Recommendation code -> position direction (long on buys, flat or short on sells)
+RECOMMENDATION_CODES = {'STRONG_SELL': -2, 'SELL': -1, 'BUY': 1, 'STRONG_BUY': 2}
+
+
+def percent_change(values, reference):
+    """Percentage change of values against reference (NumPy broadcasting)"""
+    reference = np.asarray(reference, dtype=np.float64)
+    return (np.asarray(values, dtype=np.float64) - reference) / reference * 100
+
+
+def daily_signals(changes_vs_yesterday):
+    """Per-day BUY (True) / SELL (False) and confidence from changes vs yesterday"""
+    changes = np.asarray(changes_vs_yesterday, dtype=np.float64)
+    buy = changes > 0
+    confidence = 100 - np.minimum(np.abs(changes) / 2, 100)  # Simple confidence metric
+    return buy, confidence
+
+
+def sample_confidence(sample_changes, buy):
+    """Per-day confidence (%) from forecast samples: the share of samples whose change vs
+    yesterday (samples, days) agrees with that day's BUY (True) / SELL (False) signal"""
+    sample_changes = np.asarray(sample_changes, dtype=np.float64)
+    agrees = np.where(buy, sample_changes > 0, sample_changes <= 0)
+    return agrees.mean(axis=0) * 100
+
+
+def recommendation_codes(average_changes):
+    """Recommendation per forecast as a code from RECOMMENDATION_CODES"""
+    average_changes = np.asarray(average_changes, dtype=np.float64)
+    return np.select(
+        [average_changes > threshold for threshold, _, _, _ in TREND_THRESHOLDS],
+        [RECOMMENDATION_CODES[recommendation] for _, _, recommendation, _ in TREND_THRESHOLDS],
+        default=RECOMMENDATION_CODES[LOWEST_TREND[1]]
+    )
+
+
+def trend_positions(average_changes, trade_amount, allow_short=False):
+    """Position per forecast: trade_amount long on BUY/STRONG_BUY, flat (or short) on SELL/STRONG_SELL"""
+    codes = recommendation_codes(average_changes)
+    return trade_amount * np.where(codes > 0, 1.0, -1.0 if allow_short else 0.0)
+
+
+def trend(average_change):
+    """(trend, recommendation, description) for one forecast's average change"""
+    for threshold, name, recommendation, description in TREND_THRESHOLDS:
+        if average_change > threshold:
+            return name, recommendation, description
+    return LOWEST_TREND
@@ -0,0 +1,170 @@
+"""
+Hyperparameter Sweep
+Trains a grid of BTCTradingBot configurations in parallel worker processes on one
+prepared copy of the price data, prunes trials that fall behind, and writes a leaderboard
+
+Usage: python sweep.py [--seq-length 10 20] [--hidden-size 32 64] [--learning-rate 0.001 0.0005]
+                       [--patience 20] [--epochs 200] [--workers N] [--threads-per-worker T]
+                       [--synthetic ROWS] [--output-dir sweeps/NAME]
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import torch
+
+from bot import BTCTradingBot
+from config.settings import INSTRUMENT_IDS
+from data.price_cache import PriceCache
+from data.synthetic import SQLitePriceStore
+from utils.db import get_pool
+
+# Set in each worker process by init_worker
+_worker = {}
+
+
+def prepare_data(cache_dir, instrument_ids, synthetic_rows=None):
+    """Fetch every instrument once into a PriceCache the workers read from"""
+    source = SQLitePriceStore.synthetic(instrument_ids, synthetic_rows) if synthetic_rows else get_pool()
+    cache = PriceCache(cache_dir)
+    for instrument_id in instrument_ids:
+        cache.refresh(source, instrument_id)
+    return cache
+
+
+def init_worker(threads, progress):
+    # One process per trial; pin intra-op threads so workers x threads does not exceed the cores
+    torch.set_num_threads(threads)
+    _worker['progress'] = progress
+
+
+def should_prune(progress, trial_id, epoch, val_loss, min_epochs=10, min_trials=2):
+    """Median rule: prune once the trial's best val loss is worse than the median of other
+    trials' best val loss at the same epoch (losses are on normalized prices, so trials with
+    different seq_length are comparable up to their slightly different validation windows)"""
+    progress[trial_id] = progress.get(trial_id, []) + [val_loss]
+    if epoch < min_epochs:
+        return False
+    others = [min(curve[:epoch]) for other_id, curve in progress.items()
+              if other_id != trial_id and len(curve) >= epoch]
+    if len(others) < min_trials:
+        return False
+    return min(progress[trial_id]) > float(np.median(others))
+
+
+def run_trial(trial_id, params, instrument_ids, cache_dir, trial_dir, epochs, prune_after):
+    """Train one configuration in its own directory; returns its leaderboard row"""
+    os.makedirs(trial_dir, exist_ok=True)
+    start = time.perf_counter()
+    pruned = []
+
+    def epoch_callback(epoch, train_loss, val_loss):
+        if should_prune(_worker['progress'], trial_id, epoch, val_loss, min_epochs=prune_after):
+            pruned.append(epoch)
+            return True
+        return False
+
+    # The bot writes its checkpoint, scaler and chart to the working directory
+    os.chdir(trial_dir)
+    with open('train.log', 'w') as log, contextlib.redirect_stdout(log):
+        bot = BTCTradingBot(seq_length=params['seq_length'], hidden_size=params['hidden_size'],
+                            instrument_ids=instrument_ids, price_cache_dir=cache_dir)
+        for instrument_id in instrument_ids:
+            bot.instrument_data[instrument_id] = bot.load_cached_prices(instrument_id)
+        train_losses, val_losses = bot.train_model(epochs=epochs, patience=params['patience'],
+                                                   learning_rate=params['learning_rate'],
+                                                   epoch_callback=epoch_callback)
+        bot.charts.wait()  # The chart worker logs to train.log too
+
+    return {
+        'trial': trial_id,
+        'params': params,
+        'bestValLoss': bot.best_val_loss,
+        'bestEpoch': int(np.argmin(val_losses)) + 1,
+        'epochs': len(val_losses),
+        'pruned': bool(pruned),
+        'wallSeconds': time.perf_counter() - start,
+        'directory': trial_dir,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seq-length', type=int, nargs='+', default=[10])
+    parser.add_argument('--hidden-size', type=int, nargs='+', default=[32, 64])
+    parser.add_argument('--learning-rate', type=float, nargs='+', default=[0.001])
+    parser.add_argument('--patience', type=int, nargs='+', default=[20])
+    parser.add_argument('--epochs', type=int, default=200)
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--workers', type=int, help='Default: CPU cores / threads per worker')
+    parser.add_argument('--prune-after', type=int, default=10, help='Epochs before a trial can be pruned')
+    parser.add_argument('--instruments', nargs='+', default=INSTRUMENT_IDS)
+    parser.add_argument('--synthetic', type=int, metavar='ROWS', help='Sweep on synthetic bars instead of the database')
+    parser.add_argument('--output-dir', default=os.path.join('sweeps', datetime.now().strftime('%Y%m%d-%H%M%S')))
+    args = parser.parse_args()
+
+    output_dir = os.path.abspath(args.output_dir)
+    cache_dir = os.path.join(output_dir, 'prices')
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"Preparing data for {len(args.instruments)} instrument(s) in {cache_dir}...")
+    prepare_data(cache_dir, args.instruments, args.synthetic)
+
+    grid = [
+        {'seq_length': seq_length, 'hidden_size': hidden_size, 'learning_rate': learning_rate, 'patience': patience}
+        for seq_length, hidden_size, learning_rate, patience in itertools.product(
+            args.seq_length, args.hidden_size, args.learning_rate, args.patience)
+    ]
+    workers = args.workers or max(1, (os.cpu_count() or 1) // args.threads_per_worker)
+    workers = min(workers, len(grid))
+    print(f"Running {len(grid)} trial(s) on {workers} worker(s) x {args.threads_per_worker} thread(s)")
+
+    start = time.perf_counter()
+    leaderboard = []
+    # spawn: workers must not inherit the parent's torch thread pools
+    context = multiprocessing.get_context('spawn')
+    with context.Manager() as manager:
+        progress = manager.dict()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker,
+                                 initargs=(args.threads_per_worker, progress)) as executor:
+            futures = [
+                executor.submit(run_trial, trial_id, params, args.instruments, cache_dir,
+                                os.path.join(output_dir, f"trial_{trial_id:03d}"), args.epochs, args.prune_after)
+                for trial_id, params in enumerate(grid)
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                leaderboard.append(result)
+                print(f"  Trial {result['trial']:>3} {'pruned' if result['pruned'] else 'done':>6} after "
+                      f"{result['epochs']:>3} epochs in {result['wallSeconds']:7.1f}s - "
+                      f"best Val Loss {result['bestValLoss']:.6f} {result['params']}")
+
+    leaderboard.sort(key=lambda result: result['bestValLoss'])
+    with open(os.path.join(output_dir, 'leaderboard.json'), 'w') as f:
+        json.dump(leaderboard, f, indent=2)
+
+    print("\n" + "=" * 96)
+    print(f"{'Rank':<6}{'seq':>5}{'hidden':>8}{'lr':>10}{'patience':>10}{'Val Loss':>12}{'epoch':>7}"
+          f"{'epochs':>8}{'time (s)':>10}  status")
+    print("-" * 96)
+    for rank, result in enumerate(leaderboard, 1):
+        params = result['params']
+        print(f"{rank:<6}{params['seq_length']:>5}{params['hidden_size']:>8}{params['learning_rate']:>10g}"
+              f"{params['patience']:>10}{result['bestValLoss']:>12.6f}{result['bestEpoch']:>7}{result['epochs']:>8}"
+              f"{result['wallSeconds']:>10.1f}  {'pruned' if result['pruned'] else 'done'}")
+    print("=" * 96)
+    print(f"Sweep finished in {time.perf_counter() - start:.1f}s; best model in {leaderboard[0]['directory']}")
+    print(f"Leaderboard saved to {os.path.join(output_dir, 'leaderboard.json')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Chart Rendering
+Charts are an optional output stage: matplotlib is imported on first use with the
+non-interactive Agg backend, and figures are drawn on a background worker after the
+results they show have been returned. CHARTS=0 (or --no-charts) skips them entirely.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def charts_enabled(argv=()):
+    """False when --no-charts is in argv or the CHARTS environment variable is 0/false/no/off"""
+    if '--no-charts' in argv:
+        return False
+    return os.getenv('CHARTS', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def pyplot():
+    """matplotlib.pyplot on the Agg backend (never opens a window, works without a display)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+class ChartRenderer:
+    """Draws charts on a single background thread
+
+    submit(draw, *args) calls draw(plt, *args) on the worker, so only that thread ever
+    touches pyplot. Pass copies of any data the caller may change afterwards. Pending
+    charts are finished before the interpreter exits; wait() blocks for them explicitly.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.executor = None
+        self.futures = []
+        self.lock = threading.Lock()
+
+    def submit(self, draw, *args):
+        if not self.enabled:
+            return None
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='charts')
+            future = self.executor.submit(self.render, draw, *args)
+            self.futures.append(future)
+        return future
+
+    def render(self, draw, *args):
+        plt = pyplot()
+        try:
+            return draw(plt, *args)
+        finally:
+            plt.close('all')
+
+    def wait(self):
+        """Block until every submitted chart is written; errors are reported, not raised"""
+        with self.lock:
+            futures, self.futures = self.futures, []
+        for future in futures:
+            error = future.exception()
+            if error is not None:
+                print(f"Error rendering chart: {error}")
@@ -0,0 +1,118 @@
+"""
+Checkpoint Writer
+Background, coalescing, atomic checkpoint writes so training never waits on disk I/O
+"""
+
+import os
+import threading
+
+import torch
+
+
+def snapshot(obj):
+    """Detached CPU copy of the tensors nested in dicts/lists (a state_dict, optimizer state, ...)"""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {key: snapshot(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot(value) for value in obj)
+    return obj
+
+
+def atomic_write(path, write):
+    """Write through write(file) to a temp file, fsync, then rename over path
+
+    Readers see either the previous file or the complete new one, never a partial write; a
+    failed write leaves the previous file and removes its temp file.
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_torch_save(obj, path):
+    atomic_write(path, lambda f: torch.save(obj, f))
+
+
+class CheckpointWriter:
+    """Writes submitted snapshots with write_fn on a background thread
+
+    Only the newest pending snapshot is kept: if several improvements arrive while a write
+    is in progress, the older ones are dropped (coalesced) and only the latest is written.
+    Errors from write_fn are raised by the next submit() or flush().
+    """
+
+    def __init__(self, write_fn):
+        self.write_fn = write_fn
+        self.condition = threading.Condition()
+        self.pending = None
+        self.busy = False
+        self.closed = False
+        self.error = None
+        self.submitted = 0
+        self.written = 0
+        self.coalesced = 0
+        self.thread = threading.Thread(target=self.run, name='checkpoint-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, state):
+        """Queue a snapshot (it must not share tensors with the live model); returns immediately"""
+        with self.condition:
+            self.raise_error()
+            if self.pending is not None:
+                self.coalesced += 1
+            self.pending = state
+            self.submitted += 1
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                state, self.pending = self.pending, None
+                self.busy = True
+
+            error = None
+            try:
+                self.write_fn(state)
+            except Exception as e:
+                error = e
+
+            with self.condition:
+                self.busy = False
+                if error is None:
+                    self.written += 1
+                else:
+                    self.error = error
+                self.condition.notify_all()
+
+    def flush(self):
+        """Block until every submitted snapshot has been written (or coalesced)"""
+        with self.condition:
+            while self.pending is not None or self.busy:
+                self.condition.wait()
+            self.raise_error()
+
+    def close(self):
+        self.flush()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise Exception(f"Error writing checkpoint: {error}")
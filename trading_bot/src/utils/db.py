@@ -0,0 +1,338 @@
+"""
+Database Access
+Shared MySQL configuration, a bounded connection pool, typed instrument_prices queries and
+the predictions write-back
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pymysql
+from pymysql.constants import SERVER_STATUS
+from dotenv import load_dotenv
+
+# Load environment variables from the server's .env file (relative to this file, not the cwd)
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../../server/.env'))
+
+# Database configuration from .env. Autocommit keeps pooled connections from holding one
+# REPEATABLE READ snapshot across checkouts, which would hide newly inserted bars
+DB_CONFIG = {
+    'autocommit': True,
+    'charset': os.getenv('DB_CHARSET', 'utf8mb4'),
+    'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '10')),
+    'db': os.getenv('DB_NAME'),
+    'host': os.getenv('DB_HOST'),
+    'password': os.getenv('DB_PASSWORD'),
+    'read_timeout': int(os.getenv('DB_READ_TIMEOUT', '10')),
+    'port': int(os.getenv('DB_PORT', '3306')),
+    'user': os.getenv('DB_USER'),
+    'write_timeout': int(os.getenv('DB_WRITE_TIMEOUT', '10')),
+}
+
+# Add SSL if connecting to cloud database (Aiven)
+if 'aivencloud.com' in (DB_CONFIG['host'] or ''):
+    DB_CONFIG['ssl'] = {'ssl': True}
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
+
+# Selected as plain numbers so the driver never builds Decimal or datetime objects
+TIMESTAMP_MS = "TIMESTAMPDIFF(MICROSECOND, '1970-01-01', timestamp) DIV 1000"
+PRICE_COLUMNS = {
+    'open': 'CAST(open_price AS DOUBLE)',
+    'close': 'CAST(close_price AS DOUBLE)',
+    'volume': 'CAST(volume AS DOUBLE)',
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+# predictions columns in row order (as_of and target_date as epoch ms); see write_predictions.py
+PREDICTION_COLUMNS = ('instrument_id', 'as_of', 'horizon', 'model_version', 'target_date', 'predicted_price',
+                      'lower_bound', 'upper_bound', 'change_percent', 'trade_signal', 'confidence',
+                      'current_price', 'yesterday_price', 'trend', 'recommendation')
+# Identify a forecast; writing the same key again overwrites the other columns
+PREDICTION_KEY = ('instrument_id', 'as_of', 'horizon', 'model_version')
+
+
+def to_epoch_ms(value):
+    """Convert a naive DATETIME value to milliseconds since the epoch"""
+    return (value - EPOCH) // timedelta(milliseconds=1)
+
+
+def from_epoch_ms(value):
+    """Convert milliseconds since the epoch back to a naive datetime"""
+    return EPOCH + timedelta(milliseconds=int(value))
+
+
+@lru_cache(maxsize=None)
+def price_history_query(columns, with_watermark):
+    """SQL text for one instrument's history, built once per column set"""
+    select = ', '.join([TIMESTAMP_MS] + [PRICE_COLUMNS[column] for column in columns])
+    query = f"SELECT {select} FROM instrument_prices WHERE instrument_id = %s"
+    if with_watermark:
+        query += " AND timestamp > %s"
+    return query + " ORDER BY timestamp ASC"
+
+
+@lru_cache(maxsize=None)
+def latest_prices_query(columns, instrument_count):
+    """SQL text for the latest bars of several instruments, built once per shape"""
+    # One indexed LIMIT query per instrument, tagged with its position and sent as a single UNION ALL.
+    # The inner ORDER BY only picks the newest rows: MySQL does not keep subquery order through a
+    # UNION, so the outer ORDER BY (position, then timestamp) sets the order rows come back in
+    select = ', '.join([TIMESTAMP_MS, '%s'] + [PRICE_COLUMNS[column] for column in columns])
+    return " UNION ALL ".join([f"""
+        (SELECT {select}
+        FROM instrument_prices
+        WHERE instrument_id = %s
+        ORDER BY timestamp DESC
+        LIMIT %s)
+    """] * instrument_count) + " ORDER BY 2, 1"
+
+
+def read_price_arrays(cursor, columns, dtype=np.float32, chunk_size=10000, capacity=None):
+    """Decode (timestamp_ms, *columns) rows chunk by chunk into preallocated arrays
+
+    Returns {'timestamp': int64 array, column: dtype array, ...}. NULL prices become NaN.
+    Arrays start at `capacity` rows (or one chunk) and double when they fill up.
+    """
+    capacity = capacity or chunk_size
+    timestamps = np.empty(capacity, dtype=np.int64)
+    values = [np.empty(capacity, dtype=dtype) for _ in columns]
+    count = 0
+
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+
+        # Epoch milliseconds fit exactly in float64, so one numeric block decodes every column
+        block = np.array(rows, dtype=np.float64)
+        end = count + len(block)
+        if end > len(timestamps):
+            capacity = max(end, 2 * len(timestamps))
+            timestamps = np.resize(timestamps, capacity)
+            values = [np.resize(column, capacity) for column in values]
+
+        timestamps[count:end] = block[:, 0]
+        for i, column in enumerate(values):
+            column[count:end] = block[:, i + 1]
+        count = end
+
+    arrays = {'timestamp': timestamps[:count]}
+    arrays.update({name: column[:count] for name, column in zip(columns, values)})
+    return arrays
+
+
+def stream_prices(connection, instrument_id, columns=('close',), since=None, dtype=np.float32, chunk_size=10000):
+    """Full (or since-watermark) price history of one instrument in chronological order
+
+    Uses a server-side cursor so rows are decoded chunk by chunk instead of buffered.
+    """
+    query = price_history_query(tuple(columns), since is not None)
+    params = [instrument_id] if since is None else [instrument_id, from_epoch_ms(since)]
+
+    cursor = connection.cursor(pymysql.cursors.SSCursor)
+    try:
+        cursor.execute(query, params)
+        return read_price_arrays(cursor, columns, dtype, chunk_size)
+    finally:
+        cursor.close()
+
+
+def stream_latest_prices(connection, instrument_ids, limit, columns=('close',), dtype=np.float32):
+    """Latest `limit` bars of several instruments in one round trip, each in chronological order
+
+    Rows arrive sorted by instrument position and timestamp. Returns {instrument_id: arrays} as
+    produced by read_price_arrays.
+    """
+    query = latest_prices_query(tuple(columns), len(instrument_ids))
+    params = [value for position, instrument_id in enumerate(instrument_ids)
+              for value in (position, instrument_id, limit)]
+
+    cursor = connection.cursor(pymysql.cursors.SSCursor)
+    try:
+        cursor.execute(query, params)
+        arrays = read_price_arrays(cursor, ('position',) + tuple(columns), dtype=np.float64,
+                                   capacity=limit * len(instrument_ids))
+    finally:
+        cursor.close()
+
+    latest = {}
+    positions = arrays.pop('position')
+    for position, instrument_id in enumerate(instrument_ids):
+        mask = positions == position
+        latest[instrument_id] = {
+            name: np.ascontiguousarray(values[mask], dtype=np.int64 if name == 'timestamp' else dtype)
+            for name, values in arrays.items()
+        }
+    return latest
+
+
+def latest_timestamps(connection, instrument_ids):
+    """Timestamp (epoch ms) of the newest bar per instrument; an index lookup each"""
+    placeholders = ', '.join(['%s'] * len(instrument_ids))
+    cursor = connection.cursor(pymysql.cursors.Cursor)
+    try:
+        cursor.execute(f"""
+            SELECT instrument_id, TIMESTAMPDIFF(MICROSECOND, '1970-01-01', MAX(timestamp)) DIV 1000
+            FROM instrument_prices
+            WHERE instrument_id IN ({placeholders})
+            GROUP BY instrument_id
+        """, list(instrument_ids))
+        latest = {instrument_id: int(timestamp) for instrument_id, timestamp in cursor.fetchall()}
+    finally:
+        cursor.close()
+    return {instrument_id: latest.get(instrument_id) for instrument_id in instrument_ids}
+
+
+def upsert_predictions(connection, rows, batch_size=1000):
+    """Insert or update forecast rows (dicts keyed by PREDICTION_COLUMNS); returns the row count
+
+    Each batch is one executemany, which pymysql sends as a single multi-row INSERT, committed
+    as its own transaction. Rows already present are updated in place, so reruns are idempotent.
+    """
+    updates = ', '.join(f"{column} = VALUES({column})" for column in PREDICTION_COLUMNS if column not in PREDICTION_KEY)
+    query = (f"INSERT INTO predictions ({', '.join(PREDICTION_COLUMNS)}) "
+             f"VALUES ({', '.join(['%s'] * len(PREDICTION_COLUMNS))}) "
+             f"ON DUPLICATE KEY UPDATE {updates}, updated_at = CURRENT_TIMESTAMP(3)")
+    values = [
+        tuple(from_epoch_ms(row[column]) if column in ('as_of', 'target_date') else row[column]
+              for column in PREDICTION_COLUMNS)
+        for row in rows
+    ]
+
+    cursor = connection.cursor()
+    try:
+        for start in range(0, len(values), batch_size):
+            connection.begin()
+            try:
+                cursor.executemany(query, values[start:start + batch_size])
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+    finally:
+        cursor.close()
+    return len(values)
+
+
+class ConnectionPool:
+    """Bounded pool of warm MySQL connections with health checks and reconnect-on-failure"""
+
+    def __init__(self, config=None, max_size=DB_POOL_SIZE, timeout=30, health_check_interval=30):
+        self.config = config or DB_CONFIG
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.idle = []  # (connection, last_used) pairs, most recently used last
+        self.lock = threading.Lock()
+
+    def connect(self):
+        return pymysql.connect(**self.config)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it goes back to the pool unless it failed"""
+        if not self.slots.acquire(timeout=self.timeout):
+            raise Exception(f"Timed out after {self.timeout}s waiting for a database connection")
+        connection = None
+        try:
+            connection = self.checkout()
+            yield connection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # Broken connection: drop it instead of returning it to the pool
+            self.discard(connection)
+            connection = None
+            raise
+        finally:
+            if connection is not None:
+                self.checkin(connection)
+            self.slots.release()
+
+    def checkout(self):
+        with self.lock:
+            connection, last_used = self.idle.pop() if self.idle else (None, None)
+        if connection is None:
+            return self.connect()
+
+        # Health check connections that sat idle long enough to have been dropped by the server
+        if time.monotonic() - last_used > self.health_check_interval:
+            try:
+                connection.ping(reconnect=True)
+            except pymysql.err.Error:
+                self.discard(connection)
+                return self.connect()
+        return connection
+
+    def checkin(self, connection):
+        """Return a connection to the pool, ending any open transaction first
+
+        A transaction left open (e.g. with autocommit off in the config) would pin the next
+        borrower to its snapshot, so it never saw rows inserted since.
+        """
+        if connection.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+            try:
+                connection.rollback()
+            except pymysql.err.Error:
+                self.discard(connection)
+                return
+        with self.lock:
+            self.idle.append((connection, time.monotonic()))
+
+    def discard(self, connection):
+        if connection is None:
+            return
+        try:
+            connection.close()
+        except pymysql.err.Error:
+            pass
+
+    def run(self, query_fn, *args, **kwargs):
+        """Run query_fn(connection, ...) and retry once on a fresh connection if the first one fails"""
+        for attempt in range(2):
+            try:
+                with self.connection() as connection:
+                    return query_fn(connection, *args, **kwargs)
+            except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+                if attempt == 1:
+                    raise
+
+    def fetch_price_history(self, instrument_id, columns=('close',), since=None, dtype=np.float32):
+        """See stream_prices"""
+        return self.run(stream_prices, instrument_id, columns=columns, since=since, dtype=dtype)
+
+    def fetch_latest_prices(self, instrument_ids, limit, columns=('close',), dtype=np.float32):
+        """See stream_latest_prices"""
+        return self.run(stream_latest_prices, instrument_ids, limit, columns=columns, dtype=dtype)
+
+    def fetch_latest_timestamps(self, instrument_ids):
+        """See latest_timestamps"""
+        return self.run(latest_timestamps, instrument_ids)
+
+    def write_predictions(self, rows, batch_size=1000):
+        """See upsert_predictions"""
+        return self.run(upsert_predictions, rows, batch_size=batch_size)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection, _ in idle:
+            self.discard(connection)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide connection pool shared by every entry point"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
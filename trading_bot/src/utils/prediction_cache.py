@@ -0,0 +1,189 @@
+"""
+Prediction Cache
+TTL + LRU cache of prediction results with an optional on-disk tier that survives restarts
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def file_fingerprint(*paths):
+    """SHA-256 over the contents of the given files (model checkpoint, scaler, ...)"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """Prediction results keyed by (instrument, latest bar, model fingerprint, ...)
+
+    Entries expire after `ttl` seconds; the least recently used entry is evicted once
+    `max_entries` is reached. With `cache_dir`, entries are also written as JSON files
+    and read back on a memory miss; every write prunes the directory to unexpired files,
+    at most `max_entries` of them (oldest written first out).
+
+    Callers get their own copy of a result, so changing it never alters the cache.
+    get_or_compute coalesces concurrent misses of one key into a single computation.
+    """
+
+    def __init__(self, max_entries=256, ttl=3600, cache_dir=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()  # key -> (stored_at, result)
+        self.in_flight = {}  # key -> Future of the computation concurrent misses wait for
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.coalesced = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, *parts):
+        return json.dumps(parts, separators=(',', ':'))
+
+    def disk_path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key):
+        """A copy of the cached result for key, or None"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry[0] > self.ttl:
+                del self.entries[key]
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            return copy.deepcopy(entry[1])
+
+        entry = self.read_disk(key, now)
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            # Freshly decoded from disk, so the cache keeps it and the caller gets a copy
+            self.store(key, entry)
+        return copy.deepcopy(entry[1])
+
+    def get_or_compute(self, key, compute):
+        """Cached result for key, else compute() run once however many callers miss at the same time
+
+        The first caller to miss computes and caches the result; the others wait for it (and
+        get the same exception if it fails) instead of each running the computation.
+        """
+        result = self.get(key)
+        if result is not None:
+            return result
+        with self.lock:
+            flight = self.in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return copy.deepcopy(flight.result())
+
+        try:
+            result = compute()
+            self.put(key, result)
+            flight.set_result(result)
+            return result
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+    def put(self, key, result):
+        """Cache a copy of result (and write it to the disk tier if enabled)"""
+        entry = (time.time(), copy.deepcopy(result))
+        with self.lock:
+            self.store(key, entry)
+        if self.cache_dir:
+            path = self.disk_path(key)
+            # Unique per writer, so concurrent puts (threads or processes) never share a temp file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'storedAt': entry[0], 'result': result}, f)
+            os.replace(tmp_path, path)
+            self.prune_disk(entry[0])
+
+    def store(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def prune_disk(self, now):
+        """Delete expired cache files, then the oldest ones beyond max_entries"""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue  # Removed by another process meanwhile
+        files.sort()
+        expired = [path for mtime, path in files if now - mtime > self.ttl]
+        live = [path for mtime, path in files if now - mtime <= self.ttl]
+        removed = 0
+        for path in expired + live[:max(len(live) - self.max_entries, 0)]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        with self.lock:
+            self.disk_evictions += removed
+
+    def read_disk(self, key, now):
+        if not self.cache_dir:
+            return None
+        path = self.disk_path(key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - data['storedAt'] > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return data['storedAt'], data['result']
+
+    def stats(self):
+        """Hit/miss counters"""
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'diskHits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'diskEvictions': self.disk_evictions,
+                'coalesced': self.coalesced,
+                'hitRate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
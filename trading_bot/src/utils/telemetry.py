@@ -0,0 +1,161 @@
+"""
+Training Telemetry
+Per-epoch and per-phase timings, throughput, gradient norm and loss for train_model,
+written as JSON lines and/or the Prometheus text exposition format (for the node_exporter
+textfile collector), with opt-in torch.profiler traces for chosen epochs
+"""
+
+import contextlib
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from utils.checkpoint import atomic_write
+
+# Phases timed inside every epoch, in the order they run
+PHASES = ['data', 'forward', 'backward', 'optimizer', 'validation', 'checkpoint']
+
+
+class TrainingTelemetry:
+    """Collects train_model metrics; every output is optional
+
+    metrics_path: JSON lines file (one 'setup' record, one 'epoch' record per epoch, one 'summary')
+    prometheus_path: Prometheus text file, rewritten atomically after every epoch
+    profile_epochs: 1-based epochs to capture with torch.profiler into profile_dir
+    synchronize: callable run before reading the clock (e.g. torch.cuda.synchronize), so
+                 asynchronous GPU work is charged to the phase that launched it
+    """
+
+    def __init__(self, metrics_path=None, prometheus_path=None, profile_epochs=(), profile_dir='profiles',
+                 synchronize=None):
+        self.metrics_path = metrics_path
+        self.prometheus_path = prometheus_path
+        self.profile_epochs = set(profile_epochs)
+        self.profile_dir = profile_dir
+        self.synchronize = synchronize
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.records = []
+        self.profiler = None
+        self.run_id = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        self.started = time.perf_counter()
+        if metrics_path:
+            os.makedirs(os.path.dirname(os.path.abspath(metrics_path)), exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """TRAINING_METRICS_PATH, TRAINING_PROMETHEUS_PATH, TRAINING_PROFILE_EPOCHS (e.g. "1,50"), TRAINING_PROFILE_DIR"""
+        epochs = os.getenv('TRAINING_PROFILE_EPOCHS', '')
+        return cls(metrics_path=os.getenv('TRAINING_METRICS_PATH') or None,
+                   prometheus_path=os.getenv('TRAINING_PROMETHEUS_PATH') or None,
+                   profile_epochs=[int(epoch) for epoch in epochs.split(',') if epoch.strip()],
+                   profile_dir=os.getenv('TRAINING_PROFILE_DIR', 'profiles'))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Add the time spent in the block to the current epoch's phase total"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.synchronize is not None:
+                self.synchronize()
+            self.phases[name] += time.perf_counter() - start
+
+    def start_epoch(self, epoch):
+        """Start torch.profiler if this epoch is in profile_epochs (stopped by end_epoch)"""
+        if epoch in self.profile_epochs:
+            import torch
+            from torch.profiler import ProfilerActivity, profile
+
+            activities = [ProfilerActivity.CPU] + ([ProfilerActivity.CUDA] if torch.cuda.is_available() else [])
+            self.profiler = profile(activities=activities, record_shapes=True)
+            self.profiler.__enter__()
+
+    def save_profile(self, epoch):
+        self.profiler.__exit__(None, None, None)
+        os.makedirs(self.profile_dir, exist_ok=True)
+        prefix = os.path.join(self.profile_dir, f"{self.run_id}_epoch{epoch:04d}")
+        self.profiler.export_chrome_trace(f"{prefix}.trace.json")
+        with open(f"{prefix}.txt", 'w') as f:
+            f.write(self.profiler.key_averages().table(sort_by='self_cpu_time_total', row_limit=25))
+        self.profiler = None
+        print(f"  Profile of epoch {epoch} saved to {prefix}.trace.json (open in chrome://tracing or Perfetto)")
+
+    def setup(self, seconds, train_samples, val_samples, device):
+        """Record the one-off dataset preparation before the first epoch"""
+        self.write({'event': 'setup', 'seconds': seconds, 'trainSamples': train_samples,
+                    'valSamples': val_samples, 'device': str(device)})
+
+    def end_epoch(self, epoch, seconds, train_loss, val_loss, samples, grad_norm_mean, grad_norm_max,
+                  learning_rate, improved):
+        """Record one epoch, reset the phase timers and save the epoch's profile if one is running"""
+        if self.profiler is not None:
+            self.save_profile(epoch)
+        train_seconds = sum(self.phases[name] for name in ('data', 'forward', 'backward', 'optimizer'))
+        record = {
+            'event': 'epoch',
+            'epoch': epoch,
+            'seconds': seconds,
+            'phases': dict(self.phases),
+            'samplesPerSec': samples / train_seconds if train_seconds > 0 else 0.0,
+            'trainLoss': train_loss,
+            'valLoss': val_loss,
+            'gradNormMean': grad_norm_mean,
+            'gradNormMax': grad_norm_max,
+            'learningRate': learning_rate,
+            'improved': improved,
+        }
+        for name, value in self.phases.items():
+            self.totals[name] += value
+            self.phases[name] = 0.0
+        self.records.append(record)
+        self.write(record)
+        if self.prometheus_path:
+            atomic_write(self.prometheus_path, lambda f: f.write(self.prometheus_text().encode()))
+        return record
+
+    def finish(self, best_epoch, best_val_loss):
+        """Record the run summary; returns it"""
+        summary = {
+            'event': 'summary',
+            'epochs': len(self.records),
+            'bestEpoch': best_epoch,
+            'bestValLoss': best_val_loss,
+            'wallSeconds': time.perf_counter() - self.started,
+            'phases': dict(self.totals),
+        }
+        self.write(summary)
+        return summary
+
+    def write(self, record):
+        if not self.metrics_path:
+            return
+        record = {'run': self.run_id, 'time': datetime.now(timezone.utc).isoformat(), **record}
+        with open(self.metrics_path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+
+    def prometheus_text(self):
+        """Latest epoch gauges and cumulative phase counters in the Prometheus text format"""
+        last = self.records[-1]
+        metrics = [
+            ('trading_bot_train_epoch', 'gauge', 'Last completed training epoch', [('', last['epoch'])]),
+            ('trading_bot_train_loss', 'gauge', 'Mean MSE loss of the last epoch',
+             [('split="train"', last['trainLoss']), ('split="validation"', last['valLoss'])]),
+            ('trading_bot_train_samples_per_second', 'gauge', 'Training throughput of the last epoch',
+             [('', last['samplesPerSec'])]),
+            ('trading_bot_train_grad_norm', 'gauge', 'Gradient norm before clipping in the last epoch',
+             [('stat="mean"', last['gradNormMean']), ('stat="max"', last['gradNormMax'])]),
+            ('trading_bot_train_epoch_seconds', 'gauge', 'Wall time of the last epoch', [('', last['seconds'])]),
+            ('trading_bot_train_phase_seconds_total', 'counter', 'Time spent per training phase',
+             [(f'phase="{name}"', value) for name, value in self.totals.items()]),
+        ]
+        lines = []
+        for name, kind, help_text, samples in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                labels = f'{{run="{self.run_id}",{labels}}}' if labels else f'{{run="{self.run_id}"}}'
+                lines.append(f"{name}{labels} {float(value)!r}")
+        return "\n".join(lines) + "\n"
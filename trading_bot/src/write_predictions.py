@@ -0,0 +1,174 @@
+"""
+Forecast Write-Back Job
+Computes forecasts for every instrument and horizon and upserts them into the predictions
+table, so serving code can read precomputed rows instead of running the model per request
+
+Rows are keyed by (instrument, as_of, horizon, model_version): as_of is the bar a forecast
+was made from and model_version a hash of the model files, so rerunning the job for the same
+bars and model rewrites the same rows. By default only the forecast from each instrument's
+latest bar is written (with the prediction intervals of api_predict.py); --backfill also
+writes the forecasts from the last BARS bars, computed in large batches like backtest.py.
+Rows go out in batches of --batch-size, each an executemany in its own transaction.
+
+Usage: python write_predictions.py [instrument_id ...] [--backfill BARS] [--batch-size 1000]
+                                   [--model-version VERSION] [--synthetic ROWS]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from api_predict import BTCPricePredictor
+from backtest import forecast_history
+from data.synthetic import SQLitePriceStore
+from strategies.signals import daily_signals, percent_change, trend
+from utils.db import get_pool
+from utils.prediction_cache import file_fingerprint
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def model_version(predictor):
+    """Short content hash of the files the predictor's model and scalers were loaded from"""
+    return file_fingerprint(*predictor.model_files)[:16]
+
+
+def result_rows(result, as_of, version):
+    """predictions rows of one api_predict.py result, made at bar as_of (epoch ms)"""
+    analysis = result['analysis']
+    return [{
+        'instrument_id': result['instrumentId'],
+        'as_of': int(as_of),
+        'horizon': day['day'],
+        'model_version': version,
+        'target_date': int(as_of) + day['day'] * DAY_MS,
+        'predicted_price': day['predictedPrice'],
+        'lower_bound': day['lowerBound'],
+        'upper_bound': day['upperBound'],
+        'change_percent': day['changeVsYesterday'],
+        'trade_signal': day['signal'],
+        'confidence': day['confidence'],
+        'current_price': result['currentPrice'],
+        'yesterday_price': result['yesterdayPrice'],
+        'trend': analysis['trend'],
+        'recommendation': analysis['recommendation'],
+    } for day in result['predictions']]
+
+
+def history_rows(instrument_id, prices, predictions, seq_length, version):
+    """predictions rows for forecasts (as_of dates, steps) from backtest.forecast_history
+
+    Same rules as api_predict.py without the MC-dropout intervals (bounds are NULL and
+    confidence is the magnitude heuristic).
+    """
+    # Row i of predictions was made at the close of bar i + seq_length - 1
+    end = seq_length - 1 + len(predictions)
+    as_of = prices['timestamp'][seq_length - 1:end]
+    current = prices['close'][seq_length - 1:end]
+    yesterday = prices['close'][seq_length - 2:end - 1]
+    changes = percent_change(predictions, yesterday[:, None])
+    buy, confidence = daily_signals(changes)
+    trends = [trend(average)[:2] for average in changes.mean(axis=1)]
+
+    rows = []
+    for i, (timestamp, (trend_name, recommendation)) in enumerate(zip(as_of.tolist(), trends)):
+        for step in range(predictions.shape[1]):
+            rows.append({
+                'instrument_id': instrument_id,
+                'as_of': timestamp,
+                'horizon': step + 1,
+                'model_version': version,
+                'target_date': timestamp + (step + 1) * DAY_MS,
+                'predicted_price': float(predictions[i, step]),
+                'lower_bound': None,
+                'upper_bound': None,
+                'change_percent': float(changes[i, step]),
+                'trade_signal': 'BUY' if buy[i, step] else 'SELL',
+                'confidence': float(confidence[i, step]),
+                'current_price': float(current[i]),
+                'yesterday_price': float(yesterday[i]),
+                'trend': trend_name,
+                'recommendation': recommendation,
+            })
+    return rows
+
+
+def write_predictions(predictor, source, instrument_ids=None, backfill=0, batch_size=1000, version=None):
+    """Forecast and upsert rows for every instrument into `source` (a ConnectionPool or SQLitePriceStore)"""
+    if predictor.model is None:
+        predictor.load_model()
+    predictor.pool = source
+    instrument_ids = instrument_ids or list(predictor.scalers)
+    version = version or model_version(predictor)
+
+    start = time.perf_counter()
+    rows = []
+    if backfill:
+        # Forecasts from the last `backfill` bars in shared batches
+        histories = {}
+        for instrument_id in instrument_ids:
+            prices = source.fetch_price_history(instrument_id, dtype=np.float64)
+            bars = backfill + predictor.seq_length - 1
+            histories[instrument_id] = {name: values[-bars:] for name, values in prices.items()}
+            if len(histories[instrument_id]['close']) < predictor.seq_length + 1:
+                raise Exception(f"Not enough data to forecast instrument {instrument_id}")
+        forecasts = forecast_history(predictor, histories)
+        for instrument_id, predictions in forecasts.items():
+            # The latest bar's forecast is written below
+            rows += history_rows(instrument_id, histories[instrument_id], predictions[:-1], predictor.seq_length,
+                                 version)
+
+    # The latest forecast always comes from api_predict.py, prediction intervals included
+    histories = predictor.fetch_latest_windows(instrument_ids)
+    results = predictor.predict_instruments(instrument_ids, histories)
+    for instrument_id, result in results.items():
+        rows += result_rows(result, histories[instrument_id]['timestamp'][-1], version)
+    forecasted = time.perf_counter()
+
+    written = source.write_predictions(rows, batch_size)
+    finished = time.perf_counter()
+    return {
+        'modelVersion': version,
+        'instruments': len(instrument_ids),
+        'rows': written,
+        'batches': -(-written // batch_size),
+        'forecastSeconds': forecasted - start,
+        'writeSeconds': finished - forecasted,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('instrument_ids', nargs='*', help='Instruments to forecast (default: all the model knows)')
+    parser.add_argument('--backfill', type=int, default=0, metavar='BARS',
+                        help='Also write the forecasts made from each of the last BARS bars')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows per executemany / transaction')
+    parser.add_argument('--model-version', help='Version to record (default: hash of the model files)')
+    parser.add_argument('--synthetic', type=int, metavar='ROWS',
+                        help='Forecast this many synthetic bars per instrument into an in-memory store')
+    args = parser.parse_args()
+
+    # Model paths are relative to this script, like api_predict.py
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    predictor = BTCPricePredictor(
+        model_format=os.getenv('PREDICTION_MODEL_FORMAT', 'eager'),
+        uncertainty_samples=int(os.getenv('PREDICTION_UNCERTAINTY_SAMPLES', '100')),
+        compute_mode=os.getenv('PREDICTION_COMPUTE_MODE', 'fp32')
+    )
+    predictor.load_model()
+    instrument_ids = args.instrument_ids or list(predictor.scalers)
+    source = SQLitePriceStore.synthetic(instrument_ids, args.synthetic) if args.synthetic else get_pool()
+
+    summary = write_predictions(predictor, source, instrument_ids, args.backfill, args.batch_size, args.model_version)
+    print(f"Wrote {summary['rows']} prediction rows for {summary['instruments']} instruments "
+          f"(model {summary['modelVersion']}) in {summary['batches']} batches")
+    print(f"Forecasts {summary['forecastSeconds']:.2f}s, writes {summary['writeSeconds']:.2f}s "
+          f"({summary['rows'] / max(summary['writeSeconds'], 1e-9):,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Shared fixtures: src/ on sys.path (the scripts run from there) and a small untrained model
+saved as a compact artifact, with synthetic prices in a SQLite stand-in for instrument_prices
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import numpy as np
+import pytest
+import torch
+from sklearn.preprocessing import MinMaxScaler
+
+from config.settings import BTC_INSTRUMENT_ID
+from data.synthetic import SQLitePriceStore
+from lstm_model import LSTMModel
+from model_artifact import artifact_path, save_artifact
+
+INSTRUMENT_IDS = [BTC_INSTRUMENT_ID, 'eth', 'sol']
+SEQ_LENGTH = 10
+PREDICTION_STEPS = 5
+
+
+@pytest.fixture
+def price_store():
+    store = SQLitePriceStore.synthetic(INSTRUMENT_IDS, 200)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def model_path(tmp_path, price_store):
+    """Checkpoint path whose compact artifact holds a seeded model and a scaler per instrument"""
+    torch.manual_seed(0)
+    model = LSTMModel(hidden_layer_size=16, dropout=0.2)
+    scalers = {}
+    for instrument_id in INSTRUMENT_IDS:
+        close = price_store.fetch_price_history(instrument_id, dtype=np.float64)['close']
+        scalers[instrument_id] = MinMaxScaler().fit(close.reshape(-1, 1))
+
+    path = str(tmp_path / 'model.pth')
+    save_artifact(artifact_path(path), model.state_dict(), 16, SEQ_LENGTH, PREDICTION_STEPS, INSTRUMENT_IDS,
+                  scalers, dropout=0.2)
+    return path
@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api_predict import BTCPricePredictor
+from config.settings import BTC_INSTRUMENT_ID
+from conftest import INSTRUMENT_IDS
+from utils.prediction_cache import PredictionCache
+
+
+def make_predictor(model_path, price_store):
+    predictor = BTCPricePredictor(model_path=model_path, scaler_path=None, pool=price_store, uncertainty_samples=0)
+    predictor.load_model()
+    return predictor
+
+
+def test_run_after_run_all_predicts_default_instrument(model_path, price_store):
+    predictor = make_predictor(model_path, price_store)
+    expected = predictor.run()
+
+    results = predictor.run_all()['results']
+    assert list(results) == INSTRUMENT_IDS
+    assert predictor.run()['instrumentId'] == BTC_INSTRUMENT_ID
+    assert predictor.run()['predictions'] == expected['predictions']
+
+
+def test_run_with_instrument_does_not_change_default(model_path, price_store):
+    predictor = make_predictor(model_path, price_store)
+    assert predictor.run('sol')['instrumentId'] == 'sol'
+    assert predictor.run()['instrumentId'] == BTC_INSTRUMENT_ID
+    assert predictor.instrument_id == BTC_INSTRUMENT_ID
+
+
+def test_batched_results_match_single_runs(model_path, price_store):
+    predictor = make_predictor(model_path, price_store)
+    results = predictor.run_all()['results']
+    for instrument_id in INSTRUMENT_IDS:
+        single = predictor.run(instrument_id)
+        assert results[instrument_id]['instrumentId'] == instrument_id
+        assert results[instrument_id]['currentPrice'] == single['currentPrice']
+        for batched, alone in zip(results[instrument_id]['predictions'], single['predictions']):
+            assert abs(batched['predictedPrice'] - alone['predictedPrice']) <= 1e-6 * alone['predictedPrice']
+
+
+def test_concurrent_cache_misses_run_the_model_once(model_path, price_store):
+    predictor = BTCPricePredictor(model_path=model_path, scaler_path=None, pool=price_store, uncertainty_samples=0,
+                                  prediction_cache=PredictionCache())
+    predictor.load_model()
+    calls = []
+    forecast_windows = predictor.forecast_windows
+
+    def slow_forecast(*args, **kwargs):
+        calls.append(1)
+        time.sleep(0.2)
+        return forecast_windows(*args, **kwargs)
+
+    # Per-call copies share instance attributes, so every request goes through the wrapper
+    predictor.forecast_windows = slow_forecast
+    with ThreadPoolExecutor(6) as pool:
+        results = list(pool.map(lambda _: predictor.run(), range(6)))
+
+    assert calls == [1]
+    assert all(result == results[0] for result in results)
+    assert predictor.prediction_cache.stats()['coalesced'] + predictor.prediction_cache.stats()['hits'] == 5
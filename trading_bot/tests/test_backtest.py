@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from backtest import backtest_instrument
+
+CLOSES = np.array([100.0, 100.0, 101.0, 102.0, 103.0])
+SEQ_LENGTH = 2
+
+
+def constant_forecasts(price):
+    # One forecast per as-of bar (seq_length - 1 .. n - 1), each 5 days ahead
+    return np.full((len(CLOSES) - SEQ_LENGTH + 1, 5), price)
+
+
+def test_open_position_pays_closing_cost():
+    # Always BUY: long from the first as-of close (100) to the last close (103)
+    metrics, equity = backtest_instrument(CLOSES, constant_forecasts(200.0), SEQ_LENGTH, trade_amount=1.0,
+                                          slippage=1.0)
+    assert metrics['grossPnl'] == pytest.approx(3.0)
+    assert metrics['closingCost'] == pytest.approx(1.03)
+    assert metrics['costs'] == pytest.approx(1.0 + 1.03)
+    assert metrics['pnl'] == pytest.approx(3.0 - 2.03)
+    assert equity[-1] == pytest.approx(metrics['pnl'])
+    assert metrics['trades'] == 2
+    assert metrics['turnover'] == pytest.approx(100.0 + 103.0)
+
+
+def test_flat_at_the_end_has_no_closing_cost():
+    metrics, _ = backtest_instrument(CLOSES, constant_forecasts(50.0), SEQ_LENGTH, trade_amount=1.0, slippage=1.0)
+    assert metrics['closingCost'] == 0.0
+    assert (metrics['pnl'], metrics['costs'], metrics['trades']) == (0.0, 0.0, 0)
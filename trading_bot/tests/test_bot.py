@@ -0,0 +1,166 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+import torch
+
+import bot as bot_module
+from bot import BTCTradingBot
+from data.synthetic import SQLitePriceStore, generate_prices
+from lstm_model import LSTMModel
+
+
+@pytest.fixture
+def trained_bot(tmp_path, monkeypatch):
+    """A bot trained for a few epochs in tmp_path, whose store then receives 20 newer bars"""
+    monkeypatch.chdir(tmp_path)
+    prices = generate_prices(320)
+    store = SQLitePriceStore()
+    store.insert('btc', {name: values[:300] for name, values in prices.items()})
+
+    torch.manual_seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        bot = BTCTradingBot(hidden_size=16, instrument_ids=['btc'], price_cache_dir=None, pool=store,
+                            render_charts=False)
+        bot.fetch_btc_data_from_db()
+        bot.train_model(epochs=3, patience=3)
+    store.insert('btc', {name: values[300:] for name, values in prices.items()})
+
+    def fresh_bot():
+        """Bot reading the store with the new bars, as a later --incremental run would"""
+        bot = BTCTradingBot(hidden_size=16, instrument_ids=['btc'], price_cache_dir=None, pool=store,
+                            render_charts=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            bot.fetch_btc_data_from_db()
+        return bot
+
+    yield bot, fresh_bot
+    store.close()
+
+
+def test_fine_tune_promotes_validated_model(trained_bot):
+    _, fresh_bot = trained_bot
+    with contextlib.redirect_stdout(io.StringIO()):
+        promoted = fresh_bot().fine_tune(max_steps=5, tolerance=1.0)
+    assert promoted is True
+
+
+def test_fine_tune_needs_validation_windows(trained_bot):
+    _, fresh_bot = trained_bot
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert fresh_bot().fine_tune(max_steps=5, min_val_windows=10 ** 6) is None
+
+
+def test_fine_tune_rejects_non_finite_loss(trained_bot):
+    bot, fresh_bot = trained_bot
+    checkpoint = torch.load(bot.best_model_path, weights_only=False)
+    checkpoint['model_state_dict']['linear.bias'].fill_(float('nan'))
+    torch.save(checkpoint, bot.best_model_path)
+    saved = open(bot.best_model_path, 'rb').read()
+
+    tuner = fresh_bot()
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert tuner.fine_tune(max_steps=5) is False
+    assert open(bot.best_model_path, 'rb').read() == saved
+    assert np.isnan(tuner.model.linear.bias.detach().numpy()).all()
+
+
+def test_save_model_serializes_scalers_once_per_fit(trained_bot, monkeypatch):
+    bot, _ = trained_bot
+    bot.scaler_state = None
+    calls = []
+    dumps = bot_module.pickle.dumps
+    monkeypatch.setattr(bot_module.pickle, 'dumps', lambda *args, **kwargs: calls.append(1) or dumps(*args, **kwargs))
+
+    for _ in range(5):
+        bot.save_model()
+    bot.checkpoint_writer.flush()
+    assert calls == [1]
+
+    # Refitting the scalers invalidates the snapshot
+    bot.model_inputs('btc', fit=True)
+    bot.save_model(wait=True)
+    assert calls == [1, 1]
+
+
+def per_sample_windows(series, seq_length):
+    """(X, y) built one window at a time, as the scripts did before SlidingWindowDataset"""
+    X = np.array([series[i:i + seq_length] for i in range(len(series) - seq_length)])
+    return X, series[seq_length:]
+
+
+def per_sample_step(model, seq, label, optimizer, loss_function):
+    """One update of the training loop train_model replaced: one window from a zero state"""
+    optimizer.zero_grad()
+    model.hidden_cell = (torch.zeros(1, 1, model.hidden_layer_size), torch.zeros(1, 1, model.hidden_layer_size))
+    loss = loss_function(model(torch.FloatTensor(seq)), torch.FloatTensor([label]))
+    loss.backward()
+    torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+    optimizer.step()
+    return loss.item()
+
+
+def test_batched_loss_and_gradients_match_per_sample_loop():
+    torch.manual_seed(0)
+    model = LSTMModel(hidden_layer_size=16)
+    series = np.random.default_rng(0).random(60)
+    X, y = per_sample_windows(series, 10)
+
+    # One batch: the mean loss over the windows, and the mean of the per-window gradients
+    model.zero_grad()
+    batch_loss = torch.nn.functional.mse_loss(model(torch.tensor(X, dtype=torch.float32).unsqueeze(-1)),
+                                              torch.tensor(y, dtype=torch.float32).unsqueeze(-1))
+    batch_loss.backward()
+    batch_grads = [parameter.grad.clone() for parameter in model.parameters()]
+
+    losses, grads = [], [torch.zeros_like(parameter) for parameter in model.parameters()]
+    for seq, label in zip(X, y):
+        model.zero_grad()
+        model.hidden_cell = (torch.zeros(1, 1, 16), torch.zeros(1, 1, 16))
+        loss = torch.nn.functional.mse_loss(model(torch.FloatTensor(seq)), torch.FloatTensor([label]))
+        loss.backward()
+        losses.append(loss.item())
+        for total, parameter in zip(grads, model.parameters()):
+            total += parameter.grad / len(X)
+
+    assert batch_loss.item() == pytest.approx(np.mean(losses), rel=1e-5)
+    for batch_grad, grad in zip(batch_grads, grads):
+        torch.testing.assert_close(batch_grad, grad, rtol=1e-4, atol=1e-6)
+
+
+def test_train_model_batch_of_one_matches_per_sample_loop(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = SQLitePriceStore.synthetic(['btc'], 120)
+    with contextlib.redirect_stdout(io.StringIO()):
+        bot = BTCTradingBot(hidden_size=16, instrument_ids=['btc'], price_cache_dir=None, pool=store,
+                            dropout=0.0, render_charts=False)
+        bot.fetch_btc_data_from_db()
+        torch.manual_seed(0)
+        bot.train_model(epochs=2, patience=5, batch_size=1)
+
+    # The old loop: same initial weights, one optimizer step per window, per-window validation
+    series = bot.model_inputs('btc')[0].astype(np.float32)
+    X, y = per_sample_windows(series, bot.seq_length)
+    n_train = len(X) - int(np.ceil(0.2 * len(X)))
+    torch.manual_seed(0)
+    model = LSTMModel(hidden_layer_size=16)
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
+    loss_function = torch.nn.MSELoss()
+    for epoch in range(2):
+        model.train()
+        train_loss = np.mean([per_sample_step(model, seq, label, optimizer, loss_function)
+                              for seq, label in zip(X[:n_train], y[:n_train])])
+        model.eval()
+        val_losses = []
+        with torch.no_grad():
+            for seq, label in zip(X[n_train:], y[n_train:]):
+                model.hidden_cell = (torch.zeros(1, 1, 16), torch.zeros(1, 1, 16))
+                val_losses.append(loss_function(model(torch.FloatTensor(seq)), torch.FloatTensor([label])).item())
+        val_loss = np.mean(val_losses)
+        assert train_loss == pytest.approx(bot.telemetry.records[epoch]['trainLoss'], rel=1e-4)
+        assert val_loss == pytest.approx(bot.telemetry.records[epoch]['valLoss'], rel=1e-4)
+
+    for parameter, trained in zip(model.parameters(), bot.model.parameters()):
+        torch.testing.assert_close(parameter, trained, rtol=1e-4, atol=1e-5)
+    store.close()
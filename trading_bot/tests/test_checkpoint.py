@@ -0,0 +1,54 @@
+import os
+import threading
+
+import pytest
+
+from utils.checkpoint import CheckpointWriter, atomic_write
+
+
+def test_writer_coalesces_to_the_latest_snapshot():
+    written = []
+    release = threading.Event()
+    first_started = threading.Event()
+
+    def write(state):
+        first_started.set()
+        release.wait(5)
+        written.append(state)
+
+    writer = CheckpointWriter(write)
+    writer.submit(0)
+    first_started.wait(5)
+    # Submitted while snapshot 0 is being written: only the newest survives
+    for state in range(1, 6):
+        writer.submit(state)
+    release.set()
+    writer.close()
+
+    assert written == [0, 5]
+    assert (writer.submitted, writer.written, writer.coalesced) == (6, 2, 4)
+
+
+def test_writer_raises_write_errors_on_flush():
+    def write(state):
+        raise OSError('disk full')
+
+    writer = CheckpointWriter(write)
+    writer.submit({})
+    with pytest.raises(Exception, match='disk full'):
+        writer.flush()
+    writer.close()
+
+
+def test_failed_atomic_write_keeps_previous_file(tmp_path):
+    path = str(tmp_path / 'model.pth')
+    atomic_write(path, lambda f: f.write(b'complete'))
+
+    def partial(f):
+        f.write(b'part')
+        raise OSError('interrupted')
+
+    with pytest.raises(OSError):
+        atomic_write(path, partial)
+    assert open(path, 'rb').read() == b'complete'
+    assert os.listdir(tmp_path) == ['model.pth']
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from data.data_preprocessor import FeaturePipeline
+from data.synthetic import generate_prices
+
+
+@pytest.fixture
+def prices():
+    prices = generate_prices(300)
+    volume = prices['volume'].copy()
+    # Gaps in the volume feed, including one longer than the z-score window
+    volume[[80, 81, 150]] = np.nan
+    volume[200:230] = np.nan
+    prices['volume'] = volume
+    return prices
+
+
+def test_fit_standardizes_training_features(prices):
+    pipeline = FeaturePipeline().fit([(prices['close'], prices['volume'])])
+    features = pipeline.transform(prices['close'], prices['volume'])[pipeline.warmup:]
+
+    assert np.isfinite(features).all()
+    np.testing.assert_allclose(features.mean(axis=0), 0, atol=1e-9)
+    np.testing.assert_allclose(features.std(axis=0), 1, atol=1e-9)
+
+
+def test_config_restores_scaling(prices):
+    pipeline = FeaturePipeline(['return', 'volume_z']).fit([(prices['close'], prices['volume'])])
+    restored = FeaturePipeline(**pipeline.config())
+    np.testing.assert_array_equal(restored.transform(prices['close'], prices['volume']),
+                                  pipeline.transform(prices['close'], prices['volume']))
+    assert FeaturePipeline(['return', 'volume_z']).settings() == restored.settings()
+
+
+@pytest.mark.parametrize('fit', [False, True])
+def test_streaming_matches_transform_with_missing_volume(prices, fit):
+    pipeline = FeaturePipeline()
+    if fit:
+        pipeline.fit([(prices['close'], prices['volume'])])
+    batch = pipeline.transform(prices['close'], prices['volume'])
+
+    split = 150
+    stream = pipeline.stream(prices['close'][:split], prices['volume'][:split])
+    rows = np.stack([stream.update(close, volume)
+                     for close, volume in zip(prices['close'][split:], prices['volume'][split:])])
+    np.testing.assert_allclose(rows, batch[split:], rtol=1e-9, atol=1e-9)
+    assert not np.isnan(rows).any()
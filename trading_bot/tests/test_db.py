@@ -0,0 +1,114 @@
+import re
+
+import numpy as np
+from pymysql.constants import SERVER_STATUS
+
+from utils.db import DB_CONFIG, ConnectionPool, latest_prices_query, stream_latest_prices
+
+
+class FakeServer:
+    """instrument_prices row count with InnoDB's visibility rules: outside autocommit, a
+    connection's first read opens a REPEATABLE READ snapshot that lasts until commit/rollback"""
+
+    def __init__(self):
+        self.rows = 0
+
+
+class FakeConnection:
+    def __init__(self, server, autocommit):
+        self.server = server
+        self.autocommit = autocommit
+        self.snapshot = None
+        self.server_status = SERVER_STATUS.SERVER_STATUS_AUTOCOMMIT if autocommit else 0
+
+    def count_rows(self):
+        if self.autocommit:
+            return self.server.rows
+        if self.snapshot is None:
+            self.snapshot = self.server.rows
+            self.server_status |= SERVER_STATUS.SERVER_STATUS_IN_TRANS
+        return self.snapshot
+
+    def rollback(self):
+        self.snapshot = None
+        self.server_status &= ~SERVER_STATUS.SERVER_STATUS_IN_TRANS
+
+    def ping(self, reconnect=True):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakePool(ConnectionPool):
+    def __init__(self, server, config):
+        super(FakePool, self).__init__(config=config, max_size=1)
+        self.server = server
+        self.connections = 0
+
+    def connect(self):
+        self.connections += 1
+        return FakeConnection(self.server, self.config.get('autocommit', False))
+
+
+def checkouts_see_new_rows(config):
+    server = FakeServer()
+    pool = FakePool(server, config)
+    first = pool.run(lambda connection: connection.count_rows())
+    server.rows += 1
+    second = pool.run(lambda connection: connection.count_rows())
+    # Both checkouts reused the same pooled connection
+    assert pool.connections == 1
+    return first, second
+
+
+def test_pooled_connections_autocommit():
+    assert DB_CONFIG['autocommit'] is True
+    assert checkouts_see_new_rows(DB_CONFIG) == (0, 1)
+
+
+def test_checkin_ends_open_transaction():
+    # Even with autocommit off, a connection goes back to the pool without its snapshot
+    assert checkouts_see_new_rows(dict(DB_CONFIG, autocommit=False)) == (0, 1)
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, query, params):
+        self.query = query
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class RowsConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self, cursor_class=None):
+        self.last_cursor = FakeCursor(list(self.rows))
+        return self.last_cursor
+
+
+def test_latest_prices_query_orders_the_union():
+    query = latest_prices_query(('close',), 3)
+    # Subquery order is not kept through UNION ALL; only an outer ORDER BY sets the result order
+    assert re.search(r"LIMIT %s\)\s+ORDER BY 2, 1$", query)
+    assert query.count("LIMIT %s)") == 3
+
+
+def test_stream_latest_prices_keeps_database_order():
+    # (timestamp, position, close) rows as the outer ORDER BY returns them
+    rows = [(100, 0, 1.0), (200, 0, 2.0), (300, 0, 3.0), (100, 1, 10.0), (200, 1, 20.0)]
+    latest = stream_latest_prices(RowsConnection(rows), ['a', 'b'], 3, dtype=np.float64)
+
+    np.testing.assert_array_equal(latest['a']['timestamp'], [100, 200, 300])
+    np.testing.assert_array_equal(latest['a']['close'], [1.0, 2.0, 3.0])
+    np.testing.assert_array_equal(latest['b']['timestamp'], [100, 200])
+    np.testing.assert_array_equal(latest['b']['close'], [10.0, 20.0])
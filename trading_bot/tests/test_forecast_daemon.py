@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+import torch
+
+from api_predict import BTCPricePredictor
+from config.settings import BTC_INSTRUMENT_ID
+from conftest import PREDICTION_STEPS, SEQ_LENGTH
+from data.synthetic import SQLitePriceStore, generate_prices
+from forecast_daemon import ForecastDaemon
+
+START_BARS = 150
+NEW_BARS = 25
+
+
+@pytest.fixture
+def feed(model_path):
+    """A daemon over the first START_BARS bars, and a function adding the next bar and polling"""
+    # The same series conftest fits the BTC scaler on
+    prices = generate_prices(START_BARS + NEW_BARS, start_price=30000.0, seed=0)
+    store = SQLitePriceStore()
+    store.insert(BTC_INSTRUMENT_ID, {name: values[:START_BARS] for name, values in prices.items()})
+    predictor = BTCPricePredictor(model_path=model_path, scaler_path=None, pool=store, uncertainty_samples=0)
+
+    def start(reencode_every):
+        daemon = ForecastDaemon(predictor, [BTC_INSTRUMENT_ID], source=store, reencode_every=reencode_every,
+                                publish=lambda result: None)
+        daemon.start()
+        return daemon
+
+    def add_bar(daemon, bar):
+        store.insert(BTC_INSTRUMENT_ID, {name: values[bar:bar + 1] for name, values in prices.items()})
+        assert len(daemon.poll()) == 1
+        return prices['close'][:bar + 1]
+
+    yield predictor, start, add_bar
+    store.close()
+
+
+def forecast(predictor, closes, stateful):
+    window = torch.tensor(predictor.normalize(closes, BTC_INSTRUMENT_ID), dtype=torch.float32).view(1, -1, 1)
+    return predictor.model.forecast(window, PREDICTION_STEPS, stateful=stateful)[0].numpy()
+
+
+@pytest.mark.parametrize('reencode_every', [1, 4, SEQ_LENGTH])
+def test_rollout_matches_forecast_bar_by_bar(feed, reencode_every):
+    predictor, start, add_bar = feed
+    daemon = start(reencode_every)
+    stream = daemon.streams[BTC_INSTRUMENT_ID]
+
+    for bar in range(START_BARS, START_BARS + NEW_BARS):
+        closes = add_bar(daemon, bar)
+        np.testing.assert_allclose(stream.window[:, 0], predictor.normalize(closes[-SEQ_LENGTH:], BTC_INSTRUMENT_ID),
+                                   rtol=0, atol=1e-6)
+        assert stream.bars_since_encode == (bar - START_BARS + 1) % reencode_every
+
+        # The state has seen the window at the last re-encode plus every bar since, one cell step each:
+        # the same as the stateful forecast of that longer history, and of the window itself right after
+        # a re-encode
+        history = closes[-(SEQ_LENGTH + stream.bars_since_encode):]
+        np.testing.assert_allclose(daemon.rollout(stream), forecast(predictor, history, stateful=True),
+                                   rtol=0, atol=1e-6)
+        if stream.bars_since_encode == 0:
+            # Day 1 is also exactly the sliding-window forecast's
+            window = closes[-SEQ_LENGTH:]
+            assert daemon.rollout(stream)[0] == pytest.approx(forecast(predictor, window, stateful=False)[0],
+                                                              abs=1e-6)
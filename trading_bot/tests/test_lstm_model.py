@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+import torch
+
+from data.synthetic import generate_prices
+from lstm_model import LSTMForecaster, LSTMModel
+
+SEQ_LENGTH = 10
+STEPS = 10
+# Stateful mode is an approximation, not the same forecast: this is the largest gap from the
+# sliding-window loop seen on trained models (scaled units), kept as a regression bound only
+STATEFUL_GAP_BOUND = 0.1
+
+
+def baseline_forecast(model, window, steps):
+    """The per-step loop the scripts used before LSTMModel.forecast: rerun the window from a zero state each step"""
+    predictions = []
+    sequence = window.copy()
+    with torch.no_grad():
+        for _ in range(steps):
+            model.hidden_cell = (torch.zeros(1, 1, model.hidden_layer_size),
+                                 torch.zeros(1, 1, model.hidden_layer_size))
+            value = model(torch.FloatTensor(sequence)).item()
+            predictions.append(value)
+            sequence = np.append(sequence[1:], value)
+    return np.array(predictions)
+
+
+@pytest.fixture(scope='module')
+def series():
+    close = generate_prices(600)['close']
+    return (close - close.min()) / (close.max() - close.min())
+
+
+@pytest.fixture(scope='module')
+def trained_model(series):
+    """A model fit to the synthetic series, so forecasts behave like a real checkpoint's"""
+    torch.manual_seed(0)
+    model = LSTMModel(hidden_layer_size=32)
+    inputs = torch.tensor(np.lib.stride_tricks.sliding_window_view(series[:-1], SEQ_LENGTH),
+                          dtype=torch.float32).unsqueeze(-1)
+    targets = torch.tensor(series[SEQ_LENGTH:], dtype=torch.float32).unsqueeze(-1)
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.01)
+    for _ in range(60):
+        optimizer.zero_grad()
+        torch.nn.functional.mse_loss(model(inputs), targets).backward()
+        optimizer.step()
+    return model.eval()
+
+
+@pytest.fixture(scope='module')
+def windows(series):
+    return np.lib.stride_tricks.sliding_window_view(series, SEQ_LENGTH)[::37].copy()
+
+
+def test_window_mode_equals_baseline_loop(trained_model, windows):
+    for window in windows:
+        forecast = trained_model.forecast(torch.tensor(window, dtype=torch.float32).view(1, -1, 1), STEPS)
+        np.testing.assert_array_equal(forecast[0].numpy(), baseline_forecast(trained_model, window, STEPS))
+
+
+def test_batched_window_mode_matches_baseline_loop(trained_model, windows):
+    # Batched LSTM kernels may round differently from the one-window path, but only in float32 noise
+    forecasts = trained_model.forecast(torch.tensor(windows, dtype=torch.float32).unsqueeze(-1), STEPS).numpy()
+    baseline = np.stack([baseline_forecast(trained_model, window, STEPS) for window in windows])
+    np.testing.assert_allclose(forecasts, baseline, rtol=0, atol=1e-6)
+
+
+def test_stateful_mode_matches_day_one_only(trained_model, windows):
+    window = torch.tensor(windows, dtype=torch.float32).unsqueeze(-1)
+    stateful = trained_model.forecast(window, STEPS, stateful=True).numpy()
+    baseline = np.stack([baseline_forecast(trained_model, window, STEPS) for window in windows])
+
+    # Day 1 comes from the same encoded window
+    np.testing.assert_allclose(stateful[:, 0], baseline[:, 0], rtol=0, atol=1e-6)
+    # Later days carry state the window no longer holds, so they genuinely differ
+    gap = np.abs(stateful - baseline)[:, 1:].max()
+    assert 1e-3 < gap <= STATEFUL_GAP_BOUND
+
+
+def test_rollout_equals_stateful_forecast(trained_model, windows):
+    window = torch.tensor(windows, dtype=torch.float32).unsqueeze(-1)
+    _, hidden = trained_model.encode(window)
+    with torch.no_grad():
+        rollout = trained_model.rollout(hidden, STEPS)
+    torch.testing.assert_close(rollout, trained_model.forecast(window, STEPS, stateful=True), rtol=0, atol=0)
+
+
+def test_scripted_forecaster_matches_eager(trained_model, windows):
+    window = torch.tensor(windows, dtype=torch.float32).unsqueeze(-1)
+    scripted = torch.jit.script(LSTMForecaster(trained_model).eval())
+    for stateful in (False, True):
+        torch.testing.assert_close(scripted(window, STEPS, stateful),
+                                   trained_model.forecast(window, STEPS, stateful))
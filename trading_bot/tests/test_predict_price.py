@@ -0,0 +1,41 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+import torch
+
+import api_predict
+import predict_price
+from bot import BTCTradingBot
+from data.synthetic import SQLitePriceStore
+
+
+@pytest.mark.parametrize('features', [None, ['return', 'rsi', 'volume_z']])
+def test_loads_checkpoint_and_matches_api_predict(tmp_path, monkeypatch, features):
+    monkeypatch.chdir(tmp_path)
+    store = SQLitePriceStore.synthetic(['btc'], 400)
+    monkeypatch.setattr(predict_price, 'get_pool', lambda: store)
+    torch.manual_seed(0)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        bot = BTCTradingBot(hidden_size=16, instrument_ids=['btc'], price_cache_dir=None, pool=store,
+                            features=features, render_charts=False)
+        bot.fetch_btc_data_from_db()
+        bot.train_model(epochs=2, patience=2)
+
+        predictor = predict_price.BTCPricePredictor(model_path=bot.best_model_path, scaler_path=bot.scaler_path,
+                                                    instrument_id='btc', render_charts=False)
+        assert predictor.load_model()
+        assert predictor.fetch_latest_data_from_db()
+        predictions = predictor.predict_future_prices()
+
+    reference = api_predict.BTCPricePredictor(model_path=bot.best_model_path, scaler_path=bot.scaler_path,
+                                              instrument_id='btc', pool=store, uncertainty_samples=0)
+    expected = [day['predictedPrice'] for day in reference.run()['predictions']]
+    np.testing.assert_allclose(predictions, expected, rtol=1e-5)
+    if features:
+        # The scaling stats fitted for training travel with the checkpoint
+        feature_config = torch.load(bot.best_model_path, weights_only=False)['feature_config']
+        assert len(feature_config['means']) == len(feature_config['stds']) == len(features)
+    store.close()
@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.prediction_cache import PredictionCache
+
+
+def cache_files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith('.json'))
+
+
+def test_disk_tier_keeps_at_most_max_entries(tmp_path):
+    cache = PredictionCache(max_entries=3, cache_dir=str(tmp_path))
+    for bar in range(10):
+        cache.put(cache.make_key('btc', bar), {'bar': bar})
+        # Distinct mtimes, so the oldest file is well defined
+        os.utime(cache.disk_path(cache.make_key('btc', bar)), (time.time() - 10 + bar, time.time() - 10 + bar))
+
+    assert len(cache_files(tmp_path)) == 3
+    # A fresh process (empty memory tier) still finds the newest entries on disk
+    reader = PredictionCache(max_entries=3, cache_dir=str(tmp_path))
+    assert reader.get(reader.make_key('btc', 9)) == {'bar': 9}
+    assert reader.get(reader.make_key('btc', 0)) is None
+    assert cache.stats()['diskEvictions'] == 7
+
+
+def test_disk_tier_drops_expired_files_on_write(tmp_path):
+    cache = PredictionCache(max_entries=100, ttl=60, cache_dir=str(tmp_path))
+    for bar in range(5):
+        cache.put(cache.make_key('btc', bar), {'bar': bar})
+        stale = time.time() - 120
+        os.utime(cache.disk_path(cache.make_key('btc', bar)), (stale, stale))
+
+    cache.put(cache.make_key('btc', 5), {'bar': 5})
+    assert cache_files(tmp_path) == [os.path.basename(cache.disk_path(cache.make_key('btc', 5)))]
+
+
+def test_get_returns_a_copy(tmp_path):
+    cache = PredictionCache(cache_dir=str(tmp_path))
+    result = {'predictions': [{'day': 1}]}
+    cache.put('key', result)
+    result['predictions'].append({'day': 2})
+
+    cached = cache.get('key')
+    cached['predictions'][0]['day'] = 99
+    assert cache.get('key') == {'predictions': [{'day': 1}]}
+    # Disk hits are copies as well
+    reader = PredictionCache(cache_dir=str(tmp_path))
+    reader.get('key')['predictions'].clear()
+    assert reader.get('key') == {'predictions': [{'day': 1}]}
+
+
+def test_concurrent_misses_compute_once():
+    cache = PredictionCache()
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return {'bar': 1}
+
+    with ThreadPoolExecutor(8) as pool:
+        leader = pool.submit(cache.get_or_compute, 'key', compute)
+        started.wait(5)
+        followers = [pool.submit(cache.get_or_compute, 'key', compute) for _ in range(7)]
+        results = [leader.result()] + [future.result() for future in followers]
+
+    assert calls == [1]
+    assert results == [{'bar': 1}] * 8
+    assert cache.stats()['coalesced'] == 7
+
+
+def test_failed_computation_is_not_cached():
+    cache = PredictionCache()
+
+    def fail():
+        raise RuntimeError('database down')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('key', fail)
+    assert cache.get_or_compute('key', lambda: {'bar': 1}) == {'bar': 1}
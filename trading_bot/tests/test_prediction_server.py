@@ -0,0 +1,48 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from api_predict import BTCPricePredictor
+from conftest import INSTRUMENT_IDS
+from prediction_server import PredictionService
+
+
+class BarrierStore:
+    """Price store whose latest-bars fetch only returns once `parties` requests are inside it"""
+
+    def __init__(self, store, parties):
+        self.store = store
+        self.barrier = threading.Barrier(parties, timeout=10)
+
+    def fetch_latest_prices(self, *args, **kwargs):
+        self.barrier.wait()
+        return self.store.fetch_latest_prices(*args, **kwargs)
+
+
+def make_service(model_path, pool):
+    service = PredictionService(BTCPricePredictor(model_path=model_path, scaler_path=None, pool=pool))
+    service.start()
+    assert service.status == 'ready', service.error
+    return service
+
+
+def test_requests_overlap_outside_the_model(model_path, price_store):
+    # Serialized requests would leave the barrier waiting for a second party and time out
+    service = make_service(model_path, BarrierStore(price_store, len(INSTRUMENT_IDS)))
+    with ThreadPoolExecutor(len(INSTRUMENT_IDS)) as pool:
+        results = list(pool.map(service.predict, INSTRUMENT_IDS))
+
+    assert [result['instrumentId'] for result in results] == INSTRUMENT_IDS
+    assert service.requests_served == len(INSTRUMENT_IDS)
+
+
+def test_concurrent_results_match_serial(model_path, price_store):
+    service = make_service(model_path, price_store)
+    serial = {instrument_id: service.predict(instrument_id) for instrument_id in INSTRUMENT_IDS}
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(service.predict, INSTRUMENT_IDS * 8))
+
+    for result in results:
+        expected = serial[result['instrumentId']]
+        assert result['currentPrice'] == expected['currentPrice']
+        assert [day['predictedPrice'] for day in result['predictions']] == \
+               [day['predictedPrice'] for day in expected['predictions']]
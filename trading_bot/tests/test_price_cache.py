@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pytest
+
+from data.price_cache import COLUMNS, PriceCache
+from data.synthetic import SQLitePriceStore, generate_prices
+
+
+@pytest.fixture
+def prices():
+    return generate_prices(300)
+
+
+def rows(prices, start, stop):
+    return {column: values[start:stop] for column, values in prices.items()}
+
+
+def assert_cached(cache, prices, count):
+    cached = cache.load('btc')
+    for column in COLUMNS:
+        np.testing.assert_array_equal(cached[column], prices[column][:count])
+    assert cache.watermark('btc') == int(prices['timestamp'][count - 1])
+
+
+def test_refresh_appends_new_rows(tmp_path, prices):
+    store = SQLitePriceStore()
+    cache = PriceCache(str(tmp_path))
+    store.insert('btc', rows(prices, 0, 200))
+    assert cache.refresh(store, 'btc') == 200
+    store.insert('btc', rows(prices, 200, 300))
+    assert cache.refresh(store, 'btc') == 100
+    assert cache.refresh(store, 'btc') == 0
+    assert_cached(cache, prices, 300)
+    store.close()
+
+
+def test_refresh_does_not_read_the_history(tmp_path, prices, monkeypatch):
+    store = SQLitePriceStore()
+    cache = PriceCache(str(tmp_path))
+    store.insert('btc', rows(prices, 0, 200))
+    cache.refresh(store, 'btc')
+    store.insert('btc', rows(prices, 200, 201))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("refresh read the cached columns")
+
+    monkeypatch.setattr(np, 'fromfile', fail)
+    monkeypatch.setattr(np, 'load', fail)
+    assert cache.refresh(store, 'btc') == 1
+    monkeypatch.undo()
+    assert_cached(cache, prices, 201)
+    store.close()
+
+
+def test_uncommitted_bytes_are_ignored_then_overwritten(tmp_path, prices):
+    cache = PriceCache(str(tmp_path))
+    cache.append('btc', rows(prices, 0, 100))
+    # A crash after writing some columns but before meta.json was replaced
+    for column in ('timestamp', 'open'):
+        with open(cache.path('btc', column), 'ab') as f:
+            f.write(b'\xff' * 24)
+    assert_cached(cache, prices, 100)
+
+    cache.append('btc', rows(prices, 100, 150))
+    assert_cached(cache, prices, 150)
+    assert os.path.getsize(cache.path('btc', 'timestamp')) == 150 * 8
+
+
+def test_migrates_npy_cache(tmp_path, prices):
+    directory = tmp_path / 'btc'
+    directory.mkdir()
+    for column in COLUMNS:
+        np.save(directory / f"{column}.npy", prices[column][:120])
+
+    cache = PriceCache(str(tmp_path))
+    assert_cached(cache, prices, 120)
+    assert not any(name.endswith('.npy') for name in os.listdir(directory))
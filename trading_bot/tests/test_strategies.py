@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import strategies.base
+from config.settings import TRADE_AMOUNT
+from strategies.base import STRATEGIES, IntervalStrategy, Strategy, TrendStrategy
+from strategies.engine import MarketSnapshot, StrategyEngine
+
+
+def make_snapshot(current, yesterday, forecasts):
+    return MarketSnapshot(['a', 'b'], [1, 1], current, yesterday, forecasts)
+
+
+def test_incomplete_strategy_fails_on_instantiation():
+    class Incomplete(Strategy):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_registered_strategies_instantiate():
+    for name, make in STRATEGIES.items():
+        assert make().name == name
+
+
+def test_engine_orders_follow_target_changes():
+    engine = StrategyEngine([TrendStrategy(trade_amount=2)], ['a', 'b'], slippage=1.0, budget_ms=float('inf'))
+    # 'a' is forecast well above yesterday (BUY), 'b' well below (SELL, flat without shorting)
+    orders = engine.tick(make_snapshot([100, 50], [100, 50], [[110] * 5, [40] * 5]))
+    assert [(order['instrumentId'], order['side'], order['quantity']) for order in orders] == [('a', 'BUY', 2.0)]
+    assert orders[0]['price'] == pytest.approx(101.0)
+
+    # Unchanged targets send nothing; a reversal closes the position
+    assert engine.tick(make_snapshot([100, 50], [100, 50], [[110] * 5, [40] * 5])) == []
+    orders = engine.tick(make_snapshot([100, 50], [100, 50], [[90] * 5, [40] * 5]))
+    assert [(order['instrumentId'], order['side'], order['quantity']) for order in orders] == [('a', 'SELL', 2.0)]
+    np.testing.assert_array_equal(engine.positions, [[0, 0]])
+
+
+def test_overrun_drops_orders_and_keeps_positions():
+    engine = StrategyEngine([TrendStrategy()], ['a', 'b'], budget_ms=1.0)
+    orders = engine.tick(make_snapshot([100, 50], [100, 50], [[110] * 5, [60] * 5]), market_seconds=0.01)
+    assert orders == []
+    np.testing.assert_array_equal(engine.positions, [[0, 0]])
+    assert engine.stats()['overruns'] == 1
+
+
+def bullish_snapshot():
+    return make_snapshot([100, 2], [100, 2], [[110] * 5, [2.2] * 5])
+
+
+def test_default_size_is_trade_amount_units(monkeypatch):
+    # Units, not currency: the same 0.01 of each instrument whatever its price
+    np.testing.assert_array_equal(TrendStrategy().target_positions(bullish_snapshot()), [TRADE_AMOUNT, TRADE_AMOUNT])
+
+    monkeypatch.setattr(strategies.base, 'TRADE_AMOUNTS', {'b': 5.0})
+    np.testing.assert_array_equal(TrendStrategy().target_positions(bullish_snapshot()), [TRADE_AMOUNT, 5.0])
+
+
+def test_per_instrument_trade_amount():
+    strategy = TrendStrategy(trade_amount={'a': 0.5, 'b': 20})
+    np.testing.assert_array_equal(strategy.target_positions(bullish_snapshot()), [0.5, 20])
+    with pytest.raises(Exception, match="No trade_amount"):
+        TrendStrategy(trade_amount={'a': 0.5}).target_positions(bullish_snapshot())
+
+
+def test_notional_sizing_orders_equal_value():
+    engine = StrategyEngine([TrendStrategy(notional=1000), IntervalStrategy(notional=1000)], ['a', 'b'],
+                            slippage=0.0, budget_ms=float('inf'))
+    orders = engine.tick(bullish_snapshot())
+    # The interval strategy stays flat without intervals
+    assert [(order['instrumentId'], order['quantity']) for order in orders] == [('a', 10.0), ('b', 500.0)]
+    assert [order['notional'] for order in orders] == pytest.approx([1000, 1000])
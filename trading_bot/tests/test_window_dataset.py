@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from sklearn.model_selection import train_test_split
+
+from data.window_dataset import SlidingWindowDataset
+
+SEQ_LENGTH = 10
+
+
+def list_create_sequences(data, seq_length):
+    """create_sequences as it was before SlidingWindowDataset"""
+    xs, ys = [], []
+    for i in range(len(data) - seq_length):
+        xs.append(data[i:(i + seq_length)])
+        ys.append(data[i + seq_length])
+    return np.array(xs), np.array(ys)
+
+
+def series(length, features=None):
+    rng = np.random.default_rng(length)
+    return rng.random(length if features is None else (length, features)).astype(np.float32)
+
+
+# Shortest possible series (one window) and a few just above it, then a long one
+LENGTHS = [SEQ_LENGTH + 1, SEQ_LENGTH + 2, SEQ_LENGTH + 3, SEQ_LENGTH + 6, 257]
+
+
+@pytest.mark.parametrize('length', LENGTHS)
+def test_windows_match_list_create_sequences(length):
+    data = series(length)
+    X, y = list_create_sequences(data, SEQ_LENGTH)
+    dataset = SlidingWindowDataset(data, SEQ_LENGTH)
+
+    assert len(dataset) == len(y) == length - SEQ_LENGTH
+    np.testing.assert_array_equal(dataset.X, X)
+    np.testing.assert_array_equal(dataset.y, y)
+    X_tensor, y_tensor = dataset.tensors()
+    np.testing.assert_array_equal(X_tensor.numpy(), X[:, :, np.newaxis])
+    np.testing.assert_array_equal(y_tensor.numpy(), y[:, np.newaxis])
+
+
+@pytest.mark.parametrize('length', LENGTHS)
+def test_feature_windows_match_list_create_sequences(length):
+    data = series(length, features=3)
+    X, y = list_create_sequences(data, SEQ_LENGTH)
+    dataset = SlidingWindowDataset(data, SEQ_LENGTH)
+
+    np.testing.assert_array_equal(dataset.X, X)
+    # The target is the next close, column 0
+    np.testing.assert_array_equal(dataset.y, y[:, 0])
+
+
+@pytest.mark.parametrize('length', LENGTHS[1:])
+def test_split_matches_train_test_split(length):
+    data = series(length)
+    X_train, X_val, y_train, y_val = train_test_split(*list_create_sequences(data, SEQ_LENGTH),
+                                                      test_size=0.2, shuffle=False)
+    train_set, val_set = SlidingWindowDataset(data, SEQ_LENGTH).split(test_size=0.2)
+
+    np.testing.assert_array_equal(train_set.X, X_train)
+    np.testing.assert_array_equal(train_set.y, y_train)
+    np.testing.assert_array_equal(val_set.X, X_val)
+    np.testing.assert_array_equal(val_set.y, y_val)
+
+
+def test_too_short_series_raises():
+    # The list version returned no windows here; training on them failed later
+    assert len(list_create_sequences(series(SEQ_LENGTH), SEQ_LENGTH)[1]) == 0
+    with pytest.raises(ValueError, match="Not enough data"):
+        SlidingWindowDataset(series(SEQ_LENGTH), SEQ_LENGTH)